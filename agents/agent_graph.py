@@ -1,7 +1,9 @@
 import os
-from typing import TypedDict, Annotated, List, Union
+import time
+from typing import TypedDict, Annotated, List, Union, Optional
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langgraph.graph.message import add_messages
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, RemoveMessage
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
@@ -12,19 +14,31 @@ from tools.ehr_tool import EHRAdapter
 from tools.search_tool import SearchTool
 from tools.rag_tool import RAGTool
 from tools.email_tool import EmailTool
+from tools.provider_directory import ProviderDirectory, booking_window
+from tools import metrics
+from tools import prefetch
+from agents import memory
 import httpx
 
 # Initialize Tools
 appt_tool = AppointmentAdapter()
 ehr_tool = EHRAdapter()
 search_tool = SearchTool()
-rag_tool = RAGTool(db_path="./chroma_db")
+rag_tool = RAGTool(db_path="./chroma_db", patient_resolver=ehr_tool.resolve_name)
 email_tool = EmailTool()
+provider_directory = ProviderDirectory(appt_tool, embeddings=rag_tool.embeddings)
 
 # Define State
 class AgentState(TypedDict):
-    messages: List[BaseMessage]
+    # Appended per turn and persisted per thread_id by the checkpointer
+    messages: Annotated[List[BaseMessage], add_messages]
+    # Rolling summary of turns compressed out of `messages`
+    summary: str
     patient_name: str
+    # Patient context loaded ahead of the turn (tools/prefetch.py); pass None when there is none
+    prefetched: Optional[dict]
+    # Plan to run instead of planning this turn (set by agents/batch.py, which plans a question once per cohort)
+    preset_plan: Optional[List[str]]
     current_plan: List[str]
     results: dict
 
@@ -44,9 +58,25 @@ def planner_node(state: AgentState):
     messages = state['messages']
     last_message = messages[-1].content.strip()
     current_patient = state.get('patient_name', 'None')
+    history = memory.format_history(state.get('summary', ''), messages)
     
     updates = {}
 
+    # Messages that are only a numeric lab lookup are answered from the structured lab store; no LLM needed.
+    # Anything more (booking, emails, general questions) is planned below, with query_lab_values as a step.
+    lab_patient = current_patient if current_patient and current_patient != 'None' else None
+    lab_answer = rag_tool.lab_store.answer_numeric_query(last_message, lab_patient, strict=True)
+    if lab_answer:
+        updates['current_plan'] = ["query_lab_values"]
+        updates['results'] = {'lab_values': lab_answer}
+        return updates
+
+    # A batch's shared plan (agents/batch.py) stands in for the LLM planner, but not for a lab lookup
+    # this patient's rows can answer: the plan was made for another patient of the cohort
+    if state.get('preset_plan'):
+        updates['current_plan'] = list(state['preset_plan'])
+        return updates
+
     # Heuristic: If single word and looks like a name, force switch
     # This bypasses LLM uncertainty for simple name switches
     # Exclude common commands/greetings
@@ -73,8 +103,12 @@ def planner_node(state: AgentState):
     prompt = ChatPromptTemplate.from_template(
         """You are a healthcare assistant planner.
         Current Patient Context: {current_patient}
+        Conversation so far:
+        {history}
         User Request: {request}
         
+        Use the conversation to resolve follow-ups ("her", "that patient", "book it") to the patient or action discussed earlier.
+        
         First, check if the user is mentioning a specific patient name (e.g., "Show me Nirmala", "Deepak", "Book for John", "Vimla", "pull document for Vimla").
         Look for names that might be capitalized or appear as the subject of the request.
         
@@ -94,12 +128,14 @@ def planner_node(state: AgentState):
         - search_medical_info: Search for general medical info.
         - query_medical_docs: Query internal medical documents (RAG).
         - bulk_email_campaign: Find patients with specific conditions and send emails.
+        - query_lab_values: Numeric lab lookups from structured lab data (a patient's latest value or trend, patients above/below a value).
         
         Return the plan as a numbered list.
         """
     )
     chain = prompt | llm | StrOutputParser()
-    response_text = chain.invoke({"request": last_message, "current_patient": current_patient})
+    with metrics.span("llm.planner"):
+        response_text = chain.invoke({"request": last_message, "current_patient": current_patient, "history": history})
     
     lines = response_text.strip().split('\n')
     
@@ -120,6 +156,48 @@ def planner_node(state: AgentState):
     updates['current_plan'] = plan_lines
     return updates
 
+def load_patient_context(patient_name: str, cancelled=None):
+    """
+    EHR details and name-filtered RAG context of a patient: the lookups the executor makes
+    for every turn about a patient. Also run ahead of the turn by the UI's prefetcher, which
+    sets `cancelled` when the selection moves on (returns None then). Bookings are not part
+    of it: the executor reads them live, since they change between turns.
+    """
+    context = {'patient': patient_name, 'fetched_at': time.time()}
+    # Try to get structured data first
+    patient_details = ehr_tool.get_patient_summary(patient_name)
+    if patient_details:
+        context['patient_details'] = patient_details
+    else:
+        # If not in EHR, try to find in RAG
+        rag_summary = rag_tool.query(f"Summary of patient {patient_name}", patient=patient_name)
+        if rag_summary:
+            # Verify that the retrieved summary actually mentions the patient name
+            # This prevents returning "Neerav" when searching for "Vimla"
+            if patient_name.lower() in rag_summary[0].lower():
+                context['patient_details'] = {"Summary": rag_summary[0], "Source": "RAG"}
+            else:
+                context['patient_details'] = "Patient details not found (RAG mismatch)."
+        else:
+            context['patient_details'] = "Patient details not found."
+    
+    if cancelled is not None and cancelled.is_set():
+        return None
+
+    # Also fetch general medical context from RAG for this patient (for the report)
+    rag_context = rag_tool.query(f"Medical history and conditions of {patient_name}", patient=patient_name)
+    
+    # Filter RAG context to ensure it mentions the patient name
+    # This prevents false positives where RAG returns a document for another patient
+    filtered_context = []
+    if rag_context:
+        for doc_content in rag_context:
+            if patient_name.lower() in doc_content.lower():
+                filtered_context.append(doc_content)
+    
+    context['patient_rag_context'] = filtered_context
+    return context
+
 def executor_node(state: AgentState):
     plan = state['current_plan']
     
@@ -127,6 +205,11 @@ def executor_node(state: AgentState):
     if plan and "N/A" in plan[0]:
         return {"messages": [AIMessage(content="N/A")], "results": {}}
 
+    # Lab-value answers were computed by the planner from the lab store
+    if plan == ["query_lab_values"]:
+        results = state.get('results', {})
+        return {"messages": [AIMessage(content=results['lab_values']['answer'])], "results": results}
+
     patient_name = state.get('patient_name')
     messages = state['messages']
     last_message = messages[-1].content
@@ -138,35 +221,17 @@ def executor_node(state: AgentState):
     
     # ALWAYS fetch patient details if name is available, to populate the summary section
     if patient_name:
-        # Try to get structured data first
-        patient_details = ehr_tool.get_patient_summary(patient_name)
-        if patient_details:
-            results['patient_details'] = patient_details
-        else:
-            # If not in EHR, try to find in RAG
-            rag_summary = rag_tool.query(f"Summary of patient {patient_name}")
-            if rag_summary:
-                # Verify that the retrieved summary actually mentions the patient name
-                # This prevents returning "Neerav" when searching for "Vimla"
-                if patient_name.lower() in rag_summary[0].lower():
-                    results['patient_details'] = {"Summary": rag_summary[0], "Source": "RAG"}
-                else:
-                    results['patient_details'] = "Patient details not found (RAG mismatch)."
-            else:
-                results['patient_details'] = "Patient details not found."
-        
-        # Also fetch general medical context from RAG for this patient (for the report)
-        rag_context = rag_tool.query(f"Medical history and conditions of {patient_name}")
-        
-        # Filter RAG context to ensure it mentions the patient name
-        # This prevents false positives where RAG returns a document for another patient
-        filtered_context = []
-        if rag_context:
-            for doc_content in rag_context:
-                if patient_name.lower() in doc_content.lower():
-                    filtered_context.append(doc_content)
-        
-        results['patient_rag_context'] = filtered_context
+        # The UI prefetches the selected patient's context in the background; use it when it matches
+        context = state.get('prefetched')
+        if not (context and (context.get('patient') or '').lower() == patient_name.lower()
+                and time.time() - context.get('fetched_at', 0) < prefetch.TTL):
+            context = load_patient_context(patient_name)
+        results['patient_details'] = context['patient_details']
+        results['patient_rag_context'] = context['patient_rag_context']
+        # Read live (one indexed SQLite read): a prefetched list would miss bookings made since
+        bookings = appt_tool.get_patient_bookings(patient_name)
+        if bookings:
+            results['patient_bookings'] = bookings
 
     # Step A: Retrieve History (Explicit request)
     if "history" in plan_str or "record" in plan_str:
@@ -184,12 +249,25 @@ def executor_node(state: AgentState):
         rag_results = rag_tool.query(last_message)
         results['rag_results'] = rag_results
 
+    # Step B2: Numeric lab lookup as one step of a larger plan
+    if "lab_values" in plan_str or "lab values" in plan_str:
+        lab_answer = rag_tool.lab_store.answer_numeric_query(last_message, patient_name)
+        if lab_answer:
+            results['lab_values'] = lab_answer
+
     # Step C: Book Appointment (Auto-Booking Logic)
     if "book" in plan_str or "appointment" in plan_str:
         # 1. Check Availability
-        # For demo, we assume Nephrologist if mentioned, else General
-        doc_id = "dr_nephrologist" if "nephrologist" in last_message.lower() else "dr_gp"
-        avail = appt_tool.get_availability(doc_id)
+        # Specialty named in the request or matched from the symptoms, then its earliest free slot
+        # in the requested window ("this week", "tomorrow") from the provider directory
+        match = provider_directory.specialty_for(last_message)
+        window_start, window_end = booking_window(last_message)
+        earliest = provider_directory.earliest(match['specialty'], start=window_start, end=window_end)
+        results['specialty'] = match
+        doc_id = earliest['provider']['id'] if earliest else None
+        avail = [earliest['slot']] if earliest else []
+        if earliest:
+            results['provider'] = earliest['provider']
         results['availability'] = avail
         
         # 2. Auto-Book if slots are available
@@ -212,7 +290,7 @@ def executor_node(state: AgentState):
             )
             results['booking_status'] = booking
         else:
-            results['booking_status'] = {"success": False, "error": "No slots available"}
+            results['booking_status'] = {"success": False, "error": f"No {match['specialty']} slots available"}
 
     # Step D: Bulk Email Campaign
     if "email" in plan_str and ("all" in plan_str or "patients" in plan_str or "campaign" in plan_str or "bulk" in plan_str):
@@ -267,6 +345,9 @@ def executor_node(state: AgentState):
     User Request: "{last_message}"
     Patient: {patient_name}
     
+    Conversation so far:
+    {memory.format_history(state.get('summary', ''), messages)}
+    
     You have executed the following plan:
     {plan}
     
@@ -293,18 +374,36 @@ def executor_node(state: AgentState):
     Keep the tone professional and concise.
     """
     
-    response = llm.invoke([HumanMessage(content=system_prompt)])
+    with metrics.span("llm.synthesis"):
+        response = llm.invoke([HumanMessage(content=system_prompt)])
     
     return {"messages": [response], "results": results}
 
+def memory_node(state: AgentState):
+    """Fold older turns into the rolling summary once the history exceeds the token budget."""
+    split = memory.split_for_summary(state['messages'])
+    if split is None:
+        return {}
+    older, _ = split
+    prompt = memory.SUMMARY_PROMPT.format(
+        summary=state.get('summary') or "None",
+        messages="\n".join(memory.message_text(m) for m in older),
+    )
+    with metrics.span("llm.summary"):
+        summary = llm.invoke([HumanMessage(content=prompt)]).content.strip()
+    return {"summary": summary, "messages": [RemoveMessage(id=m.id) for m in older]}
+
 # Graph Construction
 workflow = StateGraph(AgentState)
 
-workflow.add_node("planner", planner_node)
-workflow.add_node("executor", executor_node)
+workflow.add_node("planner", metrics.traced("node.planner")(planner_node))
+workflow.add_node("executor", metrics.traced("node.executor")(executor_node))
+workflow.add_node("memory", metrics.traced("node.memory")(memory_node))
 
 workflow.set_entry_point("planner")
 workflow.add_edge("planner", "executor")
-workflow.add_edge("executor", END)
+workflow.add_edge("executor", "memory")
+workflow.add_edge("memory", END)
 
-app = workflow.compile()
+# Invoke with config={"configurable": {"thread_id": ...}}; each thread is one conversation
+app = workflow.compile(checkpointer=memory.get_checkpointer())
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from langchain_core.messages import HumanMessage
+
+from tools import metrics
+
+# Graph invocations in flight at once; each one is mostly waiting on the LLM API
+WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+
+def load_checkpoint(path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Finished rows of earlier runs written to `path`, by (patient, question), so a different
+    template sharing the file is not mistaken for work already done. Failed rows are retried.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # A line cut off by a crash
+            if not row.get("error"):
+                done[(row["patient"], row["question"])] = row
+    return done
+
+
+def plan_once(graph, question: str, patient: str) -> Optional[List[str]]:
+    """
+    Run the planner for one representative question of the batch. Every question in a batch
+    comes from the same template, so the plan is reused instead of one planner LLM call per
+    patient. Returns None, so each patient is planned on its own, for numeric lab questions
+    (their plan carries per-patient lab values) and for an "N/A" plan, which must not answer
+    the whole cohort for one patient.
+    """
+    update = graph.planner_node({"messages": [HumanMessage(content=question)], "patient_name": patient, "summary": ""})
+    plan = update.get("current_plan")
+    if not plan or plan == ["query_lab_values"] or any("N/A" in step for step in plan):
+        return None
+    return plan
+
+
+def run_batch(patients: List[str], template: str, output: str, workers: Optional[int] = None,
+              run_id: Optional[str] = None, graph=None, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Ask `template` (with "{patient}" filled in) about every patient in `patients`, running up to
+    `workers` graph invocations at once. Each answer is appended to the JSONL file `output` as
+    soon as it is ready; re-running with the same output and template skips the patients already answered.
+    Returns counts and timings; `progress(row)` is called for every finished row.
+    """
+    if "{patient}" not in template:
+        raise ValueError('The question template must contain "{patient}"')
+    if graph is None:
+        from agents import agent_graph as graph
+    workers = workers or WORKERS
+    run_id = run_id or os.path.splitext(os.path.basename(output))[0]
+
+    done = load_checkpoint(output)
+    cohort = list(dict.fromkeys(patients))
+    todo = [p for p in cohort if (p, template.format(patient=p)) not in done]
+    summary = {"patients": len(cohort), "skipped": len(cohort) - len(todo), "answered": 0, "failed": 0, "plan": None}
+    if not todo:
+        return summary
+
+    started = time.perf_counter()
+    with metrics.span("batch.plan"):
+        plan = plan_once(graph, template.format(patient=todo[0]), todo[0])
+    summary["plan"] = plan
+    write_lock = threading.Lock()
+
+    def ask(patient: str) -> Dict[str, Any]:
+        question = template.format(patient=patient)
+        state = {
+            "messages": [HumanMessage(content=question)],
+            "patient_name": patient,
+            "current_plan": [],
+            "results": {},
+            "prefetched": None,
+            "preset_plan": plan,
+        }
+        # A fresh thread per attempt, so a retried patient does not inherit a half-finished turn
+        config = {"configurable": {"thread_id": f"batch-{run_id}-{patient}-{time.time_ns()}"}}
+        row = {"patient": patient, "question": question}
+        start = time.perf_counter()
+        try:
+            with metrics.span("batch.invoke"):
+                result = graph.app.invoke(state, config=config)
+            row.update(answer=result["messages"][-1].content, plan=result.get("current_plan"),
+                       results=result.get("results"), error=None)
+        except Exception as e:
+            print(f"Batch question for {patient} failed: {e}")
+            row.update(answer=None, plan=plan, results=None, error=str(e))
+        row["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        with write_lock, open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, default=str) + "\n")
+        return row
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        for future in as_completed([pool.submit(ask, patient) for patient in todo]):
+            row = future.result()
+            summary["failed" if row["error"] else "answered"] += 1
+            if progress:
+                progress(row)
+
+    summary["elapsed_s"] = round(time.perf_counter() - started, 1)
+    return summary
+
+
+def export_parquet(jsonl_path: str, parquet_path: str) -> bool:
+    """Write the finished rows of a batch as Parquet (needs pyarrow or fastparquet)."""
+    import pandas as pd
+    rows = list(load_checkpoint(jsonl_path).values())
+    frame = pd.DataFrame(rows)
+    # Nested tool results are kept as JSON text; Parquet needs one type per column
+    for column in ("plan", "results"):
+        if column in frame:
+            frame[column] = frame[column].map(lambda value: json.dumps(value, default=str))
+    try:
+        frame.to_parquet(parquet_path, index=False)
+    except ImportError as e:
+        print(f"Parquet export needs pyarrow: {e}")
+        return False
+    return True
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, AIMessage
+
+# Conversation history is compressed into a rolling summary once the kept messages
+# exceed MEMORY_MAX_TOKENS; the last MEMORY_KEEP_MESSAGES stay verbatim.
+MEMORY_DB = os.getenv("AGENT_MEMORY_DB", "./chroma_db/conversations.sqlite3")
+MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "1500"))
+KEEP_MESSAGES = int(os.getenv("MEMORY_KEEP_MESSAGES", "4"))
+# Assistant reports are long; the prompts only need their gist
+AI_SNIPPET_CHARS = 600
+
+
+def get_checkpointer(path: Optional[str] = None):
+    """
+    SQLite checkpointer so conversations survive restarts and are shared by every app
+    process. Falls back to an in-memory saver (per process, lost on restart) when
+    langgraph-checkpoint-sqlite is not installed.
+    """
+    path = path or MEMORY_DB
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        print("langgraph-checkpoint-sqlite not installed; conversation memory is kept in process only.")
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return SqliteSaver(conn)
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token for English text; close enough for a budget check
+    return len(text) // 4 + 1
+
+
+def message_text(message: BaseMessage) -> str:
+    role = "Assistant" if isinstance(message, AIMessage) else "User"
+    content = str(message.content)
+    if isinstance(message, AIMessage) and len(content) > AI_SNIPPET_CHARS:
+        content = content[:AI_SNIPPET_CHARS] + " ..."
+    return f"{role}: {content}"
+
+
+def messages_tokens(messages: List[BaseMessage]) -> int:
+    return sum(approx_tokens(message_text(m)) for m in messages)
+
+
+def format_history(summary: str, messages: List[BaseMessage]) -> str:
+    """Summary of older turns plus the recent messages, excluding the current request (last message)."""
+    parts = []
+    if summary:
+        parts.append(f"Summary of earlier conversation: {summary}")
+    parts.extend(message_text(m) for m in messages[:-1])
+    return "\n".join(parts) if parts else "None"
+
+
+def split_for_summary(messages: List[BaseMessage]):
+    """
+    (to_summarize, kept) when the messages are over budget, else None. The cut is
+    moved back to a user message so a kept turn never starts with an orphaned answer.
+    """
+    if len(messages) <= KEEP_MESSAGES or messages_tokens(messages) <= MAX_TOKENS:
+        return None
+    cut = len(messages) - KEEP_MESSAGES
+    while cut > 0 and isinstance(messages[cut], AIMessage):
+        cut -= 1
+    if cut == 0:
+        return None
+    return messages[:cut], messages[cut:]
+
+
+SUMMARY_PROMPT = """Condense this healthcare assistant conversation into a short summary for later turns.
+Keep patient names, conditions, lab values, appointments booked and open requests. Drop formatting.
+
+Existing summary: {summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
@@ -0,0 +1,366 @@
+"""
+Headless HTTP API for the agent graph and the tools behind it.
+
+Each worker process loads its own copy of the graph, embedding model and EHR roster
+and opens the shared on-disk stores (lab values, conversation checkpoints, bookings).
+A Chroma client only sees its own process's writes, so several workers must share a
+Chroma server (CHROMA_HOST); a single worker opens ./chroma_db itself and reconnects
+after ingest_worker.py finishes a job.
+Agent turns run in a bounded thread pool and tool endpoints use the async tool
+methods (tools/aio.py), so the event loop keeps accepting requests. Agent turns and
+tool calls each have a concurrency limit with a short wait queue; requests beyond it
+are rejected (429) instead of piling up.
+
+Endpoints:
+    GET  /health
+    GET  /ready                          503 until warmup has finished
+    POST /agent                          {"message", "thread_id"?, "patient_name"?}
+    POST /rag/query                      {"query", "k"?, "patient"?}
+    GET  /ehr/patients                    ?offset=&limit=&prefix=
+    POST /ehr/patients                   {EHR record}
+    GET  /ehr/patients/{name}
+    DELETE /ehr/patients/{name}          cascades to chunks, lab values, bookings and profiles
+    POST /ehr/patients/{name}/rename     {"new_name"}
+    GET  /ehr/patients/{name}/profile    ?refresh=
+    POST /labs/query                     {"query", "patient"?, "strict"?}
+    POST /ingest                         ?filename=  (PDF as the request body)
+    GET  /ingest/jobs                    ?limit=
+    GET  /appointments/availability/{doctor_id}   ?start=&end=&limit=
+    GET  /providers                      ?specialty=&symptoms=&location=
+    POST /appointments                   {"patient_id", "time", "doctor_id", "reason"?, "patient_email"?}
+
+Usage:
+    python api_server.py                        # 127.0.0.1:8000, one worker
+    CHROMA_HOST=127.0.0.1 python api_server.py --host 0.0.0.0 --workers 4
+    CHROMA_HOST=127.0.0.1 uvicorn api_server:app --workers 4    # equivalent
+"""
+import os
+import sys
+import json
+import uuid
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any
+
+# Fix for ChromaDB on hosts with an old sqlite3 (same as app.py)
+try:
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+except ImportError:
+    pass
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+from langchain_core.messages import HumanMessage
+
+load_dotenv()
+
+from agents import agent_graph
+from tools import metrics
+from tools import warmup
+from tools.aio import run_blocking
+from tools.ingest_queue import IngestQueue
+from tools.patient_lifecycle import PatientLifecycle
+from tools.profile_store import ProfileStore, history_formatter
+from tools import email_tool
+
+AGENT_CONCURRENCY = int(os.getenv("API_AGENT_CONCURRENCY", "4"))
+TOOL_CONCURRENCY = int(os.getenv("API_TOOL_CONCURRENCY", "16"))
+# Requests allowed to wait for a slot, per limiter; more than this are rejected with 429
+MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "32"))
+# Seconds a queued request waits for a slot before a 503
+QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "30"))
+
+
+class Limiter:
+    """Concurrency limit with a bounded wait queue (backpressure for one class of request)."""
+
+    def __init__(self, name: str, slots: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.slots = slots
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.active = 0
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._sem is None:
+            # Created lazily so it binds to the worker's running event loop
+            self._sem = asyncio.Semaphore(self.slots)
+        if self.waiting >= self.max_queue:
+            metrics.incr(f"api.{self.name}.rejected")
+            raise HTTPException(status_code=429, detail=f"Too many {self.name} requests queued",
+                                headers={"Retry-After": "1"})
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            metrics.incr(f"api.{self.name}.timeout")
+            raise HTTPException(status_code=503, detail=f"No {self.name} capacity within {self.timeout:.0f}s",
+                                headers={"Retry-After": "5"})
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+
+    def status(self):
+        return {"slots": self.slots, "active": self.active, "waiting": self.waiting}
+
+
+# Finished ingest jobs tell this worker when ingest_worker.py wrote chunks it cannot see yet
+ingest_queue = IngestQueue(os.path.join("./chroma_db", "ingest_jobs.sqlite3"))
+profiles = ProfileStore(os.path.join("./chroma_db", "patient_profiles.sqlite3"))
+# Deletes and renames cascade to RAG chunks, lab values, bookings and profiles, as in the app
+patients = PatientLifecycle(agent_graph.ehr_tool, agent_graph.rag_tool, agent_graph.appt_tool, profiles)
+format_history = history_formatter(agent_graph.llm)
+
+
+def _sync_stores():
+    """Pick up what other processes wrote: chunks from finished ingest jobs and edits to the EHR workbook."""
+    agent_graph.rag_tool.pick_up_ingested(ingest_queue.last_finished())
+    agent_graph.ehr_tool.reload_if_changed()
+
+
+agent_limiter = Limiter("agent", AGENT_CONCURRENCY, MAX_QUEUE, QUEUE_TIMEOUT)
+tool_limiter = Limiter("tool", TOOL_CONCURRENCY, MAX_QUEUE, QUEUE_TIMEOUT)
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    # Agent turns go through asyncio.to_thread, i.e. the default executor; size it to the admitted turns
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=AGENT_CONCURRENCY, thread_name_prefix="api-agent")
+    loop.set_default_executor(executor)
+    # uvicorn starts accepting requests once startup finishes, so the first caller gets a warm worker
+    await asyncio.to_thread(warmup.warm_up, rag=agent_graph.rag_tool, ehr=agent_graph.ehr_tool)
+    yield
+    await email_tool.aclose_connections()
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(title="Agentic Healthcare Assistant API", lifespan=lifespan)
+
+
+def _jsonable(obj: Any) -> Any:
+    # Tool results hold pandas/NumPy values and timestamps from the EHR sheet
+    return json.loads(json.dumps(obj, default=str))
+
+
+class AgentRequest(BaseModel):
+    message: str
+    thread_id: Optional[str] = None
+    patient_name: Optional[str] = None
+
+
+class RAGQueryRequest(BaseModel):
+    query: str
+    k: int = 3
+    patient: Optional[str] = None
+
+
+class LabQueryRequest(BaseModel):
+    query: str
+    patient: Optional[str] = None
+    strict: bool = True
+
+
+class RenameRequest(BaseModel):
+    new_name: str
+
+
+class BookingRequest(BaseModel):
+    patient_id: str
+    time: str
+    doctor_id: str
+    reason: str = ""
+    patient_email: Optional[str] = None
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "pid": os.getpid(), "agent": agent_limiter.status(), "tool": tool_limiter.status()}
+
+
+@app.get("/ready")
+async def ready():
+    state = warmup.status()
+    if not state["ready"]:
+        raise HTTPException(status_code=503, detail="Warming up")
+    return state
+
+
+@app.post("/agent")
+async def agent_turn(req: AgentRequest):
+    thread_id = req.thread_id or str(uuid.uuid4())
+    state = {
+        "messages": [HumanMessage(content=req.message)],
+        "patient_name": req.patient_name,
+        "current_plan": [],
+        "results": {},
+    }
+    config = {"configurable": {"thread_id": thread_id}}
+    async with agent_limiter.admit():
+        await run_blocking(_sync_stores)
+        with metrics.span("api.agent"):
+            result = await asyncio.to_thread(agent_graph.app.invoke, state, config=config)
+    return _jsonable({
+        "thread_id": thread_id,
+        "response": result["messages"][-1].content,
+        "patient_name": result.get("patient_name"),
+        "current_plan": result.get("current_plan"),
+        "results": result.get("results"),
+    })
+
+
+@app.post("/rag/query")
+async def rag_query(req: RAGQueryRequest):
+    async with tool_limiter.admit():
+        await run_blocking(_sync_stores)
+        chunks = await agent_graph.rag_tool.aquery(req.query, k=req.k, patient=req.patient)
+    return {"results": chunks}
+
+
+@app.get("/ehr/patients")
+async def list_patients(offset: int = 0, limit: int = 50, prefix: Optional[str] = None):
+    async with tool_limiter.admit():
+        await run_blocking(_sync_stores)
+        roster = await run_blocking(agent_graph.ehr_tool.get_roster, offset, min(limit, 500), prefix)
+    return {"patients": roster["names"], "total": roster["total"], "offset": offset}
+
+
+@app.post("/ehr/patients")
+async def add_patient(record: Dict[str, Any]):
+    async with tool_limiter.admit():
+        await run_blocking(_sync_stores)
+        result = await run_blocking(agent_graph.ehr_tool.add_patient, record)
+    return _jsonable(result)
+
+
+@app.get("/ehr/patients/{name}")
+async def patient_summary(name: str):
+    await run_blocking(_sync_stores)
+    record = await agent_graph.ehr_tool.aget_patient_summary(name)
+    if not record:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return _jsonable({"patient": record, "history": agent_graph.ehr_tool.get_patient_history(name)})
+
+
+@app.delete("/ehr/patients/{name}")
+async def delete_patient(name: str):
+    async with tool_limiter.admit():
+        await run_blocking(_sync_stores)
+        result = await run_blocking(patients.delete_patient, name)
+    return _jsonable(result)
+
+
+@app.post("/ehr/patients/{name}/rename")
+async def rename_patient(name: str, req: RenameRequest):
+    async with tool_limiter.admit():
+        await run_blocking(_sync_stores)
+        result = await run_blocking(patients.rename_patient, name, req.new_name)
+    return _jsonable(result)
+
+
+@app.get("/ehr/patients/{name}/profile")
+async def patient_profile(name: str, refresh: bool = False):
+    """The dashboard history table: the stored profile, or vector search plus one LLM call when stale."""
+    async with tool_limiter.admit():
+        await run_blocking(_sync_stores)
+        profile = await run_blocking(profiles.get_or_build, name, agent_graph.ehr_tool, agent_graph.rag_tool,
+                                     format_history, refresh=refresh)
+    return _jsonable(profile)
+
+
+@app.post("/labs/query")
+async def lab_query(req: LabQueryRequest):
+    async with tool_limiter.admit():
+        answer = await run_blocking(agent_graph.rag_tool.lab_store.answer_numeric_query, req.query, req.patient,
+                                    strict=req.strict)
+    return _jsonable({"answer": answer})
+
+
+@app.post("/ingest")
+async def ingest(request: Request, filename: str):
+    """Queue a PDF sent as the raw request body; ingest_worker.py next to the API processes it."""
+    name = os.path.basename(filename)
+    if not name.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF reports can be ingested")
+    body = await request.body()
+    path = os.path.join("data", name)
+
+    def save():
+        with open(path, "wb") as f:
+            f.write(body)
+        return ingest_queue.enqueue(path)
+
+    return {"job_id": await run_blocking(save), "path": path}
+
+
+@app.get("/ingest/jobs")
+async def ingest_jobs(limit: int = 10):
+    jobs = await run_blocking(ingest_queue.list_jobs, min(limit, 100))
+    return {"jobs": jobs, "pending": await run_blocking(ingest_queue.pending_count)}
+
+
+@app.get("/appointments/availability/{doctor_id}")
+async def availability(doctor_id: str, start: Optional[str] = None, end: Optional[str] = None, limit: int = 50):
+    # Slot generation and the booking-store read are blocking; keep them off the event loop
+    async with tool_limiter.admit():
+        slots = await run_blocking(agent_graph.appt_tool.get_availability, doctor_id, start, end, limit=min(limit, 500))
+    return {"doctor_id": doctor_id, "slots": slots}
+
+
+@app.get("/providers")
+async def providers(specialty: Optional[str] = None, symptoms: Optional[str] = None, location: Optional[str] = None):
+    directory = agent_graph.provider_directory
+
+    def listing(specialty):
+        match = None
+        if symptoms and not specialty:
+            match = directory.specialty_for(symptoms)
+            specialty = match["specialty"]
+        # next_free reads schedule versions and may generate slots: blocking work for the tool pool
+        found = [dict(p, next_free=directory.next_free(p["id"])) for p in directory.list_providers(specialty, location)]
+        found.sort(key=lambda p: (p["next_free"] is None, (p["next_free"] or {}).get("start", "")))
+        return {"specialty": specialty, "match": match, "providers": found}
+
+    async with tool_limiter.admit():
+        return await run_blocking(listing, specialty)
+
+
+@app.post("/appointments")
+async def book(req: BookingRequest):
+    async with tool_limiter.admit():
+        result = await agent_graph.appt_tool.abook_appointment(req.patient_id, req.time, req.doctor_id, req.reason,
+                                                               patient_email=req.patient_email)
+    return _jsonable(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the agent graph and tools over HTTP.")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")),
+                        help="Worker processes; each holds its own model and roster copy (more than one needs CHROMA_HOST)")
+    args = parser.parse_args()
+    if args.workers > 1 and not os.getenv("CHROMA_HOST"):
+        # Each worker's in-process Chroma client would never see chunks written or deleted by the others
+        parser.error("--workers > 1 needs a shared Chroma server: run `chroma run --path ./chroma_db --port 8001` and set CHROMA_HOST")
+
+    import uvicorn
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 import sys
+import subprocess
 
 # Fix for ChromaDB on Streamlit Cloud (requires sqlite3 >= 3.35.0)
 try:
@@ -13,13 +14,18 @@ import httpx
 import pandas as pd
 import json
 import glob
+import uuid
+import datetime
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
-from agents.agent_graph import app as agent_app
-from tools.ehr_tool import EHRAdapter
-from tools.appointment_tool import AppointmentAdapter
-from tools.rag_tool import RAGTool
+from tools.ehr_tool import normalize_records
+from tools.ingest_queue import IngestQueue, QUEUED, RUNNING, FAILED
+from tools.patient_lifecycle import PatientLifecycle
+from tools.profile_store import ProfileStore, history_formatter
+from tools.api_client import APIClient
+from tools import metrics
+from tools import warmup
 
 # Load environment variables
 load_dotenv()
@@ -29,13 +35,58 @@ st.set_page_config(page_title="Agentic Healthcare Assistant", layout="wide")
 
 st.title("🏥 Agentic Healthcare Assistant")
 
-# Initialize Tools
-ehr = EHRAdapter()
-appt_tool = AppointmentAdapter()
-rag = RAGTool(db_path="./chroma_db")
+
+# With AGENT_API_URL set the UI is a thin client of api_server.py: agent turns, RAG and lab
+# searches, patient edits, uploads, profiles and bookings run in the API workers, and this
+# process loads no model, vector store or EHR workbook
+api = APIClient() if os.getenv("AGENT_API_URL") else None
+
+
+@st.cache_resource
+def shared_tools():
+    """
+    The EHR, appointment and RAG tools and the provider directory, built once per process
+    rather than on every rerun. They are the agent graph's own instances, so a booking or
+    patient edit made in the UI is what the agent sees and vice versa.
+    """
+    from agents import agent_graph
+    return agent_graph.ehr_tool, agent_graph.appt_tool, agent_graph.rag_tool, agent_graph.provider_directory
+
+
+@st.cache_resource
+def start_ingest_worker():
+    """One background ingest worker per app process; INGEST_WORKER=external if you run ingest_worker.py yourself."""
+    if os.getenv("INGEST_WORKER", "auto").lower() == "external":
+        return None
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_worker.py")
+    return subprocess.Popen([sys.executable, script, "--parent-pid", str(os.getpid())])
+
+
+if api is None:
+    # Initialize Tools
+    # providers: doctors by specialty with their next free slot (from appt_tool's working-hours rules),
+    # kept across reruns so the cached slots and specialty vectors are reused
+    ehr, appt_tool, rag, providers = shared_tools()
+    labs = rag.lab_store
+    ingest_queue = IngestQueue(os.path.join("./chroma_db", "ingest_jobs.sqlite3"))
+    # The ingest worker writes chunks from its own process; reconnect once it finished a job so they are searchable here
+    rag.pick_up_ingested(ingest_queue.last_finished())
+    # Dashboard history tables, reused until the patient's record or documents change
+    profiles = ProfileStore(os.path.join("./chroma_db", "patient_profiles.sqlite3"))
+    # Deletes and renames cascade to RAG chunks, lab values, bookings and profiles
+    patients = PatientLifecycle(ehr, rag, appt_tool, profiles)
+    from agents.agent_graph import app as agent_app, load_patient_context
+    from tools.prefetch import ContextPrefetcher
+    start_ingest_worker()
+    # serve.py warms up before Streamlit listens; under a plain `streamlit run app.py` warm up in the background
+    warmup.start_background()
+else:
+    # APIClient mirrors the signatures of each of these tools
+    ehr = appt_tool = rag = providers = labs = ingest_queue = patients = api
 
 # --- Auto-Ingest Logic (Safe Version) ---
-if "rag_initialized" not in st.session_state:
+# (A thin client leaves the knowledge base to the API host: setup_rag.py)
+if api is None and "rag_initialized" not in st.session_state:
     try:
         doc_count = rag.get_doc_count()
         if doc_count == 0:
@@ -61,9 +112,31 @@ else:
 
 formatter_llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0, http_client=_http_client)
 
+def drop_prefetched_context():
+    """Forget the prefetched patient context after a booking or patient edit, so the next turn reads fresh data."""
+    prefetcher = st.session_state.get("prefetcher")
+    if prefetcher is not None:
+        prefetcher.cancel()
+
+
 # --- Sidebar: Manage Data ---
+ROSTER_PAGE_SIZE = int(os.getenv("ROSTER_PAGE_SIZE", "50"))
+
+
+def patient_picker(label, key, where=st):
+    """Type-ahead search plus one page of the sorted roster; only the visible page reaches the widget."""
+    prefix = where.text_input(f"Search {label.lower()}", key=f"{key}_search", placeholder="Type a name...")
+    total = ehr.get_roster(0, 0, prefix)['total']
+    pages = max(1, -(-total // ROSTER_PAGE_SIZE))
+    page_no = 1
+    if pages > 1:
+        page_no = where.number_input(f"Page (1-{pages}, {total} patients)", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    names = ehr.get_roster((page_no - 1) * ROSTER_PAGE_SIZE, ROSTER_PAGE_SIZE, prefix)['names']
+    return where.selectbox(label, names or ["No Patients Found"], key=key)
+
+
 with st.sidebar.expander("⚙️ Manage Patients"):
-    action = st.radio("Action", ["Add Patient", "Delete Patient"])
+    action = st.radio("Action", ["Add Patient", "Rename Patient", "Delete Patient"])
     
     if action == "Add Patient":
         with st.form("add_patient_form"):
@@ -94,13 +167,18 @@ with st.sidebar.expander("⚙️ Manage Patients"):
                     file_ext = uploaded_file.name.split('.')[-1].lower()
                     save_path = os.path.join("data", uploaded_file.name)
                     
-                    # Save file
-                    with open(save_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-                    
+                    if api is None:
+                        # Save file
+                        with open(save_path, "wb") as f:
+                            f.write(uploaded_file.getbuffer())
+
                     if file_ext == 'pdf':
-                        st.info("Ingesting PDF into RAG system...")
-                        rag.ingest_pdf(save_path)
+                        # Parsing and embedding happen in the background worker (the API host's for a thin client)
+                        if api is None:
+                            job_id = ingest_queue.enqueue(save_path)
+                        else:
+                            job_id = api.enqueue_pdf(uploaded_file.name, uploaded_file.getvalue())
+                        st.info(f"PDF queued for ingestion (job {job_id}). Track it under 'Ingestion Jobs'.")
                     elif file_ext == 'json':
                         data = json.load(uploaded_file)
                         # Assuming JSON is a single patient dict or list
@@ -110,14 +188,16 @@ with st.sidebar.expander("⚙️ Manage Patients"):
                             for p in data:
                                 ehr.add_patient(p)
                     elif file_ext == 'xlsx':
-                        df = pd.read_excel(uploaded_file)
-                        for _, row in df.iterrows():
-                            ehr.add_patient(row.to_dict())
+                        for p in normalize_records(pd.read_excel(uploaded_file)):
+                            ehr.add_patient(p)
+                    if file_ext in ('json', 'xlsx'):
+                        drop_prefetched_context()
                 
                 # Add the manual form data (if name provided)
                 if new_name:
                     result = ehr.add_patient(patient_data)
                     if result.get('success'):
+                        drop_prefetched_context()
                         st.success(f"Patient {new_name} added successfully!")
                         if result.get('warning'):
                             st.warning(result.get('warning'))
@@ -126,26 +206,60 @@ with st.sidebar.expander("⚙️ Manage Patients"):
                         st.error(f"Failed to add patient: {result.get('error')}")
                 elif uploaded_file and file_ext == 'pdf':
                      # If PDF uploaded but no name, try to infer or just warn
-                     st.warning("PDF ingested, but Patient Record not created because 'Name' was missing. Please add the patient details manually.")
+                     st.warning("PDF queued for ingestion, but Patient Record not created because 'Name' was missing. Please add the patient details manually.")
 
     elif action == "Delete Patient":
-        all_patients = ehr.get_all_patient_names()
-        patient_to_delete = st.selectbox("Select Patient to Delete", all_patients)
+        patient_to_delete = patient_picker("Select Patient to Delete", "delete_patient")
         if st.button("Delete Patient"):
-            if ehr.delete_patient(patient_to_delete):
-                st.success(f"Deleted {patient_to_delete}")
+            result = patients.delete_patient(patient_to_delete)
+            if result.get('success'):
+                drop_prefetched_context()
+                st.success(f"Deleted {patient_to_delete} ({result['chunks']} report chunks, {result['lab_rows']} lab values, {result['bookings']} bookings)")
                 st.rerun()
             else:
-                st.error("Failed to delete.")
+                st.error(f"Failed to delete: {result.get('error')}")
+
+    elif action == "Rename Patient":
+        patient_to_rename = patient_picker("Select Patient to Rename", "rename_patient")
+        renamed_to = st.text_input("New Name")
+        if st.button("Rename Patient"):
+            result = patients.rename_patient(patient_to_rename, renamed_to)
+            if result.get('success'):
+                drop_prefetched_context()
+                st.success(f"Renamed {patient_to_rename} to {renamed_to}")
+                st.rerun()
+            else:
+                st.error(f"Failed to rename: {result.get('error')}")
+
+# --- Sidebar: Background ingestion status ---
+with st.sidebar.expander("📥 Ingestion Jobs", expanded=ingest_queue.pending_count() > 0):
+    jobs = ingest_queue.list_jobs(limit=5)
+    if not jobs:
+        st.caption("No uploads yet.")
+    for job in jobs:
+        label = f"{os.path.basename(job['path'])} · {job['status']}"
+        if job['status'] in (QUEUED, RUNNING):
+            st.progress(job['progress'] or 0.0, text=f"{label} — {job['message'] or ''}")
+        elif job['status'] == FAILED:
+            st.error(f"{label}: {job['error']}")
+        else:
+            st.success(f"{label} — {job['message']}")
+    if st.button("Refresh", key="refresh_ingest_jobs"):
+        st.rerun()
 
 # Sidebar: Patient Context
 st.sidebar.header("Patient Context")
-# Dynamic patient selection
-patient_names = ehr.get_all_patient_names()
-if not patient_names:
-    patient_names = ["No Patients Found"]
-    
-selected_patient = st.sidebar.selectbox("Select Patient", patient_names)
+# Dynamic patient selection, one roster page at a time
+selected_patient = patient_picker("Select Patient", "selected_patient", where=st.sidebar)
+
+# Load the selected patient's EHR row and RAG context in the background while the clinician
+# reads; a new selection cancels the previous load and a booking or patient edit drops it.
+# (With AGENT_API_URL the API does the lookups.)
+if api is None:
+    if "prefetcher" not in st.session_state:
+        st.session_state.prefetcher = ContextPrefetcher(load_patient_context)
+    if selected_patient != "No Patients Found":
+        st.session_state.prefetcher.start(selected_patient)
 
 if selected_patient and selected_patient != "No Patients Found":
     patient_info = ehr.get_patient_summary(selected_patient)
@@ -274,6 +388,14 @@ if page == "🤖 AI Medical Assistant":
     st.subheader("AI Medical Assistant")
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    # One checkpointer thread per browser session; the graph keeps the history and its summary
+    if "thread_id" not in st.session_state:
+        st.session_state.thread_id = str(uuid.uuid4())
+
+    if st.button("🆕 New conversation"):
+        st.session_state.thread_id = str(uuid.uuid4())
+        st.session_state.messages = []
+        st.rerun()
 
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -316,18 +438,30 @@ if page == "🤖 AI Medical Assistant":
                     "messages": [HumanMessage(content=prompt)],
                     "patient_name": current_context_patient,
                     "current_plan": [],
-                    "results": {}
+                    "results": {},
+                    # Always set, so a checkpointed value from an earlier turn is replaced
+                    "prefetched": None
                 }
                 
                 try:
-                    result = agent_app.invoke(initial_state)
+                    with metrics.collect() as turn_spans:
+                        with metrics.span("turn.total"):
+                            if api is not None:
+                                result = api.chat(prompt, st.session_state.thread_id, current_context_patient)
+                                response_message = result["response"]
+                            else:
+                                # Waits for a prefetch still in flight rather than repeating its lookups
+                                initial_state["prefetched"] = st.session_state.prefetcher.get(current_context_patient)
+                                result = agent_app.invoke(initial_state, config={"configurable": {"thread_id": st.session_state.thread_id}})
+                                response_message = result["messages"][-1].content
+                                if (result.get("results") or {}).get("booking_status", {}).get("success"):
+                                    # The prefetched bookings no longer hold for this patient
+                                    drop_prefetched_context()
                     
                     # Update the context for the next turn based on what the agent decided
                     new_patient = result.get("patient_name")
                     if new_patient:
                         st.session_state.agent_patient_context = new_patient
-                        
-                    response_message = result["messages"][-1].content
                     
                     st.markdown(response_message)
                     st.session_state.messages.append({"role": "assistant", "content": response_message})
@@ -339,6 +473,18 @@ if page == "🤖 AI Medical Assistant":
                         st.write("**Tool Results:**")
                         st.json(result.get("results"))
                         st.write(f"**Patient Context:** {new_patient}")
+
+                    with st.expander("Performance"):
+                        if metrics.ENABLED:
+                            # Per-span timings for this turn, slowest first
+                            perf_df = pd.DataFrame(turn_spans)
+                            if not perf_df.empty:
+                                perf_df = perf_df.groupby("span")["ms"].agg(["count", "sum", "max"]).sort_values("sum", ascending=False)
+                                st.dataframe(perf_df.rename(columns={"sum": "total_ms", "max": "max_ms"}))
+                            st.caption("Process totals since start:")
+                            st.json(metrics.snapshot()["timers"])
+                        else:
+                            st.info("Metrics are disabled. Set METRICS_ENABLED=1 (optionally METRICS_JSONL or METRICS_PORT) to enable.")
                         
                 except Exception as e:
                     st.error(f"An error occurred: {e}")
@@ -366,57 +512,67 @@ elif page == "📋 Patient Dashboard":
                 
         with col2:
             st.markdown("### Medical History (from RAG)")
-            if st.button("Fetch Medical History"):
+            fetch_col, refresh_col = st.columns(2)
+            fetch = fetch_col.button("Fetch Medical History")
+            refresh = refresh_col.button("Rebuild", help="Ignore the stored profile and re-run search and formatting")
+            if fetch or refresh:
                 with st.spinner("Retrieving and structuring history..."):
-                    # 1. Get raw chunks
-                    # Use a broader query to ensure we catch the document
-                    raw_history = rag.query(f"Medical history and conditions of {selected_patient}")
-                    
-                    # 2. Format with LLM
-                    if isinstance(raw_history, list) and raw_history:
-                        # Filter to ensure patient name is in the content (Double Check)
-                        filtered_history = [doc for doc in raw_history if selected_patient.lower() in doc.lower()]
-                        
-                        if filtered_history:
-                            context = "\n---\n".join(filtered_history)
-                            prompt = f"""
-                            You are a medical assistant. Analyze the following patient history snippets and extract key events into a structured Markdown table.
-                            
-                            Columns: Date, Category (e.g., Diagnosis, Vitals, Procedure), Details.
-                            
-                            Snippets:
-                            {context}
-                            """
-                            try:
-                                response = formatter_llm.invoke(prompt)
-                                formatted_history = response.content
-                                
-                                st.success("History Retrieved")
-                                st.markdown(formatted_history)
-                                with st.expander("View Raw Source"):
-                                    st.write(filtered_history)
-                            except Exception as e:
-                                st.error(f"Error formatting history: {e}")
-                                st.write(filtered_history)
+                    try:
+                        # Stored profile when the record and documents are unchanged; otherwise
+                        # vector search + name filter + LLM table, then stored for next time
+                        if api is None:
+                            profile = profiles.get_or_build(selected_patient, ehr, rag, history_formatter(formatter_llm),
+                                                            refresh=refresh)
                         else:
-                             st.warning(f"No history found for {selected_patient} (Name mismatch in documents).")
-                             with st.expander("Debug: Raw Results (Filtered Out)"):
-                                 st.write(raw_history)
-                    else:
-                        st.warning("No history found or error occurred.")
-                        with st.expander("Debug: Empty Result"):
-                            st.write(f"Query: Medical history and conditions of {selected_patient}")
-                            st.write(f"Result: {raw_history}")
+                            profile = api.get_profile(selected_patient, refresh=refresh)
+                        error = None
+                    except Exception as e:
+                        profile, error = None, e
+
+                if error is not None:
+                    st.error(f"Error formatting history: {error}")
+                elif profile["history"]:
+                    st.success("History Retrieved" + (" (stored profile)" if profile["cached"] else ""))
+                    st.markdown(profile["history"])
+                    with st.expander("View Raw Source"):
+                        st.write(profile["snippets"])
+                        st.caption(f"{len(profile['chunk_ids'])} indexed chunks for this patient")
+                elif profile["raw"]:
+                    st.warning(f"No history found for {selected_patient} (Name mismatch in documents).")
+                    with st.expander("Debug: Raw Results (Filtered Out)"):
+                        st.write(profile["raw"])
+                else:
+                    st.warning("No history found or error occurred.")
+                    with st.expander("Debug: Empty Result"):
+                        st.write(f"Query: Medical history and conditions of {selected_patient}")
+                        st.write(f"Result: {profile['raw']}")
 
 # --- Page 3: Appointments ---
 elif page == "📅 Book Appointment":
     st.subheader("Book an Appointment")
-    
+
+    # Suggest a specialty from the symptoms and preselect its doctor with the earliest free slot
+    symptoms = st.text_input("Symptoms (optional, suggests a specialist)")
+    doctors = providers.list_providers()
+    suggested = 0
+    if symptoms:
+        match = providers.specialty_for(symptoms)
+        earliest = providers.earliest(match["specialty"])
+        st.caption(f"Suggested specialty: {match['specialty']}")
+        if earliest:
+            suggested = [p["id"] for p in doctors].index(earliest["provider"]["id"])
+
+    doctor = st.selectbox("Select Doctor", doctors, index=suggested,
+                          format_func=lambda p: f"{p['name']} ({p['specialty']}, {p['location']})")
+    next_slot = providers.next_free(doctor["id"])
+    if next_slot:
+        st.caption(f"Next free slot with {doctor['name']}: {next_slot['start'].replace('T', ' ')}")
+
     with st.form("appointment_form"):
-        st.write(f"Booking for: **{selected_patient}**")
-        doctor = st.selectbox("Select Doctor", ["Dr. Smith (Cardiology)", "Dr. Jones (General)", "Dr. Lee (Neurology)"])
-        date = st.date_input("Date")
-        time = st.time_input("Time")
+        st.write(f"Booking for: **{selected_patient}** with **{doctor['name']}**")
+        slot_time = datetime.datetime.fromisoformat(next_slot["start"]) if next_slot else datetime.datetime.now()
+        date = st.date_input("Date", value=slot_time.date())
+        time = st.time_input("Time", value=slot_time.time())
         reason = st.text_area("Reason for Visit")
         
         submitted = st.form_submit_button("Book Appointment")
@@ -424,15 +580,16 @@ elif page == "📅 Book Appointment":
         if submitted:
             # Format date/time for the tool
             datetime_str = f"{date} at {time}"
-            # Extract doctor name correctly (e.g., "Dr. Smith (Cardiology)" -> "Dr. Smith")
-            doctor_name = doctor.split(" (")[0]
+            # Book against the provider's schedule id so the slot leaves their availability
+            doctor_id = doctor["id"]
             
             # Get patient email if available
             patient_email = patient_info.get('Email') if patient_info else None
             
-            result = appt_tool.book_appointment(selected_patient, datetime_str, doctor_name, reason, patient_email=patient_email)
+            result = appt_tool.book_appointment(selected_patient, datetime_str, doctor_id, reason, patient_email=patient_email)
             
             if result.get('success'):
+                drop_prefetched_context()
                 st.success(result.get('message'))
                 st.json(result.get('booking'))
             else:
@@ -444,60 +601,69 @@ elif page == "🔬 Query Lab Reports":
     query = st.text_input("Enter your query about medical reports:")
     if st.button("Search"):
         if query:
-            with st.spinner("Searching and structuring results..."):
-                # 1. Get raw chunks
-                raw_results = rag.query(query)
+            # Numeric lab questions ("creatinine > 2", "latest HbA1c for Deepak") are answered
+            # directly from the structured lab store: no vector search, no LLM call.
+            lab_answer = labs.answer_numeric_query(query, selected_patient, strict=True)
+            if lab_answer:
+                st.markdown("### Lab Values")
+                st.markdown(f"**Answer:** {lab_answer['answer']}")
+                if lab_answer['rows']:
+                    st.table(pd.DataFrame(lab_answer['rows']))
+            else:
+                with st.spinner("Searching and structuring results..."):
+                    # 1. Get raw chunks
+                    raw_results = rag.query(query)
                 
-                # 2. Format with LLM
-                if isinstance(raw_results, list) and raw_results:
-                    context = "\n---\n".join(raw_results)
-                    prompt = f"""
-                    You are a medical research assistant. 
-                    User Query: "{query}"
+                    # 2. Format with LLM
+                    if isinstance(raw_results, list) and raw_results:
+                        context = "\n---\n".join(raw_results)
+                        prompt = f"""
+                        You are a medical research assistant. 
+                        User Query: "{query}"
                     
-                    Analyze the following document snippets and provide a structured answer.
+                        Analyze the following document snippets and provide a structured answer.
                     
-                    Return the output strictly as a JSON object with the following keys:
-                    - "summary": A clear, direct answer to the query (string).
-                    - "evidence": A list of objects, where each object has:
-                        - "Source": The source or date of the info.
-                        - "Excerpt": The relevant text snippet.
-                        - "Context": Brief explanation of why it's relevant.
+                        Return the output strictly as a JSON object with the following keys:
+                        - "summary": A clear, direct answer to the query (string).
+                        - "evidence": A list of objects, where each object has:
+                            - "Source": The source or date of the info.
+                            - "Excerpt": The relevant text snippet.
+                            - "Context": Brief explanation of why it's relevant.
                     
-                    Snippets:
-                    {context}
-                    """
-                    try:
-                        response = formatter_llm.invoke(prompt)
-                        content = response.content
+                        Snippets:
+                        {context}
+                        """
+                        try:
+                            response = formatter_llm.invoke(prompt)
+                            content = response.content
                         
-                        # Attempt to parse JSON (handle potential markdown code blocks)
-                        if "```json" in content:
-                            content = content.split("```json")[1].split("```")[0].strip()
-                        elif "```" in content:
-                            content = content.split("```")[1].split("```")[0].strip()
+                            # Attempt to parse JSON (handle potential markdown code blocks)
+                            if "```json" in content:
+                                content = content.split("```json")[1].split("```")[0].strip()
+                            elif "```" in content:
+                                content = content.split("```")[1].split("```")[0].strip()
                             
-                        data = json.loads(content)
+                            data = json.loads(content)
                         
-                        st.markdown("### Search Results")
-                        st.markdown(f"**Summary:** {data.get('summary')}")
+                            st.markdown("### Search Results")
+                            st.markdown(f"**Summary:** {data.get('summary')}")
                         
-                        st.markdown("#### Evidence Table")
-                        evidence = data.get('evidence', [])
-                        if evidence:
-                            st.table(pd.DataFrame(evidence))
-                        else:
-                            st.info("No specific evidence details found.")
+                            st.markdown("#### Evidence Table")
+                            evidence = data.get('evidence', [])
+                            if evidence:
+                                st.table(pd.DataFrame(evidence))
+                            else:
+                                st.info("No specific evidence details found.")
                         
-                        with st.expander("View Raw Source Text"):
-                            st.write(raw_results)
-                    except Exception as e:
-                        st.error(f"Error formatting results: {e}")
-                        st.write("Raw LLM Response:")
-                        st.write(response.content)
-                else:
-                    st.warning("No relevant documents found.")
-                    st.write(raw_results)
+                            with st.expander("View Raw Source Text"):
+                                st.write(raw_results)
+                        except Exception as e:
+                            st.error(f"Error formatting results: {e}")
+                            st.write("Raw LLM Response:")
+                            st.write(response.content)
+                    else:
+                        st.warning("No relevant documents found.")
+                        st.write(raw_results)
         else:
             st.warning("Please enter a query.")
 
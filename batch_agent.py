@@ -0,0 +1,95 @@
+"""
+Ask the agent the same question about every patient in a cohort.
+
+The cohort is every patient whose EHR summary matches a --keyword (EHRAdapter.search_patients),
+plus any --patient. The question template is planned once, then answered for each patient
+with up to --workers graph invocations in flight. Answers are appended to a JSONL file as they
+finish, so an interrupted run picks up where it stopped when re-run with the same --output
+and --question.
+
+Usage:
+    python batch_agent.py --keyword "kidney" --question "Summarize kidney status for {patient}"
+    python batch_agent.py --keyword diabet --keyword ckd --question "Latest HbA1c trend of {patient}" --workers 8
+    python batch_agent.py --keyword cancer --question "Summary of {patient}" --output batch_results/cancer.jsonl --parquet batch_results/cancer.parquet
+    python batch_agent.py --keyword kidney --question "..." --dry-run      # list the cohort only
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+# Fix for ChromaDB on hosts with an old sqlite3 (same as app.py)
+try:
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+except ImportError:
+    pass
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one question template over a cohort of patients.")
+    parser.add_argument("--question", required=True, help='Question template containing "{patient}"')
+    parser.add_argument("--keyword", action="append", default=[], help="Cohort: patients whose EHR summary contains this (repeatable)")
+    parser.add_argument("--patient", action="append", default=[], help="Add a patient by name (repeatable)")
+    parser.add_argument("--limit", type=int, help="Only the first N patients of the cohort")
+    parser.add_argument("--workers", type=int, help="Concurrent graph invocations (default BATCH_WORKERS or 4)")
+    parser.add_argument("--output", help="JSONL results and checkpoint (default batch_results/<keywords>.jsonl)")
+    parser.add_argument("--parquet", help="Also export the finished rows to this Parquet file")
+    parser.add_argument("--dry-run", action="store_true", help="Print the cohort and exit")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    if "{patient}" not in args.question:
+        parser.error('--question must contain "{patient}"')
+    if not args.keyword and not args.patient:
+        parser.error("give at least one --keyword or --patient")
+
+    from agents import agent_graph
+    from agents.batch import run_batch, export_parquet
+
+    cohort = list(args.patient)
+    for keyword in args.keyword:
+        cohort.extend(record.get("Name") for record in agent_graph.ehr_tool.search_patients(keyword))
+    cohort = [name for name in dict.fromkeys(cohort) if name]
+    if args.limit:
+        cohort = cohort[:args.limit]
+    if not cohort:
+        print("No patients matched.")
+        return
+    if args.dry_run:
+        print(f"{len(cohort)} patients:")
+        for name in cohort:
+            print(f"  {name}")
+        return
+
+    slug = re.sub(r"[^a-z0-9]+", "-", "-".join(args.keyword or ["patients"]).lower()).strip("-")
+    output = args.output or os.path.join("batch_results", f"{slug}.jsonl")
+
+    def progress(row):
+        if not args.json:
+            status = "error: " + row["error"] if row["error"] else f"{row['elapsed_ms']:.0f} ms"
+            print(f"  {row['patient']}: {status}")
+
+    summary = run_batch(cohort, args.question, output, workers=args.workers, progress=progress)
+    summary["output"] = output
+    if args.parquet:
+        summary["parquet"] = args.parquet if export_parquet(output, args.parquet) else None
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['answered']} answered, {summary['failed']} failed, {summary['skipped']} already done "
+          f"of {summary['patients']} patients -> {output}")
+    if summary.get("plan"):
+        print(f"Shared plan: {summary['plan']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Benchmark harness for ingestion, retrieval, EHR and agent turns.
+
+Generates synthetic PDF corpora and EHR rosters, times the real tools against
+them and writes a JSON document that can be diffed between commits.
+
+Usage:
+    python benchmark.py                      # quick profile
+    python benchmark.py --profile full       # 10/1k/10k reports, up to 100k EHR rows
+    python benchmark.py --only rag,ehr --output bench_results/run.json
+    python benchmark.py --compare bench_results/previous.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    "quick": {"pdf_sizes": [10], "ehr_sizes": [1000], "queries": 20, "agent_turns": 5},
+    "full": {"pdf_sizes": [10, 1000, 10000], "ehr_sizes": [1000, 10000, 100000], "queries": 200, "agent_turns": 50},
+}
+
+FIRST_NAMES = ["Ramesh", "Anjali", "David", "Deepak", "Neerav", "Rahul", "Rebeca", "Mihan", "Priya", "Arjun",
+               "Sara", "John", "Meera", "Vikram", "Nirmala", "Vimla", "Kiran", "Asha", "Rohan", "Leela"]
+LAST_NAMES = ["Kulkarni", "Mehra", "Thompson", "Negi", "Nagle", "Sharma", "Iyer", "Patel", "Singh", "Rao"]
+CONDITIONS = ["Type 2 Diabetes Mellitus", "Essential Hypertension", "Chronic Kidney Disease", "Asthma",
+              "Hypercholesterolemia", "Upper Respiratory Infection", "Cancer", "Seasonal allergies"]
+LAB_TESTS = [
+    ("Fasting Blood Glucose", "mg/dL", 70, 100, 60, 220),
+    ("HbA1c", "%", 4.0, 5.7, 4.5, 11.0),
+    ("Creatinine", "mg/dL", 0.6, 1.2, 0.5, 4.5),
+    ("Total Cholesterol", "mg/dL", 125, 200, 120, 300),
+    ("LDL Cholesterol", "mg/dL", 0, 100, 50, 200),
+    ("Hemoglobin", "g/dL", 12, 17, 8, 18),
+]
+QUERY_TEMPLATES = [
+    "Medical history and conditions of {name}",
+    "What is the creatinine level of {name}?",
+    "Which patients have {condition}?",
+    "Summary of patient {name}",
+    "treatment plan for {condition}",
+]
+
+
+# --- Helpers ---
+
+def percentiles(samples):
+    """Return count/mean/p50/p95/p99/max (milliseconds) for a list of second durations."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p):
+        # Nearest-rank percentile
+        idx = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+        return ordered[idx] * 1000.0
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000.0,
+        "p50_ms": pick(50),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+        "max_ms": ordered[-1] * 1000.0,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+# --- Synthetic data ---
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, lines, lines_per_page=50):
+    """Write a minimal multi-page text PDF (Helvetica) without external dependencies."""
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = []  # object bodies, 1-indexed by position + 1
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(None)  # pages tree, filled in once the kids are known
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    kids = []
+    for page_lines in pages:
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 800 Td"]
+        for line in page_lines:
+            ops.append(f"({_pdf_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref_pos = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_pos)
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+
+
+def synthetic_patient(rng, idx):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {idx}"
+    return {
+        "Phone_number": f"+91-9{rng.randint(100000000, 999999999)}",
+        "Email": f"patient{idx}@example.com",
+        "Name": name,
+        "Age": rng.randint(18, 90),
+        "Gender": rng.choice(["Male", "Female"]),
+        "Address": f"{rng.randint(1, 500)} Residency Road, Chennai",
+        "Summary": f"Patient with {rng.choice(CONDITIONS)}. {rng.choice(['Stable.', 'Follow-up in 3 months.', 'Labs ordered.'])}",
+    }
+
+
+def report_lines(rng, patient):
+    condition = rng.choice(CONDITIONS)
+    lines = [
+        "History and Physical Note",
+        f"Patient: {patient['Name']}",
+        f"Gender: {patient['Gender']}",
+        f"Visit Date: {rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2024",
+        "Subjective Notes:",
+        f"{patient['Name'].split()[0]} presents for follow-up of {condition}. Reports fatigue and mild swelling.",
+        "Objective Notes:",
+        f"Vitals: BP {rng.randint(105, 165)}/{rng.randint(65, 100)}, Pulse {rng.randint(60, 110)}, Temp 98.6F.",
+        "Laboratory Results",
+    ]
+    for test, unit, low, high, vmin, vmax in rng.sample(LAB_TESTS, 4):
+        value = round(rng.uniform(vmin, vmax), 1)
+        lines.append(f"{test} {value} {unit} {low}-{high} {unit}")
+    lines += [
+        "Assessment Notes:",
+        f"Diagnosis: {condition}",
+        "Plan Notes:",
+        "Continue current medication. Recommend lifestyle modifications. Return in 3 months.",
+    ]
+    return lines, condition
+
+
+def build_pdf_corpus(directory, size, seed=0):
+    """Create `size` synthetic report PDFs; returns list of (path, patient_name, condition)."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for i in range(size):
+        patient = synthetic_patient(rng, i)
+        lines, condition = report_lines(rng, patient)
+        path = os.path.join(directory, f"report_{i:05d}.pdf")
+        write_pdf(path, lines)
+        corpus.append((path, patient["Name"], condition))
+    return corpus
+
+
+def build_ehr_roster(path, size, seed=0):
+    import pandas as pd
+    rng = random.Random(seed)
+    rows = [synthetic_patient(rng, i) for i in range(size)]
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return rows
+
+
+# --- Benchmarks ---
+
+def bench_rag(cfg, workdir):
+    from tools.rag_tool import RAGTool
+    results = {}
+    for size in cfg["pdf_sizes"]:
+        print(f"[rag] corpus of {size} reports")
+        corpus_dir = os.path.join(workdir, f"pdfs_{size}")
+        corpus = build_pdf_corpus(corpus_dir, size)
+        rag = RAGTool(db_path=os.path.join(workdir, f"chroma_{size}"), collection_name=f"bench_{size}")
+
+        ingest_samples = []
+        start = time.perf_counter()
+        for path, _, _ in corpus:
+            elapsed, _ = timed(rag.ingest_pdf, path)
+            ingest_samples.append(elapsed)
+        ingest_total = time.perf_counter() - start
+        chunks = rag.get_doc_count()
+
+        rng = random.Random(1)
+        query_samples = []
+        for _ in range(cfg["queries"]):
+            _, name, condition = rng.choice(corpus)
+            q = rng.choice(QUERY_TEMPLATES).format(name=name, condition=condition)
+            elapsed, _ = timed(rag.query, q)
+            query_samples.append(elapsed)
+
+        results[str(size)] = {
+            "documents": size,
+            "chunks": chunks,
+            "ingest_total_s": ingest_total,
+            "ingest_docs_per_s": size / ingest_total if ingest_total else None,
+            "ingest_chunks_per_s": chunks / ingest_total if ingest_total else None,
+            "ingest_latency": percentiles(ingest_samples),
+            "query_qps": len(query_samples) / sum(query_samples) if query_samples else None,
+            "query_latency": percentiles(query_samples),
+        }
+    return results
+
+
+def bench_ehr(cfg, workdir):
+    from tools.ehr_tool import EHRAdapter
+    results = {}
+    for size in cfg["ehr_sizes"]:
+        print(f"[ehr] roster of {size} rows")
+        path = os.path.join(workdir, f"records_{size}.xlsx")
+        rows = build_ehr_roster(path, size)
+
+        load_s, ehr = timed(EHRAdapter, path)
+        rng = random.Random(2)
+        lookup_samples = [timed(ehr.get_patient_summary, rng.choice(rows)["Name"])[0] for _ in range(cfg["queries"])]
+        search_samples = [timed(ehr.search_patients, kw)[0] for kw in ("diabet", "hypertension", "cancer", "asthma")]
+        names_s, _ = timed(ehr.get_all_patient_names)
+        save_s, _ = timed(ehr._save_data)
+
+        results[str(size)] = {
+            "rows": size,
+            "load_s": load_s,
+            "save_s": save_s,
+            "all_names_s": names_s,
+            "lookup_latency": percentiles(lookup_samples),
+            "search_latency": percentiles(search_samples),
+        }
+    return results
+
+
+def bench_agent(cfg, workdir, llm_latency_ms=0.0):
+    # The graph builds ChatOpenAI at import; a placeholder key keeps that offline.
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import HumanMessage
+    from tools.rag_tool import RAGTool
+    from tools.ehr_tool import EHRAdapter
+    import agents.agent_graph as agent_graph
+
+    class FakeLLM(FakeListChatModel):
+        """Answers planner prompts with a plan and everything else with a canned report."""
+        sleep_s: float = 0.0
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            if self.sleep_s:
+                time.sleep(self.sleep_s)
+            text = str(messages[-1].content) if messages else ""
+            if "healthcare assistant planner" in text:
+                return "1. get_patient_history\n2. query_medical_docs"
+            return "1. **Patient Summary**: benchmark\n2. **RAG Search Results / Treatment Options**: N/A\n3. **Appointment Status**: N/A\n4. **Email Notification Status**: N/A"
+
+    corpus = build_pdf_corpus(os.path.join(workdir, "agent_pdfs"), 10, seed=3)
+    rag = RAGTool(db_path=os.path.join(workdir, "chroma_agent"), collection_name="bench_agent")
+    for path, _, _ in corpus:
+        rag.ingest_pdf(path)
+    ehr_path = os.path.join(workdir, "records_agent.xlsx")
+    build_ehr_roster(ehr_path, 100, seed=3)
+
+    agent_graph.llm = FakeLLM(responses=["unused"], sleep_s=llm_latency_ms / 1000.0)
+    agent_graph.rag_tool = rag
+    agent_graph.ehr_tool = EHRAdapter(ehr_path)
+
+    rng = random.Random(4)
+    samples = []
+    for _ in range(cfg["agent_turns"]):
+        _, name, _ = rng.choice(corpus)
+        state = {
+            "messages": [HumanMessage(content=f"What is the medical history of {name}?")],
+            "patient_name": name,
+            "current_plan": [],
+            "results": {},
+        }
+        # Fresh thread per turn so history does not grow across samples
+        config = {"configurable": {"thread_id": f"bench-{time.time_ns()}"}}
+        elapsed, _ = timed(agent_graph.app.invoke, state, config=config)
+        samples.append(elapsed)
+
+    return {"turns": len(samples), "llm_latency_ms": llm_latency_ms, "turn_latency": percentiles(samples)}
+
+
+def compare(current, previous_path):
+    """Print the relative change of every shared numeric leaf between two result files."""
+    with open(previous_path) as f:
+        previous = json.load(f)
+
+    def walk(cur, prev, prefix=""):
+        for key, value in cur.items():
+            if key not in prev:
+                continue
+            path = f"{prefix}{key}"
+            if isinstance(value, dict) and isinstance(prev[key], dict):
+                walk(value, prev[key], path + ".")
+            elif isinstance(value, (int, float)) and isinstance(prev[key], (int, float)) and prev[key]:
+                delta = (value - prev[key]) / prev[key] * 100.0
+                print(f"{path:70s} {prev[key]:12.3f} -> {value:12.3f} ({delta:+.1f}%)")
+
+    print(f"\nComparison against {previous.get('meta', {}).get('commit', previous_path)}:")
+    walk(current.get("results", {}), previous.get("results", {}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG ingestion/query, EHR and agent turns.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--only", default="rag,ehr,agent", help="Comma-separated subset of: rag, ehr, agent")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: bench_results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Previous result JSON to diff against")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per fake LLM call")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep generated corpora for inspection")
+    args = parser.parse_args()
+
+    cfg = PROFILES[args.profile]
+    selected = {s.strip() for s in args.only.split(",") if s.strip()}
+    workdir = tempfile.mkdtemp(prefix="medbench_")
+    commit = git_commit()
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "profile": args.profile,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": {},
+    }
+
+    try:
+        if "rag" in selected:
+            report["results"]["rag"] = bench_rag(cfg, workdir)
+        if "ehr" in selected:
+            report["results"]["ehr"] = bench_ehr(cfg, workdir)
+        if "agent" in selected:
+            report["results"]["agent"] = bench_agent(cfg, workdir, args.llm_latency_ms)
+    finally:
+        if args.keep_workdir:
+            print(f"Work directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join("bench_results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare chunking strategies on the report PDFs before re-indexing.
+
+For each strategy prints the chunk count (= embedding calls), the token-length
+distribution in model word pieces, how many chunks exceed the model limit and are
+silently truncated, and the wasted-overlap ratio: the share of embedded tokens that
+duplicate text already embedded in a neighbouring chunk.
+
+Usage:
+    python chunk_report.py                      # every PDF under data/
+    python chunk_report.py data/sample_patient.pdf --strategy semantic --max-overlap 16
+    python chunk_report.py --json
+"""
+import os
+import sys
+import glob
+import json
+import math
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.pdf_parser import iter_pdf_pages
+from tools.chunker import SemanticChunker, load_token_counter, make_text_splitter, MODEL_MAX_TOKENS, SPECIAL_TOKENS
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def report(strategy, splitter, pdfs, count_tokens):
+    limit = MODEL_MAX_TOKENS - SPECIAL_TOKENS
+    token_counts = []
+    source_tokens = 0
+    for pdf in pdfs:
+        for page_doc, _ in iter_pdf_pages(pdf):
+            source_tokens += count_tokens(page_doc.page_content)
+            for chunk in splitter.split_documents([page_doc]):
+                token_counts.append(count_tokens(chunk.page_content))
+    embedded = sum(token_counts)
+    return {
+        "strategy": strategy,
+        "chunks": len(token_counts),
+        "tokens_embedded": embedded,
+        "tokens_source": source_tokens,
+        "tokens_min": min(token_counts, default=0),
+        "tokens_p50": percentile(token_counts, 50),
+        "tokens_p95": percentile(token_counts, 95),
+        "tokens_max": max(token_counts, default=0),
+        "truncated_chunks": sum(1 for t in token_counts if t > limit),
+        "wasted_overlap_ratio": round(max(embedded - source_tokens, 0) / embedded, 4) if embedded else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk counts, token distribution and overlap waste per chunking strategy.")
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: data/*.pdf)")
+    parser.add_argument("--strategy", choices=["recursive", "semantic", "both"], default="both")
+    parser.add_argument("--max-tokens", type=int, default=MODEL_MAX_TOKENS - SPECIAL_TOKENS, help="Semantic chunk size limit")
+    parser.add_argument("--max-overlap", type=int, default=32, help="Semantic overlap cap in tokens")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(glob.glob(os.path.join("data", "*.pdf")))
+    if not pdfs:
+        print("No PDFs found.")
+        return
+
+    count_tokens = load_token_counter()
+    splitters = {}
+    if args.strategy in ("recursive", "both"):
+        splitters["recursive"] = make_text_splitter("recursive")
+    if args.strategy in ("semantic", "both"):
+        splitters["semantic"] = SemanticChunker(max_tokens=args.max_tokens, max_overlap_tokens=args.max_overlap,
+                                                count_tokens=count_tokens)
+
+    results = [report(name, splitter, pdfs, count_tokens) for name, splitter in splitters.items()]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(pdfs)} PDF(s), model limit {MODEL_MAX_TOKENS - SPECIAL_TOKENS} tokens per chunk\n")
+    print(f"{'strategy':<10} {'chunks':>7} {'embedded':>9} {'min':>5} {'p50':>5} {'p95':>5} {'max':>5} {'truncated':>10} {'overlap waste':>14}")
+    for r in results:
+        print(f"{r['strategy']:<10} {r['chunks']:>7} {r['tokens_embedded']:>9} {r['tokens_min']:>5} {r['tokens_p50']:>5} "
+              f"{r['tokens_p95']:>5} {r['tokens_max']:>5} {r['truncated_chunks']:>10} {r['wasted_overlap_ratio']:>14.1%}")
+
+
+if __name__ == "__main__":
+    main()
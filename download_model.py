@@ -16,3 +16,21 @@ try:
     print(f"Model downloaded to: {model_path}")
 except Exception as e:
     print(f"Download failed: {e}")
+
+# ONNX export + int8 quantization for EMBEDDING_BACKEND=onnx
+try:
+    from tools.onnx_embeddings import export_onnx_model
+    export_onnx_model("./local_embeddings_model", quantize=True)
+except Exception as e:
+    print(f"ONNX export skipped: {e}")
+
+# Cross-encoder used by the optional reranking stage (RAG_RERANK=1)
+print("Downloading reranker model...")
+try:
+    reranker_path = snapshot_download(repo_id="cross-encoder/ms-marco-MiniLM-L-6-v2",
+                                      allow_patterns=["*.json", "*.txt", "*.safetensors"],
+                                      local_dir="./local_reranker_model",
+                                      local_dir_use_symlinks=False)
+    print(f"Reranker downloaded to: {reranker_path}")
+except Exception as e:
+    print(f"Reranker download failed: {e}")
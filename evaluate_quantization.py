@@ -0,0 +1,99 @@
+"""
+Measure recall@k and memory of the quantized vector modes against exact float search.
+
+Ground truth is exact cosine top-k over the float32 embeddings stored in Chroma.
+Queries are embedded samples of the stored chunks plus any --query strings.
+
+Usage:
+    python evaluate_quantization.py --k 3 --samples 200
+    python evaluate_quantization.py --query "creatinine of Deepak" --query "diabetes diet"
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from tools.rag_tool import RAGTool
+from tools.quantized_index import QuantizedIndex, MODES
+
+
+def load_float_matrix(collection, batch_size=1000):
+    ids, vectors, documents = [], [], []
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(include=["embeddings", "documents"], limit=batch_size, offset=offset)
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+        documents.extend(page["documents"])
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return ids, matrix, documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k of int8/binary quantized search vs exact float search.")
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--collection", default="medical_docs")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--samples", type=int, default=100, help="Number of stored chunks to use as queries")
+    parser.add_argument("--oversample", type=int, default=4, help="Candidate pool multiplier before float rescoring")
+    parser.add_argument("--query", action="append", default=[], help="Extra query text (repeatable)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    rag = RAGTool(db_path=args.db_path, collection_name=args.collection, vector_mode="float")
+    ids, matrix, documents = load_float_matrix(rag.vectorstore._collection)
+    if not ids:
+        print("Vectorstore is empty. Run setup_rag.py first.")
+        return
+
+    rng = random.Random(0)
+    query_texts = [doc[:200] for doc in rng.sample(documents, min(args.samples, len(documents)))] + args.query
+    queries = np.asarray(rag.embeddings.embed_documents(query_texts), dtype=np.float32)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+    k = min(args.k, len(ids))
+    exact_scores = queries @ matrix.T
+    truth = [set(np.argsort(-row)[:k]) for row in exact_scores]
+
+    report = {"chunks": len(ids), "queries": len(query_texts), "k": k,
+              "float32_bytes_per_vector": matrix.shape[1] * 4, "modes": {}}
+
+    for mode in MODES:
+        index = QuantizedIndex(mode)
+        index.add(ids, matrix)
+        position = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        for rescore in (False, True):
+            hits, elapsed = 0, 0.0
+            for q, expected in zip(queries, truth):
+                start = time.perf_counter()
+                candidates = index.search(q, k * args.oversample if rescore else k)
+                rows = [position[c[0]] for c in candidates]
+                if rescore:
+                    rows = sorted(rows, key=lambda r: -float(matrix[r] @ q))
+                elapsed += time.perf_counter() - start
+                hits += len(set(rows[:k]) & expected)
+            label = f"{mode}{'+rescore' if rescore else ''}"
+            report["modes"][label] = {
+                "recall_at_k": hits / (k * len(queries)),
+                "mean_latency_ms": elapsed / len(queries) * 1000.0,
+                "bytes_per_vector": index.bytes_per_vector(),
+                "compression": (matrix.shape[1] * 4) / index.bytes_per_vector(),
+            }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['chunks']} chunks, {report['queries']} queries, k={k}, float32 = {report['float32_bytes_per_vector']} bytes/vector")
+    print(f"{'mode':18s} {'recall@k':>9s} {'latency ms':>11s} {'bytes/vec':>10s} {'compression':>12s}")
+    for label, row in report["modes"].items():
+        print(f"{label:18s} {row['recall_at_k']:9.3f} {row['mean_latency_ms']:11.3f} {row['bytes_per_vector']:10.1f} {row['compression']:11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Score retrieval configurations on labeled queries generated from data/*.pdf and records.xlsx.
+
+Every combination of vector mode, k, relevance threshold and reranking (and optionally
+chunker) is run over the same labeled queries; the report gives recall@k, MRR and
+p50/p95 search latency for each, and the Pareto front of recall/MRR against p95 latency.
+
+Usage:
+    python evaluate_retrieval.py
+    python evaluate_retrieval.py --k 3 --k 5 --threshold 0.0 --threshold 0.2 --rerank
+    python evaluate_retrieval.py --chunkers recursive,semantic --min-recall 0.9 --json
+"""
+import os
+import sys
+import glob
+import json
+import shutil
+import tempfile
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+except ImportError:
+    pass
+
+from tools.rag_tool import RAGTool
+from tools.ehr_tool import EHRAdapter
+from tools.retrieval_eval import build_labels, evaluate, pareto_front, cheapest_meeting
+
+
+def build_store(chunker, pdf_paths, root):
+    """A throwaway store of the same PDFs split with `chunker`."""
+    db_path = os.path.join(root, chunker)
+    rag = RAGTool(db_path=db_path, collection_name="eval_docs", chunker=chunker, sharding="none", rerank=False)
+    for pdf_path in pdf_paths:
+        rag.ingest_pdf(pdf_path)
+    return db_path, "eval_docs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="recall@k / MRR / latency of retrieval configurations, with a Pareto report.")
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--collection", default="medical_docs")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--records", default="data/records.xlsx")
+    parser.add_argument("--k", type=int, action="append", help="Top-k to evaluate (repeatable, default 3 and 5)")
+    parser.add_argument("--threshold", type=float, action="append", help="Relevance floor (repeatable, default 0.0)")
+    parser.add_argument("--modes", default="float,int8,binary", help="Comma-separated vector modes")
+    parser.add_argument("--rerank", action="store_true", help="Also evaluate every configuration with cross-encoder reranking")
+    parser.add_argument("--chunkers", help="Comma-separated chunkers to compare in temporary stores (default: the existing store)")
+    parser.add_argument("--passages", type=int, default=2, help="Passage queries sampled per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-recall", type=float, help="Also report the fastest configuration reaching this recall@k")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.data_dir, "*.pdf")))
+    if not pdf_paths:
+        print(f"No PDFs found in {args.data_dir}.")
+        return
+    names = EHRAdapter(args.records).get_all_patient_names() if os.path.exists(args.records) else []
+    labels = build_labels(pdf_paths, names, passages_per_page=args.passages, seed=args.seed)
+    if not labels:
+        print("No labeled queries could be generated from the reports.")
+        return
+
+    ks = args.k or [3, 5]
+    thresholds = args.threshold or [0.0]
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    temp_root = None
+    if args.chunkers:
+        temp_root = tempfile.mkdtemp(prefix="retrieval_eval_")
+        stores = {c.strip(): build_store(c.strip(), pdf_paths, temp_root) for c in args.chunkers.split(",") if c.strip()}
+    else:
+        stores = {os.getenv("RAG_CHUNKER", "recursive"): (args.db_path, args.collection)}
+
+    rows = []
+    try:
+        for chunker, (db_path, collection) in stores.items():
+            for mode in modes:
+                rag = RAGTool(db_path=db_path, collection_name=collection, vector_mode=mode, rerank=args.rerank)
+                if not rag.get_doc_count():
+                    print(f"{db_path}/{collection} is empty. Run setup_rag.py first.")
+                    return
+                if rag.vector_mode != mode:
+                    continue  # Mode unavailable here (e.g. quantized search on a sharded store)
+                for rerank in ([False, True] if rag.reranker is not None else [False]):
+                    for k in ks:
+                        for threshold in thresholds:
+                            result = evaluate(rag, labels, k=k, rerank=rerank, min_score=threshold)
+                            rows.append(dict(config={"chunker": chunker, "vector_mode": mode, "k": k,
+                                                     "threshold": threshold, "rerank": rerank}, **result))
+    finally:
+        if temp_root:
+            shutil.rmtree(temp_root, ignore_errors=True)
+
+    front = pareto_front(rows)
+    report = {
+        "queries": len(labels),
+        "queries_by_kind": {kind: sum(1 for l in labels if l["kind"] == kind) for kind in {l["kind"] for l in labels}},
+        "configurations": rows,
+        "pareto": front,
+    }
+    if args.min_recall is not None:
+        report["recommended"] = cheapest_meeting(rows, args.min_recall)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['queries']} labeled queries {report['queries_by_kind']}")
+    print(f"{'chunker':10s} {'mode':7s} {'k':>3s} {'thresh':>6s} {'rerank':>6s} {'recall@k':>9s} {'MRR':>6s} {'p50 ms':>8s} {'p95 ms':>8s}  pareto")
+    for row in sorted(rows, key=lambda r: r["p95_ms"]):
+        c = row["config"]
+        print(f"{c['chunker']:10s} {c['vector_mode']:7s} {c['k']:3d} {c['threshold']:6.2f} {str(c['rerank']):>6s} "
+              f"{row['recall_at_k']:9.3f} {row['mrr']:6.3f} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f}  {'*' if row in front else ''}")
+    if args.min_recall is not None:
+        best = report["recommended"]
+        print(f"\nFastest configuration with recall@k >= {args.min_recall}: {best['config'] if best else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,14 +15,27 @@ FILES_TO_DOWNLOAD = [
     "special_tokens_map.json",
     "modules.json",
     "sentence_bert_config.json",
-    "1_Pooling/config.json"
+    "1_Pooling/config.json",
+    "onnx/model.onnx"
 ]
 
 BASE_URL = f"https://huggingface.co/{MODEL_ID}/resolve/main"
 
-def download_file(filename):
-    url = f"{BASE_URL}/{filename}"
-    local_path = Path(LOCAL_DIR) / filename
+# Cross-encoder used by the optional reranking stage (RAG_RERANK=1)
+RERANKER_ID = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANKER_DIR = "./local_reranker_model"
+RERANKER_FILES = [
+    "config.json",
+    "model.safetensors",
+    "tokenizer.json",
+    "tokenizer_config.json",
+    "vocab.txt",
+    "special_tokens_map.json",
+]
+
+def download_file(filename, base_url=BASE_URL, local_dir=LOCAL_DIR):
+    url = f"{base_url}/{filename}"
+    local_path = Path(local_dir) / filename
     
     print(f"Downloading {filename}...")
     
@@ -61,6 +74,18 @@ def main():
     else:
         print("Some files failed to download. The model may not work.")
 
+    # int8-quantized copy of the ONNX model for EMBEDDING_BACKEND=onnx
+    try:
+        from tools.onnx_embeddings import export_onnx_model
+        export_onnx_model(LOCAL_DIR, quantize=True)
+    except Exception as e:
+        print(f"ONNX quantization skipped: {e}")
+
+    print(f"\nStarting manual download of {RERANKER_ID} to {RERANKER_DIR}")
+    reranker_url = f"https://huggingface.co/{RERANKER_ID}/resolve/main"
+    reranker_ok = sum(download_file(f, reranker_url, RERANKER_DIR) for f in RERANKER_FILES)
+    print(f"Reranker download complete. {reranker_ok}/{len(RERANKER_FILES)} files downloaded.")
+
 if __name__ == "__main__":
     # Suppress InsecureRequestWarning
     import urllib3
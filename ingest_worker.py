@@ -0,0 +1,160 @@
+"""
+Background ingestion worker for PDFs queued by the app (tools/ingest_queue.py).
+
+Parsing and chunking run in a process pool, one PDF per process. The parent keeps
+the single copy of the embedding model and embeds the chunks of every job claimed
+in a round together, in full batches, so small uploads share embedding calls.
+
+Usage:
+    python ingest_worker.py                     # run until stopped
+    python ingest_worker.py --once              # drain the queue and exit
+    python ingest_worker.py --processes 4 --max-jobs 8
+    python ingest_worker.py --enqueue data/report.pdf
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Fix for ChromaDB on hosts with an old sqlite3 (same as app.py)
+try:
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+except ImportError:
+    pass
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.ingest_queue import IngestQueue
+
+# Parsing is reported as the first half of a job's progress, embedding as the second
+PARSE_SHARE = 0.5
+
+
+def prepare_pdf(job_id, pdf_path, queue_path):
+    """Runs in a pool process: parse and chunk one PDF, reporting per-page progress."""
+    from pypdf import PdfReader
+    from tools.chunker import make_text_splitter
+    from tools.pdf_parser import iter_pdf_pages
+
+    queue = IngestQueue(queue_path)
+    text_splitter = make_text_splitter()
+    total_pages = max(len(PdfReader(pdf_path).pages), 1)
+    docs, rows, pages = [], [], 0
+    for page_doc, page_rows in iter_pdf_pages(pdf_path):
+        pages += 1
+        rows.extend(page_rows)
+        docs.extend(text_splitter.split_documents([page_doc]))
+        queue.update_progress(job_id, PARSE_SHARE * pages / total_pages, f"Parsed page {pages}/{total_pages}")
+    return docs, rows, pages
+
+
+def embed_jobs(rag, queue, prepared):
+    """Embed the chunks of all prepared jobs in shared batches and complete each job once its last chunk is stored."""
+    pending = []
+    for job, docs, rows, pages in prepared:
+        if not docs:
+            queue.complete(job["id"], pages, 0, len(rows))
+            continue
+        queue.update_progress(job["id"], PARSE_SHARE, f"Embedding {len(docs)} chunks")
+        pending.extend((job["id"], doc) for doc in docs)
+
+    totals = {job["id"]: len(docs) for job, docs, _, _ in prepared}
+    info = {job["id"]: (pages, len(rows)) for job, _, rows, pages in prepared}
+    written = dict.fromkeys(totals, 0)
+    failed = set()
+    for start in range(0, len(pending), rag.ingest_batch_size):
+        batch = [(job_id, doc) for job_id, doc in pending[start:start + rag.ingest_batch_size] if job_id not in failed]
+        if not batch:
+            continue
+        try:
+            rag.add_chunks([doc for _, doc in batch])
+        except Exception as e:
+            for job_id in {job_id for job_id, _ in batch}:
+                failed.add(job_id)
+                queue.fail(job_id, f"Embedding failed: {e}")
+            continue
+        for job_id in {job_id for job_id, _ in batch}:
+            written[job_id] += sum(1 for j, _ in batch if j == job_id)
+            if written[job_id] == totals[job_id]:
+                pages, lab_rows = info[job_id]
+                queue.complete(job_id, pages, totals[job_id], lab_rows)
+            else:
+                queue.update_progress(job_id, PARSE_SHARE + (1 - PARSE_SHARE) * written[job_id] / totals[job_id],
+                                      f"Embedded {written[job_id]}/{totals[job_id]} chunks")
+
+
+def run_round(rag, queue, pool, max_jobs, ehr=None):
+    jobs = queue.claim(max_jobs)
+    if not jobs:
+        return 0
+    # Patients added in the app since the last round resolve to their full names too
+    if ehr is not None and ehr.reload_if_changed():
+        print("Reloaded the EHR roster.")
+    print(f"Claimed {len(jobs)} job(s): {', '.join(j['path'] for j in jobs)}")
+    futures = {pool.submit(prepare_pdf, job["id"], job["path"], queue.db_path): job for job in jobs}
+    prepared = []
+    for future in as_completed(futures):
+        job = futures[future]
+        try:
+            docs, rows, pages = future.result()
+        except Exception as e:
+            print(f"Failed to parse {job['path']}: {e}")
+            queue.fail(job["id"], str(e))
+            continue
+        # Re-ingesting a report replaces its lab rows instead of duplicating them
+        rag.lab_store.delete_source(job["path"])
+        rag.add_lab_rows(rows)
+        prepared.append((job, docs, rows, pages))
+    embed_jobs(rag, queue, prepared)
+    # One quantized index write per round, not per embedding batch
+    rag.save_quantized()
+    return len(jobs)
+
+
+def parent_alive(parent_pid):
+    # POSIX re-parents orphans, so a changed parent PID means the app exited
+    return not parent_pid or os.name == 'nt' or os.getppid() == parent_pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued PDF ingestion jobs.")
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--ehr", default="data/records.xlsx", help="EHR workbook used to resolve report names to full patient names")
+    parser.add_argument("--processes", type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)),
+                        help="Parse/chunk worker processes")
+    parser.add_argument("--max-jobs", type=int, default=8, help="Jobs claimed (and embedded together) per round")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds between queue polls when idle")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    parser.add_argument("--parent-pid", type=int, default=0, help="Exit when this process exits (set by app.py)")
+    parser.add_argument("--enqueue", nargs="+", metavar="PDF", help="Queue PDFs and exit")
+    args = parser.parse_args()
+
+    queue = IngestQueue(os.path.join(args.db_path, "ingest_jobs.sqlite3"))
+    if args.enqueue:
+        for path in args.enqueue:
+            print(f"{queue.enqueue(path)}  {path}")
+        return
+
+    from tools.rag_tool import RAGTool
+    from tools.ehr_tool import EHRAdapter
+    ehr = EHRAdapter(args.ehr)
+    rag = RAGTool(db_path=args.db_path, patient_resolver=ehr.resolve_name)
+    requeued = queue.requeue_stale()
+    if requeued:
+        print(f"Requeued {requeued} stale job(s).")
+
+    print(f"Ingest worker started ({args.processes} processes, up to {args.max_jobs} jobs per round).")
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        while parent_alive(args.parent_pid):
+            if run_round(rag, queue, pool, args.max_jobs, ehr):
+                continue
+            if args.once:
+                break
+            time.sleep(args.poll)
+    print("Ingest worker stopped.")
+
+
+if __name__ == "__main__":
+    main()
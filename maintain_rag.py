@@ -0,0 +1,131 @@
+"""
+Vector store maintenance: dedup, purge deleted patients, rebuild indexes, vacuum.
+
+Prints size, fragmentation and probe query latency before and after the selected
+operations. With no operation flags only the report is printed.
+
+Usage:
+    python maintain_rag.py                                  # report only
+    python maintain_rag.py --dedup --vacuum
+    python maintain_rag.py --purge-patient "Rahul Negi" --rebuild --vacuum
+    python maintain_rag.py --orphans                        # list report patients with no EHR record
+    python maintain_rag.py --purge-orphans --dry-run
+    python maintain_rag.py --all --json
+"""
+import os
+import sys
+import json
+import argparse
+
+# Fix for ChromaDB on hosts with an old sqlite3 (same as app.py)
+try:
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+except ImportError:
+    pass
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.rag_tool import RAGTool
+from tools import maintenance
+
+
+def _mb(n):
+    return f"{n / 1e6:.2f} MB"
+
+
+def print_report(title, report):
+    print(f"\n== {title} ==")
+    print(f"Chunks: {report['chunks']} in {len(report['collections'])} collection(s)")
+    for name, count in sorted(report["collections"].items()):
+        print(f"  {name:<48} {count:>8}")
+    print(f"Disk: {_mb(report['disk_bytes'])}, vector index {report['index_bytes_per_chunk']:.0f} bytes/chunk")
+    for name, stats in report["sqlite"].items():
+        print(f"  {name:<28} {_mb(stats['bytes'])} (+{_mb(stats['wal_bytes'])} WAL), {stats['free_ratio']:.1%} free pages")
+    if "latency" in report:
+        lat = report["latency"]
+        print(f"Query latency: p50 {lat['p50_ms']:.1f} ms, p95 {lat['p95_ms']:.1f} ms over {lat['queries']} queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dedup, purge, rebuild and vacuum the RAG store.")
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--collection", default="medical_docs")
+    parser.add_argument("--ehr", default="data/records.xlsx", help="EHR file used to find orphaned patients")
+    parser.add_argument("--dedup", action="store_true", help="Delete near-duplicate chunks")
+    parser.add_argument("--threshold", type=float, default=0.98, help="Cosine similarity counted as duplicate")
+    parser.add_argument("--purge-patient", action="append", default=[], metavar="NAME", help="Delete a patient's chunks and lab values (repeatable)")
+    parser.add_argument("--orphans", action="store_true", help="List patients in indexed reports with no EHR record")
+    parser.add_argument("--purge-orphans", action="store_true", help="Purge every patient listed by --orphans")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild vector, quantized and lab value indexes")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the SQLite files")
+    parser.add_argument("--all", action="store_true", help="--dedup --rebuild --vacuum")
+    parser.add_argument("--dry-run", action="store_true", help="Report what dedup/purge would delete without deleting")
+    parser.add_argument("--latency-runs", type=int, default=3, help="Probe query rounds per report (0 to skip)")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+    if args.all:
+        args.dedup = args.rebuild = args.vacuum = True
+
+    rag = RAGTool(db_path=args.db_path, collection_name=args.collection, rerank=False)
+    results = {"before": maintenance.store_report(rag, args.latency_runs)}
+    if not args.json:
+        print_report("Before", results["before"])
+
+    purge = list(args.purge_patient)
+    if args.orphans or args.purge_orphans:
+        from tools.ehr_tool import EHRAdapter
+        orphans = maintenance.orphan_patients(rag, EHRAdapter(args.ehr).get_all_patient_names())
+        results["orphans"] = orphans
+        if not args.json:
+            print("\nPatients in reports without an EHR record:" if orphans else "\nNo orphaned patients.")
+            for name, count in sorted(orphans.items()):
+                print(f"  {name:<40} {count:>6} chunks")
+        if args.purge_orphans:
+            purge.extend(orphans)
+
+    changed = False
+    if purge:
+        if args.dry_run:
+            # Exact-name counts, as the real purge deletes: "Deepak" never counts "Deepak Negi"
+            found = maintenance.find_patient_chunks(rag, purge)
+            results["purge"] = {"chunks": sum(len(ids) for ids in found.values()),
+                                "lab_rows": sum(rag.lab_store.count(p) for p in purge), "dry_run": True}
+        else:
+            results["purge"] = maintenance.purge_patients(rag, purge)
+            changed = True
+        if not args.json:
+            print(f"\nPurge {', '.join(purge)}: {results['purge']}")
+
+    if args.dedup:
+        duplicates = maintenance.find_near_duplicates(rag, threshold=args.threshold)
+        count = sum(len(ids) for ids in duplicates.values())
+        if not args.dry_run:
+            maintenance.delete_found(rag, duplicates)
+            changed = changed or count > 0
+        results["dedup"] = {"duplicates": count, "dry_run": args.dry_run}
+        if not args.json:
+            print(f"\n{'Found' if args.dry_run else 'Deleted'} {count} near-duplicate chunks (similarity >= {args.threshold}).")
+
+    if args.rebuild:
+        results["rebuild"] = maintenance.rebuild_indexes(rag)
+        changed = True
+        if not args.json:
+            print(f"\nRebuilt indexes: {results['rebuild']['collections']}")
+
+    if args.vacuum:
+        results["vacuum"] = maintenance.vacuum(rag)
+        changed = True
+        if not args.json:
+            print(f"\nVacuum reclaimed: " + ", ".join(f"{k} {_mb(v)}" for k, v in results["vacuum"].items()))
+
+    if changed:
+        results["after"] = maintenance.store_report(rag, args.latency_runs)
+        if not args.json:
+            print_report("After", results["after"])
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
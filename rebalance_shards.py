@@ -0,0 +1,60 @@
+"""
+Rebalance / compact sharded RAG collections.
+
+Moves each stored chunk to the shard the current routing assigns it (copying the
+stored embedding, no re-embedding) and drops shard collections left empty. Run it
+after enabling sharding on an existing store or changing the shard settings;
+--strategy none folds every shard back into the single base collection.
+
+Usage:
+    python rebalance_shards.py --strategy patient --shards 8 --dry-run
+    python rebalance_shards.py --strategy time --window quarter
+    python rebalance_shards.py              # uses RAG_SHARDING / RAG_SHARDS / RAG_SHARD_WINDOW
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools.rag_tool import RAGTool
+from tools.shards import STRATEGIES, rebalance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move chunks to their assigned shards and drop empty shards.")
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--collection", default="medical_docs")
+    parser.add_argument("--strategy", choices=STRATEGIES, help="Target sharding (default: RAG_SHARDING)")
+    parser.add_argument("--shards", type=int, help="Number of patient-hash shards (default: RAG_SHARDS)")
+    parser.add_argument("--window", choices=["year", "quarter"], help="Time shard width (default: RAG_SHARD_WINDOW)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would move")
+    parser.add_argument("--keep-empty", action="store_true", help="Do not delete empty shard collections")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    rag = RAGTool(db_path=args.db_path, collection_name=args.collection, vector_mode="float", sharding=args.strategy)
+    if args.shards:
+        rag.router.num_shards = args.shards
+    if args.window:
+        rag.router.window = args.window
+
+    report = rebalance(rag, batch_size=args.batch_size, dry_run=args.dry_run, drop_empty=not args.keep_empty)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    verb = "Would move" if args.dry_run else "Moved"
+    print(f"{verb} {report['moved']} chunks ({report['strategy']} sharding).")
+    names = sorted(set(report["before"]) | set(report["after"]))
+    print(f"{'collection':<50} {'before':>8} {'after':>8}")
+    for name in names:
+        print(f"{name:<50} {report['before'].get(name, 0):>8} {report['after'].get(name, '-'):>8}")
+    if report["dropped"]:
+        print(f"Dropped empty shards: {', '.join(report['dropped'])}")
+
+
+if __name__ == "__main__":
+    main()
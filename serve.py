@@ -0,0 +1,44 @@
+"""
+Start the Streamlit app with the embedding model, vector store and EHR cache already warm.
+
+Streamlit only executes app.py when the first browser session connects, so a warmup
+inside app.py would still land on the first user. This launcher warms up in the
+process that will serve the app (the model, Chroma client and caches are process-wide)
+and then hands over to the Streamlit CLI. Arguments are passed to `streamlit run`.
+
+Usage:
+    python serve.py
+    python serve.py --server.port=8501 --server.address=0.0.0.0
+"""
+import os
+import sys
+
+# Fix for ChromaDB on hosts with an old sqlite3 (same as app.py)
+try:
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+except ImportError:
+    pass
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(here)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tools import warmup
+
+
+def main():
+    # The readiness file is written when warmup completes; Streamlit starts listening right after.
+    # A thin client (AGENT_API_URL) loads nothing to warm: the API workers warm themselves
+    if not os.getenv("AGENT_API_URL"):
+        warmup.warm_up()
+    from streamlit.web import cli as stcli
+    sys.argv = ["streamlit", "run", os.path.join(here, "app.py")] + sys.argv[1:]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,11 @@ print(sys.path)
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import glob
 from tools.rag_tool import RAGTool
+from tools.ehr_tool import EHRAdapter
 
 def main():
     # Initialize RAG Tool
-    rag = RAGTool(db_path="./chroma_db")
+    rag = RAGTool(db_path="./chroma_db", patient_resolver=EHRAdapter().resolve_name)
     
     # Find all PDFs in data directory
     pdf_files = glob.glob(os.path.join("data", "*.pdf"))
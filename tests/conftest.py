@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules under test import each other as top-level packages (tools.*, agents.*), as the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,92 @@
+import datetime
+
+import pytest
+
+from tools.appointment_tool import AppointmentAdapter, parse_time
+
+MONDAY = datetime.date(2030, 1, 7)
+SUNDAY = MONDAY - datetime.timedelta(days=1)
+
+
+def at(day, hhmm):
+    return f"{day.isoformat()}T{hhmm}:00"
+
+
+@pytest.fixture
+def appointments(tmp_path):
+    adapter = AppointmentAdapter(str(tmp_path / "bookings.sqlite3"))
+    adapter.set_working_hours("dr_test", "09:00", "11:00", weekdays=(0, 2), slot_minutes=30, breaks=[("10:00", "10:30")])
+    return adapter
+
+
+def free_starts(adapter, day):
+    return [slot["start"][11:16] for slot in adapter.get_availability("dr_test", at(day, "00:00"), at(day + datetime.timedelta(days=1), "00:00"))]
+
+
+def test_parse_time_accepts_form_format():
+    assert parse_time("2030-01-07 at 09:30:00") == datetime.datetime(2030, 1, 7, 9, 30)
+    assert parse_time("tomorrow") is None
+
+
+def test_slots_follow_rule_and_skip_breaks(appointments):
+    assert free_starts(appointments, MONDAY) == ["09:00", "09:30", "10:30"]
+    assert free_starts(appointments, MONDAY + datetime.timedelta(days=1)) == []
+
+
+def test_exception_closes_or_reshapes_a_day(appointments):
+    appointments.add_exception("dr_test", MONDAY)
+    assert free_starts(appointments, MONDAY) == []
+    appointments.add_exception("dr_test", MONDAY, [("14:00", "15:00")])
+    assert free_starts(appointments, MONDAY) == ["14:00", "14:30"]
+
+
+def test_added_slots_join_the_day(appointments):
+    appointments.add_availability("dr_test", [{"start": at(SUNDAY, "08:00"), "end": at(SUNDAY, "08:30")}])
+    assert free_starts(appointments, SUNDAY) == ["08:00"]
+
+
+def test_limit_and_next_free_slot(appointments):
+    start = datetime.datetime.combine(MONDAY, datetime.time())
+    assert len(appointments.get_availability("dr_test", start.isoformat(), limit=2)) == 2
+    assert appointments.next_free_slot("dr_test", start)["start"] == at(MONDAY, "09:00")
+
+
+def test_booking_removes_slot_and_cancel_frees_it(appointments):
+    version = appointments.version("dr_test")
+    result = appointments.book_appointment("Deepak Negi", f"{MONDAY} at 09:00:00", "dr_test")
+    assert result["success"]
+    assert appointments.version("dr_test") != version
+    assert free_starts(appointments, MONDAY) == ["09:30", "10:30"]
+    assert appointments.cancel_booking(result["booking"]["booking_id"]) == {"success": True}
+    assert free_starts(appointments, MONDAY) == ["09:00", "09:30", "10:30"]
+    assert appointments.cancel_booking(result["booking"]["booking_id"])["error"] == "not-found"
+
+
+def test_double_booking_is_rejected(appointments):
+    assert appointments.book_appointment("A", at(MONDAY, "09:00"), "dr_test")["success"]
+    assert appointments.book_appointment("B", at(MONDAY, "09:00"), "dr_test") == {"success": False, "error": "slot-taken"}
+    assert [b["patient_id"] for b in appointments.get_patient_bookings("b")] == []
+
+
+def test_times_outside_the_schedule_are_rejected(appointments):
+    assert appointments.book_appointment("A", at(SUNDAY, "03:00"), "dr_test")["error"] == "not-a-slot"
+    assert appointments.book_appointment("A", at(MONDAY, "10:00"), "dr_test")["error"] == "not-a-slot"
+    assert appointments.book_appointment("A", "soon", "dr_test")["error"] == "invalid-time"
+
+
+def test_bookings_are_shared_between_adapters_on_one_store(tmp_path):
+    first, second = AppointmentAdapter(str(tmp_path / "b.sqlite3")), AppointmentAdapter(str(tmp_path / "b.sqlite3"))
+    for adapter in (first, second):
+        adapter.set_working_hours("dr_test", "09:00", "10:00", weekdays=(0,))
+    assert first.book_appointment("A", at(MONDAY, "09:00"), "dr_test")["success"]
+    assert second.book_appointment("B", at(MONDAY, "09:00"), "dr_test")["error"] == "slot-taken"
+    assert [s["start"] for s in second.get_availability("dr_test", at(MONDAY, "00:00"), at(MONDAY, "23:00"))] == [at(MONDAY, "09:30")]
+
+
+def test_patient_rename_and_cancel_all(appointments):
+    appointments.book_appointment("Deepak Negi", at(MONDAY, "09:00"), "dr_test")
+    appointments.book_appointment("Deepak Negi", at(MONDAY, "09:30"), "dr_test")
+    assert appointments.rename_patient("deepak negi", "Deepak Kumar") == 2
+    assert {b["patient_id"] for b in appointments.get_patient_bookings("Deepak Kumar")} == {"Deepak Kumar"}
+    assert appointments.cancel_patient_bookings("Deepak Kumar") == 2
+    assert free_starts(appointments, MONDAY) == ["09:00", "09:30", "10:30"]
@@ -0,0 +1,27 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agents.batch import load_checkpoint, plan_once
+
+
+@pytest.mark.parametrize("plan, expected", [
+    (["get_patient_history", "query_medical_docs"], ["get_patient_history", "query_medical_docs"]),
+    (["query_lab_values"], None),
+    (["N/A"], None),
+    ([], None),
+])
+def test_plan_once_only_shares_reusable_plans(plan, expected):
+    graph = SimpleNamespace(planner_node=lambda state: {"current_plan": plan})
+    assert plan_once(graph, "Summarize Deepak Negi's kidney function", "Deepak Negi") == expected
+
+
+def test_checkpoint_keys_rows_by_patient_and_question(tmp_path):
+    path = tmp_path / "batch.jsonl"
+    rows = [
+        {"patient": "A", "question": "q1 A", "error": None},
+        {"patient": "A", "question": "q2 A", "error": "timeout"},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in rows) + '\n{"patient": "B", "quest')
+    assert set(load_checkpoint(str(path))) == {("A", "q1 A")}
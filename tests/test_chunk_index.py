@@ -0,0 +1,22 @@
+from tools.chunk_index import ChunkIndex
+
+
+def test_reads_match_first_names_writes_match_one_key(tmp_path):
+    index = ChunkIndex(str(tmp_path / "patient_chunks.sqlite3"))
+    assert index.add([("a", "Rahul", "docs"), ("b", "Rahul Negi", "docs"), ("c", "Rahul Dev", "docs-1"), ("d", None, "docs")]) == 3
+
+    assert index.chunks_for("rahul") == {"docs": ["a", "b"], "docs-1": ["c"]}
+    assert index.chunks_for("Rahul", exact=True) == {"docs": ["a"]}
+
+    assert index.rename("Rahul", "Rahul Kumar") == 1
+    assert index.chunks_for("Rahul Negi", exact=True) == {"docs": ["b"]}
+    assert index.chunks_for("rahul kumar", exact=True) == {"docs": ["a"]}
+
+
+def test_move_and_remove(tmp_path):
+    index = ChunkIndex(str(tmp_path / "patient_chunks.sqlite3"))
+    index.add([("a", "Deepak Negi", "docs"), ("b", "Deepak Negi", "docs")])
+    index.move(["b"], "docs-3")
+    assert index.chunks_for("Deepak Negi") == {"docs": ["a"], "docs-3": ["b"]}
+    index.remove(["a"])
+    assert index.count() == 1
@@ -0,0 +1,78 @@
+import pytest
+from langchain_core.documents import Document
+
+from tools.chunker import SemanticChunker, load_token_counter
+
+
+@pytest.fixture
+def count(tmp_path):
+    # No tokenizer.json there: the approximate counter used when the local model is missing
+    return load_token_counter(str(tmp_path))
+
+
+def visits(n):
+    return [f"Creatinine was {i}.{i} mg/dL on visit {i} and stable." for i in range(n)]
+
+
+def test_approximate_counter_counts_words_and_punctuation(count):
+    # 5 words (the number splits at the point), then "." and "/"
+    assert count("Creatinine 2.4 mg/dL") == int(5 * 1.3) + 2
+
+
+def test_small_sections_are_packed_into_one_chunk(count):
+    chunker = SemanticChunker(count_tokens=count)
+    chunks = chunker.split_text("Patient: Deepak Negi\nMedications\nMetformin 500 mg.\nAllergies\nNone known.")
+    assert len(chunks) == 1
+    assert chunks[0]["section"] == "Medications"
+
+
+def test_sections_that_do_not_fit_together_start_new_chunks(count):
+    chunker = SemanticChunker(max_tokens=40, count_tokens=count)
+    text = "Medications\n" + " ".join(visits(2)) + "\nPlan Notes\n" + " ".join(visits(2))
+    chunks = chunker.split_text(text)
+    assert [c["section"] for c in chunks] == ["Medications", "Plan Notes"]
+    assert chunks[1]["text"].startswith("Plan Notes\n")
+
+
+def test_patient_header_is_a_hard_boundary(count):
+    chunker = SemanticChunker(count_tokens=count)
+    text = "SAMPLE MEDICAL REPORT\nPatient: Anita Rao\nMedications\nMetformin.\nPatient: Rahul Dev\nMedications\nLisinopril."
+    chunks = chunker.split_text(text)
+    # The title block stays with the first patient; the second patient gets a chunk of their own
+    assert [c["text"] for c in chunks] == [
+        "SAMPLE MEDICAL REPORT\nPatient: Anita Rao\nMedications\nMetformin.",
+        "Patient: Rahul Dev\nMedications\nLisinopril.",
+    ]
+
+
+def test_long_section_stays_under_the_token_limit_with_capped_overlap(count):
+    chunker = SemanticChunker(max_tokens=60, max_overlap_tokens=20, count_tokens=count)
+    sentences = visits(12)
+    chunks = chunker.split_text("Laboratory Results\n" + " ".join(sentences))
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert count(chunk["text"]) <= 60
+        assert chunk["tokens"] <= 60
+        assert chunk["overlap"] <= 20
+        # Continuation chunks repeat the section header
+        assert chunk["text"].startswith("Laboratory Results\n") and chunk["section"] == "Laboratory Results"
+    assert chunks[0]["overlap"] == 0 and all(c["overlap"] > 0 for c in chunks[1:])
+    assert all(any(s in c["text"] for c in chunks) for s in sentences)
+
+
+def test_run_on_sentence_is_split_on_words(count):
+    chunker = SemanticChunker(max_tokens=60, count_tokens=count)
+    chunks = chunker.split_text("Clinical Notes\n" + " ".join(["word"] * 200))
+    assert len(chunks) > 1
+    assert all(count(c["text"]) <= 60 for c in chunks)
+    assert sum(c["text"].count("word") for c in chunks) >= 200
+
+
+def test_split_documents_keeps_metadata(count):
+    chunker = SemanticChunker(max_tokens=40, count_tokens=count)
+    doc = Document(page_content="Medications\n" + " ".join(visits(2)) + "\nPlan Notes\n" + " ".join(visits(2)),
+                   metadata={"source": "a.pdf", "page": 1, "patient": "Deepak Negi"})
+    out = chunker.split_documents([doc])
+    assert [d.metadata["section"] for d in out] == ["Medications", "Plan Notes"]
+    assert all(d.metadata["source"] == "a.pdf" and d.metadata["patient"] == "Deepak Negi" for d in out)
+    assert all(d.metadata["tokens"] <= 40 for d in out)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.ehr_tool import EHRAdapter, normalize_records
+
+NAMES = ["Rahul Negi", "Deepak Negi", "Rebeca Nagle", "Anita Rao", "Rahul Dev", "Neha Sharma"]
+
+
+@pytest.fixture
+def ehr(tmp_path):
+    path = tmp_path / "records.xlsx"
+    pd.DataFrame([{"Name": name, "Age": 30 + i, "Summary": "kidney disease" if i % 2 else "asthma"}
+                  for i, name in enumerate(NAMES)]).to_excel(path, index=False)
+    return EHRAdapter(str(path))
+
+
+def test_normalize_records_cleans_columns():
+    frame = pd.DataFrame({
+        "Name": ["  Deepak Negi ", None, "", "Rebeca Nagle"],
+        "Age": ["41", 50, 60, np.nan],
+        "Phone_number": [7982179305, np.nan, np.nan, np.nan],
+    })
+    records = normalize_records(frame)
+    assert [r["Name"] for r in records] == ["Deepak Negi", "Rebeca Nagle"]
+    assert records[0]["Age"] == 41 and isinstance(records[0]["Age"], int)
+    assert records[1]["Age"] is None
+
+
+@pytest.mark.parametrize("column, expected", [
+    ([7982179305, 9876543210], ["7982179305", "9876543210"]),
+    ([7982179305, np.nan], ["7982179305", None]),
+    (["+91 98765 43210", 7982179305.0], ["+91 98765 43210", "7982179305"]),
+])
+def test_normalize_records_keeps_phones_as_digit_strings(column, expected):
+    frame = pd.DataFrame({"Name": ["A", "B"], "Phone_number": column})
+    assert [r["Phone_number"] for r in normalize_records(frame)] == expected
+
+
+def test_normalize_records_without_name_column():
+    assert normalize_records(pd.DataFrame({"Age": [1]})) == []
+
+
+def test_roster_is_sorted_and_paged(ehr):
+    first = ehr.get_roster(0, 4)
+    assert first == {"names": ["Anita Rao", "Deepak Negi", "Neha Sharma", "Rahul Dev"], "total": 6}
+    assert ehr.get_roster(4, 4)["names"] == ["Rahul Negi", "Rebeca Nagle"]
+    assert ehr.get_roster(0, 0)["names"] == []
+
+
+def test_roster_prefix_matches_the_start_of_any_word(ehr):
+    assert ehr.get_roster(0, 10, "ne") == {"names": ["Deepak Negi", "Neha Sharma", "Rahul Negi"], "total": 3}
+    assert ehr.get_roster(1, 1, "NE")["names"] == ["Neha Sharma"]
+    assert ehr.get_roster(0, 10, "egi")["total"] == 0
+
+
+def test_roster_follows_adds_and_deletes(ehr):
+    ehr.add_patient({"Name": "Nikhil Bose"})
+    assert "Nikhil Bose" in ehr.get_roster(0, 10, "ni")["names"]
+    assert ehr.delete_patient("Nikhil Bose")
+    assert ehr.get_roster(0, 10, "ni")["total"] == 0
+
+
+def test_resolve_name_only_expands_unique_first_names(ehr):
+    assert ehr.resolve_name("deepak") == "Deepak Negi"
+    assert ehr.resolve_name("REBECA NAGLE") == "Rebeca Nagle"
+    assert ehr.resolve_name("Rahul") == "Rahul"
+    assert ehr.resolve_name("Unknown Person") == "Unknown Person"
+
+
+def test_search_patients_dedupes_aliases(ehr):
+    assert sorted(r["Name"] for r in ehr.search_patients("kidney")) == ["Anita Rao", "Deepak Negi", "Neha Sharma"]
+
+
+def test_reload_picks_up_patients_saved_by_another_process(ehr):
+    other = EHRAdapter(ehr.data_path)
+    assert other.add_patient({"Name": "Nikhil Bose"})["success"]
+    assert ehr.resolve_name("nikhil") == "nikhil"
+    assert ehr.reload_if_changed()
+    assert ehr.resolve_name("nikhil") == "Nikhil Bose"
+    assert not ehr.reload_if_changed()
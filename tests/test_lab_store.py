@@ -0,0 +1,103 @@
+import pytest
+
+from tools.lab_store import LabStore, canonical_test
+
+
+@pytest.fixture
+def labs(tmp_path):
+    store = LabStore(str(tmp_path / "lab_values.sqlite3"))
+    store.add_rows([
+        {"patient": "Deepak Negi", "test": "Glucose", "value": 180, "unit": "mg/dL", "date": "2025-01-10", "source": "a.pdf"},
+        {"patient": "Deepak Negi", "test": "Glucose", "value": 210, "unit": "mg/dL", "date": "2025-03-10", "source": "a.pdf"},
+        {"patient": "Deepak Negi", "test": "Cholesterol", "value": 240, "unit": "mg/dL", "date": "2025-03-10", "source": "a.pdf"},
+        {"patient": "Rebeca Nagle", "test": "Glucose", "value": 95, "unit": "mg/dL", "date": "2025-02-01", "source": "b.pdf"},
+        {"patient": "Rebeca Nagle", "test": "Creat SerPl-mCnc", "value": 2.4, "unit": "mg/dL", "date": "2025-02-01", "source": "b.pdf"},
+    ])
+    return store
+
+
+def test_canonical_test_strips_specimen_and_maps_aliases():
+    assert canonical_test("Creat SerPl-mCnc") == "creatinine"
+    assert canonical_test("Cholesterol") == "total cholesterol"
+    assert canonical_test("HbA1c") == "hba1c"
+
+
+def test_range_query_uses_latest_value_per_patient(labs):
+    result = labs.answer_numeric_query("which patients have glucose > 150")
+    assert result["query"]["type"] == "range"
+    assert [r["patient"] for r in result["rows"]] == ["Deepak Negi"]
+    assert result["rows"][0]["value"] == 210
+
+
+def test_between_is_inclusive(labs):
+    result = labs.answer_numeric_query("creatinine between 2 and 2.4")
+    assert [r["patient"] for r in result["rows"]] == ["Rebeca Nagle"]
+
+
+def test_latest_for_named_patient(labs):
+    result = labs.answer_numeric_query("latest glucose for Deepak", strict=True)
+    assert result["query"] == {"type": "latest", "test": "glucose", "patient": "Deepak Negi"}
+    assert result["rows"][0]["value"] == 210
+
+
+def test_trend_returns_series_oldest_first(labs):
+    result = labs.answer_numeric_query("glucose trend for Deepak", strict=True)
+    assert result["query"]["type"] == "series"
+    assert [r["value"] for r in result["rows"]] == [180, 210]
+
+
+def test_selected_patient_fills_in_missing_name(labs):
+    result = labs.answer_numeric_query("latest creatinine", patient="Rebeca Nagle", strict=True)
+    assert result["rows"][0]["patient"] == "Rebeca Nagle"
+
+
+def test_not_a_lab_question(labs):
+    assert labs.answer_numeric_query("book an appointment for Deepak") is None
+    assert labs.answer_numeric_query("hello") is None
+
+
+@pytest.mark.parametrize("message", [
+    "Book an appointment with a nephrologist for Deepak, his glucose is above 200",
+    "Send email to all patients with glucose over 150",
+    "What is a normal glucose level?",
+    "What is the treatment for high cholesterol?",
+    "Summarize Deepak history and cholesterol",
+])
+def test_strict_mode_leaves_actions_and_general_questions_to_the_planner(labs, message):
+    assert labs.answer_numeric_query(message, patient="Deepak Negi", strict=True) is None
+
+
+def test_what_is_needs_a_named_patient_in_strict_mode(labs):
+    assert labs.answer_numeric_query("what is the glucose level", patient="Deepak Negi", strict=True) is None
+    assert labs.answer_numeric_query("what is Deepak's glucose level", strict=True)["rows"][0]["value"] == 210
+    # As a step of a larger plan the selected patient is enough
+    assert labs.answer_numeric_query("what is the glucose level", patient="Deepak Negi")["rows"][0]["value"] == 210
+
+
+def test_reads_match_first_name_but_deletes_match_exact_key(labs):
+    labs.add_rows([{"patient": "Deepak", "test": "Glucose", "value": 100, "date": "2024-01-01"}])
+    assert len(labs.time_series("Deepak", "glucose")) == 3
+    assert labs.delete_patient("Deepak") == 1
+    assert len(labs.time_series("Deepak Negi", "glucose")) == 2
+
+
+def test_rename_and_delete_source(labs):
+    assert labs.rename_patient("Rebeca Nagle", "Rebeca Smith") == 2
+    assert labs.list_patients() == ["Deepak Negi", "Rebeca Smith"]
+    assert labs.delete_source("a.pdf") == 3
+    assert labs.count() == 2
+
+
+def test_placeholder_and_shared_first_names_fall_back_to_the_selected_patient(labs):
+    labs.add_rows([
+        {"patient": "Patient X", "test": "HbA1c", "value": 9.1, "date": "2025-01-01"},
+        {"patient": "Deepak Negi", "test": "HbA1c", "value": 6.2, "date": "2025-01-01"},
+        {"patient": "Rebeca Smith", "test": "HbA1c", "value": 7.5, "date": "2025-01-01"},
+    ])
+    question = "What is the HbA1c level of the patient?"
+    assert labs.answer_numeric_query(question, patient="Deepak Negi", strict=True) is None
+    assert labs.answer_numeric_query(question, patient="Deepak Negi")["rows"][0]["value"] == 6.2
+    assert labs.answer_numeric_query("what is patient x's hba1c level", strict=True)["rows"][0]["value"] == 9.1
+    # "Rebeca" belongs to two stored patients, so only the full name picks one
+    assert labs.answer_numeric_query("latest hba1c for rebeca", patient="Deepak Negi")["query"]["patient"] == "Deepak Negi"
+    assert labs.answer_numeric_query("latest hba1c for rebeca smith")["rows"][0]["value"] == 7.5
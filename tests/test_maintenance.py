@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+
+from tools import maintenance
+from tools.chunk_index import ChunkIndex
+from tools.lab_store import LabStore
+
+
+def test_purge_dry_run_counts_what_the_purge_deletes(tmp_path):
+    rag = SimpleNamespace(chunk_index=ChunkIndex(str(tmp_path / "patient_chunks.sqlite3")),
+                          lab_store=LabStore(str(tmp_path / "lab_values.sqlite3")))
+    rag.chunk_index.add([("a", "Deepak", "docs"), ("b", "Deepak Negi", "docs"), ("c", "Deepak", "docs-1")])
+    rag.lab_store.add_rows([{"patient": "Deepak", "test": "Glucose", "value": 100},
+                            {"patient": "Deepak Negi", "test": "Glucose", "value": 120}])
+
+    assert maintenance.find_patient_chunks(rag, ["deepak"]) == {"docs": ["a"], "docs-1": ["c"]}
+    assert rag.lab_store.count("Deepak") == 1
+    assert rag.lab_store.count() == 2
+    assert rag.lab_store.delete_patient("Deepak") == 1
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from tools.quantized_index import QuantizedIndex
+
+
+def vectors(n, dim=32, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_search_finds_the_query_vector(mode):
+    data = vectors(200)
+    index = QuantizedIndex(mode)
+    for start in range(0, 200, 16):
+        index.add([f"c{i}" for i in range(start, min(start + 16, 200))], data[start:start + 16])
+    assert len(index) == 200 and index.codes.shape[0] == 200
+    assert index.search(data[123], 1)[0][0] == "c123"
+    assert len(index.search(data[0], 500)) == 200
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        QuantizedIndex("float16")
+
+
+def test_readding_an_id_replaces_it():
+    data = vectors(3)
+    index = QuantizedIndex("int8")
+    index.add(["a", "b"], data[:2])
+    index.add(["a"], data[2:3])
+    assert index.ids == ["b", "a"]
+    assert index.search(data[2], 1)[0][0] == "a"
+
+
+def test_remove_then_add():
+    data = vectors(10)
+    index = QuantizedIndex("int8")
+    index.add([str(i) for i in range(10)], data)
+    index.remove(["0", "5"])
+    index.add(["x"], data[5:6])
+    assert len(index) == 9
+    assert index.search(data[5], 1)[0][0] == "x"
+    assert "0" not in {chunk_id for chunk_id, _ in index.search(data[0], 9)}
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_save_and_load_round_trip(tmp_path, mode):
+    data = vectors(50)
+    index = QuantizedIndex(mode)
+    index.add([f"c{i}" for i in range(50)], data)
+    assert index.dirty
+    prefix = str(tmp_path / f"docs_{mode}")
+    index.save(prefix)
+    assert not index.dirty and index.file_stamp == QuantizedIndex.stamp(prefix)
+
+    loaded = QuantizedIndex.load(prefix)
+    assert loaded.mode == mode and loaded.ids == index.ids
+    assert np.array_equal(loaded.codes, index.codes)
+    assert loaded.search(data[7], 1)[0][0] == "c7"
+    # A loaded index keeps growing like a fresh one
+    loaded.add(["new"], vectors(1, seed=1))
+    assert loaded.search(vectors(1, seed=1)[0], 1)[0][0] == "new"
+
+
+def test_load_missing_or_mismatched(tmp_path):
+    prefix = str(tmp_path / "docs_int8")
+    assert QuantizedIndex.load(prefix) is None
+    index = QuantizedIndex("int8")
+    index.add(["a", "b"], vectors(2))
+    index.save(prefix)
+    other = QuantizedIndex("int8")
+    other.add(["a"], vectors(1))
+    np.savez(prefix + ".npz", codes=other.codes, scales=other.scales)
+    assert QuantizedIndex.load(prefix) is None
+
+
+def test_replace_in_place_leaves_the_source_alone():
+    index, fresh = QuantizedIndex("int8"), QuantizedIndex("int8")
+    fresh.add(["a"], vectors(1))
+    index.replace(fresh)
+    assert index.ids == ["a"]
+    index.add(["b"], vectors(1, seed=2))
+    assert len(index) == 2 and fresh.ids == ["a"]
@@ -0,0 +1,63 @@
+from langchain_core.documents import Document
+
+from tools import retrieval_eval
+from tools.retrieval_eval import build_labels, pareto_front, cheapest_meeting
+
+PAGES = {
+    "/data/deepak.pdf": [
+        ("Patient Name: Deepak Negi\nThe patient reports swelling in both legs since the last visit.", "Deepak Negi"),
+        ("Creatinine remains elevated and a renal ultrasound was ordered for next week.", "Deepak Negi"),
+    ],
+    "/data/notes.pdf": [
+        ("Follow-up note for Rebeca Nagle: asthma is well controlled on the current inhaler.", None),
+    ],
+}
+
+
+def fake_pages(pdf_path):
+    for page, (text, patient) in enumerate(PAGES[pdf_path], start=1):
+        yield Document(page_content=text, metadata={"source": pdf_path, "page": page, "patient": patient}), []
+
+
+def test_build_labels(monkeypatch):
+    monkeypatch.setattr(retrieval_eval, "iter_pdf_pages", fake_pages)
+    labels = build_labels(PAGES, ehr_names=["Rebeca Nagle", "Anita Rao", ""], passages_per_page=1)
+
+    passages = [l for l in labels if l["kind"] == "passage"]
+    assert [(l["source"], l["page"]) for l in passages] == [("deepak.pdf", 1), ("deepak.pdf", 2), ("notes.pdf", 1)]
+    assert all(l["query"] in PAGES["/data/" + l["source"]][l["page"] - 1][0] for l in passages)
+
+    patients = [l["patient"] for l in labels if l["kind"] == "patient"]
+    # Detected report patients plus EHR names mentioned in a report; Anita Rao is never mentioned
+    assert patients == ["Deepak Negi", "Rebeca Nagle"]
+
+
+def test_build_labels_is_seeded(monkeypatch):
+    monkeypatch.setattr(retrieval_eval, "iter_pdf_pages", fake_pages)
+    assert build_labels(PAGES, seed=3) == build_labels(PAGES, seed=3)
+
+
+def row(name, recall, mrr, p95):
+    return {"name": name, "recall_at_k": recall, "mrr": mrr, "p95_ms": p95}
+
+
+def test_pareto_front():
+    rows = [
+        row("float", 0.95, 0.90, 40.0),
+        row("int8", 0.93, 0.88, 12.0),
+        row("binary", 0.80, 0.70, 5.0),
+        row("slow-and-worse", 0.90, 0.85, 50.0),
+        row("int8-copy-slower", 0.93, 0.88, 13.0),
+    ]
+    assert [r["name"] for r in pareto_front(rows)] == ["binary", "int8", "float"]
+
+
+def test_pareto_front_keeps_ties():
+    rows = [row("a", 0.9, 0.8, 10.0), row("b", 0.9, 0.8, 10.0)]
+    assert len(pareto_front(rows)) == 2
+
+
+def test_cheapest_meeting():
+    rows = [row("float", 0.95, 0.90, 40.0), row("int8", 0.93, 0.88, 12.0), row("binary", 0.80, 0.70, 5.0)]
+    assert cheapest_meeting(rows, 0.9)["name"] == "int8"
+    assert cheapest_meeting(rows, 0.99) is None
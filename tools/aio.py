@@ -0,0 +1,30 @@
+import os
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# One bounded pool for the blocking work behind the async tool methods (embedding,
+# Chroma and SQLite reads, SMTP without aiosmtplib), shared by every adapter. Its
+# size caps how much CPU-bound tool work runs at once however many turns are awaiting.
+MAX_THREADS = int(os.getenv("TOOL_ASYNC_THREADS", "8"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix="tool-async")
+    return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Await a blocking call on the shared tool pool; metrics spans still attach to the caller's turn."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(executor(), call)
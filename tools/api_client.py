@@ -0,0 +1,113 @@
+import os
+from typing import Dict, Any, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+
+class APIClient:
+    """
+    Client for api_server.py. Mirrors the signatures of the local tools it stands in
+    for (RAGTool.query, EHRAdapter.get_roster, PatientLifecycle.delete_patient,
+    LabStore.answer_numeric_query, ProviderDirectory.earliest, IngestQueue.list_jobs,
+    AppointmentAdapter.book_appointment, ...), so the UI can use either.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = 120.0):
+        self.base_url = (base_url or os.getenv("AGENT_API_URL", "http://127.0.0.1:8000")).rstrip("/")
+        # One pooled client per process; keeps connections to the API alive between turns
+        self._client = httpx.Client(base_url=self.base_url, timeout=timeout)
+
+    def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        response = self._client.request(method, path, **kwargs)
+        if response.status_code in (429, 503):
+            raise RuntimeError(f"The assistant is busy, please retry in a moment ({response.json().get('detail')}).")
+        response.raise_for_status()
+        return response.json()
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._request("POST", path, json=payload)
+
+    def _get(self, path: str, **params) -> Dict[str, Any]:
+        return self._request("GET", path, params={k: v for k, v in params.items() if v is not None})
+
+    def chat(self, message: str, thread_id: Optional[str] = None, patient_name: Optional[str] = None) -> Dict[str, Any]:
+        """One agent turn: {"thread_id", "response", "patient_name", "current_plan", "results"}."""
+        return self._post("/agent", {"message": message, "thread_id": thread_id, "patient_name": patient_name})
+
+    def query(self, query_text: str, k: int = 3, patient: Optional[str] = None, **_) -> List[str]:
+        return self._post("/rag/query", {"query": query_text, "k": k, "patient": patient})["results"]
+
+    def book_appointment(self, patient_id: str, time: str, doctor_id: str, reason: str = '',
+                         patient_email: str = None) -> Dict[str, Any]:
+        return self._post("/appointments", {"patient_id": patient_id, "time": time, "doctor_id": doctor_id,
+                                            "reason": reason, "patient_email": patient_email})
+
+    # --- EHR and patient lifecycle ---
+
+    def get_roster(self, offset: int = 0, limit: int = 50, prefix: Optional[str] = None) -> Dict[str, Any]:
+        roster = self._get("/ehr/patients", offset=offset, limit=limit, prefix=prefix or None)
+        return {"names": roster["patients"], "total": roster["total"]}
+
+    def get_patient_summary(self, patient_name: str) -> Dict[str, Any]:
+        try:
+            return self._get(f"/ehr/patients/{quote(patient_name, safe='')}")["patient"]
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return {}
+            raise
+
+    def add_patient(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
+        return self._post("/ehr/patients", patient_data)
+
+    def delete_patient(self, patient_name: str) -> Dict[str, Any]:
+        return self._request("DELETE", f"/ehr/patients/{quote(patient_name, safe='')}")
+
+    def rename_patient(self, old_name: str, new_name: str) -> Dict[str, Any]:
+        return self._post(f"/ehr/patients/{quote(old_name, safe='')}/rename", {"new_name": new_name})
+
+    def get_profile(self, patient: str, refresh: bool = False) -> Dict[str, Any]:
+        """The dashboard profile (ProfileStore.get_or_build, run by the API)."""
+        return self._get(f"/ehr/patients/{quote(patient, safe='')}/profile", refresh=str(refresh).lower())
+
+    # --- Lab values ---
+
+    def answer_numeric_query(self, text: str, patient: Optional[str] = None, strict: bool = False) -> Optional[Dict[str, Any]]:
+        return self._post("/labs/query", {"query": text, "patient": patient, "strict": strict})["answer"]
+
+    # --- Providers ---
+
+    def list_providers(self, specialty: Optional[str] = None, location: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Providers with their "next_free" slot, earliest first."""
+        return self._get("/providers", specialty=specialty, location=location)["providers"]
+
+    def specialty_for(self, text: str) -> Dict[str, Any]:
+        return self._get("/providers", symptoms=text)["match"]
+
+    def earliest(self, specialty: str, location: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        for provider in self.list_providers(specialty, location):
+            if provider["next_free"]:
+                return {"provider": provider, "slot": provider["next_free"]}
+        return None
+
+    def next_free(self, provider_id: str) -> Optional[Dict[str, Any]]:
+        slots = self._get(f"/appointments/availability/{quote(provider_id, safe='')}", limit=1)["slots"]
+        return slots[0] if slots else None
+
+    # --- Ingestion ---
+
+    def enqueue_pdf(self, filename: str, data: bytes) -> str:
+        """Upload a PDF to the API host and queue it; returns the job ID."""
+        return self._request("POST", "/ingest", params={"filename": filename}, content=data,
+                             headers={"Content-Type": "application/pdf"})["job_id"]
+
+    def list_jobs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return self._get("/ingest/jobs", limit=limit)["jobs"]
+
+    def pending_count(self) -> int:
+        return self._get("/ingest/jobs", limit=1)["pending"]
+
+    def health(self) -> Dict[str, Any]:
+        response = self._client.get("/health")
+        response.raise_for_status()
+        return response.json()
@@ -1,98 +1,296 @@
-from typing import Dict, Any, List, Optional
+import os
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple, Union
 import uuid
 import datetime
+import threading
+from collections import OrderedDict
 from tools.email_tool import EmailTool
+from tools.booking_store import BookingStore
+from tools import metrics
+
+# Generated slot lists kept per doctor (least recently used days are dropped beyond this)
+CACHE_DAYS = int(os.getenv("APPOINTMENT_CACHE_DAYS", "120"))
+# get_availability() looks this many days ahead when no end is given
+WINDOW_DAYS = int(os.getenv("APPOINTMENT_WINDOW_DAYS", "14"))
+# Bookings live here so the app and every API worker see the same booked slots
+BOOKINGS_DB = os.getenv("BOOKINGS_DB", "./chroma_db/bookings.sqlite3")
+
+Hours = List[Tuple[str, str]]
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_time(value: Union[str, datetime.datetime, None]) -> Optional[datetime.datetime]:
+    """ISO timestamps, or the booking form's "YYYY-MM-DD at HH:MM:SS"; None when unparseable."""
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(str(value).strip().replace(" at ", "T"))
+    except ValueError:
+        return None
+
+
+def _slot_key(start: datetime.datetime) -> str:
+    return start.replace(second=0, microsecond=0).isoformat(timespec="seconds")
+
 
 class AppointmentAdapter:
-    def __init__(self):
-        # provider schedules: doctor_id -> list of slot dicts
-        self._schedules: Dict[str, List[Dict[str, Any]]] = {}
-        self._bookings: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, db_path: Optional[str] = None):
+        # Working-hours rules per doctor; slots are generated from them per day on demand
+        self._rules: Dict[str, Dict[str, Any]] = {}
+        # (doctor_id, day) -> explicitly added slots (add_availability)
+        self._extra_slots: Dict[Tuple[str, datetime.date], List[Dict[str, Any]]] = {}
+        # doctor_id -> day -> generated slots for that day (rules + explicit slots, bookings not applied)
+        self._day_cache: Dict[str, OrderedDict] = {}
+        # (doctor_id, day) -> start keys of slots added as already booked (add_availability)
+        self._booked: Dict[Tuple[str, datetime.date], set] = {}
+        # doctor_id -> change counter, bumped whenever the doctor's free slots may change
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Bookings, indexed by patient and by (doctor, slot start); free slots = day slots minus booked ones
+        self._store = BookingStore(db_path or BOOKINGS_DB)
         self.email_tool = EmailTool()
         # Initialize with some dummy data
         self._init_dummy_data()
 
     def _init_dummy_data(self):
-        self.add_availability("dr_nephrologist", [
-            {"id": "slot1", "start": "2025-01-02T09:00:00", "end": "2025-01-02T09:30:00", "booked": False},
-            {"id": "slot2", "start": "2025-01-02T10:00:00", "end": "2025-01-02T10:30:00", "booked": False},
-        ])
-        self.add_availability("dr_gp", [
-            {"id": "slot3", "start": "2025-01-03T09:00:00", "end": "2025-01-03T09:30:00", "booked": False},
-        ])
+        self.set_working_hours("dr_nephrologist", "09:00", "13:00", weekdays=(0, 2, 4))
+        self.set_working_hours("dr_gp", "09:00", "17:00", breaks=[("12:00", "13:00")])
+        self.set_working_hours("dr_cardiologist", "10:00", "16:00", weekdays=(1, 3), slot_minutes=45)
+        self.set_working_hours("dr_neurologist", "09:00", "12:00", weekdays=(0, 1, 2, 3))
+
+    def set_working_hours(self, doctor_id: str, start: str = "09:00", end: str = "17:00",
+                          weekdays: Iterable[int] = (0, 1, 2, 3, 4), slot_minutes: int = 30,
+                          breaks: Iterable[Tuple[str, str]] = (), hours: Optional[Dict[int, Hours]] = None):
+        """
+        Availability rule for a doctor: `start`-`end` on `weekdays` (0 = Monday), or per-weekday
+        `hours` ({weekday: [("09:00", "12:00"), ...]}), cut into `slot_minutes` slots. Slots
+        overlapping a break are skipped. Replaces the doctor's previous rule (exceptions are kept).
+        """
+        if hours is None:
+            hours = {day: [(start, end)] for day in weekdays}
+        with self._lock:
+            exceptions = self._rules.get(doctor_id, {}).get("exceptions", {})
+            self._rules[doctor_id] = {
+                "hours": {int(day): list(intervals) for day, intervals in hours.items()},
+                "slot_minutes": int(slot_minutes),
+                "breaks": list(breaks),
+                "exceptions": exceptions,
+            }
+            self._day_cache.pop(doctor_id, None)
+            self._bump(doctor_id)
+
+    def add_exception(self, doctor_id: str, day: Union[str, datetime.date], hours: Optional[Hours] = None):
+        """Override one day of a doctor's rule: `hours` replaces that day's working hours; None means closed."""
+        day = datetime.date.fromisoformat(day) if isinstance(day, str) else day
+        with self._lock:
+            rule = self._rules.setdefault(doctor_id, {"hours": {}, "slot_minutes": 30, "breaks": [], "exceptions": {}})
+            rule["exceptions"][day] = list(hours or [])
+            self._day_cache.get(doctor_id, {}).pop(day, None)
+            self._bump(doctor_id)
 
     def add_availability(self, doctor_id: str, slots: List[Dict[str, Any]]):
-        self._schedules.setdefault(doctor_id, []).extend(slots)
+        """Add one-off slots ({"start", "end", ...}) on top of the doctor's working-hours rule."""
+        with self._lock:
+            for slot in slots:
+                start = parse_time(slot["start"])
+                if start is None:
+                    print(f"Skipping slot with unparseable start: {slot.get('start')}")
+                    continue
+                if slot.get("booked"):
+                    self._booked.setdefault((doctor_id, start.date()), set()).add(_slot_key(start))
+                slot = dict(slot, id=slot.get("id") or f"{doctor_id}@{_slot_key(start)}", doctor_id=doctor_id,
+                            start=_slot_key(start), booked=False)
+                self._extra_slots.setdefault((doctor_id, start.date()), []).append(slot)
+                self._day_cache.get(doctor_id, {}).pop(start.date(), None)
+            self._bump(doctor_id)
 
-    def get_availability(self, doctor_id: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
-        # In a real app, filter by start/end
-        return [s for s in self._schedules.get(doctor_id, []) if not s.get('booked')]
+    def _bump(self, doctor_id: str):
+        self._versions[doctor_id] = self._versions.get(doctor_id, 0) + 1
 
-    def book_appointment(self, patient_id: str, time: str, doctor_id: str, reason: str = '', patient_email: str = None) -> Dict[str, Any]:
+    def version(self, doctor_id: str) -> int:
+        """Changes whenever the doctor's rules, exceptions or bookings change (for callers caching free slots)."""
+        # Both counters only grow, so their sum changes whenever either does
+        return self._versions.get(doctor_id, 0) + self._store.version(doctor_id)
+
+    def list_doctors(self) -> List[str]:
+        with self._lock:
+            return sorted(set(self._rules) | {doctor for doctor, _ in self._extra_slots})
+
+    def slot_minutes(self, doctor_id: str) -> int:
+        return self._rules.get(doctor_id, {}).get("slot_minutes", 30)
+
+    def _generate_day(self, doctor_id: str, day: datetime.date) -> List[Dict[str, Any]]:
+        rule = self._rules.get(doctor_id)
+        slots = []
+        if rule:
+            intervals = rule["exceptions"].get(day, rule["hours"].get(day.weekday(), []))
+            length = rule["slot_minutes"]
+            breaks = [(_minutes(a), _minutes(b)) for a, b in rule["breaks"]]
+            midnight = datetime.datetime.combine(day, datetime.time())
+            for begin, finish in intervals:
+                t, finish = _minutes(begin), _minutes(finish)
+                while t + length <= finish:
+                    if not any(t < b_end and t + length > b_start for b_start, b_end in breaks):
+                        start = midnight + datetime.timedelta(minutes=t)
+                        end = start + datetime.timedelta(minutes=length)
+                        slots.append({"id": f"{doctor_id}@{_slot_key(start)}", "doctor_id": doctor_id,
+                                      "start": _slot_key(start), "end": _slot_key(end), "booked": False})
+                    t += length
+        slots.extend(self._extra_slots.get((doctor_id, day), []))
+        slots.sort(key=lambda slot: slot["start"])
+        return slots
+
+    def _day_slots(self, doctor_id: str, day: datetime.date) -> List[Dict[str, Any]]:
+        with self._lock:
+            cache = self._day_cache.setdefault(doctor_id, OrderedDict())
+            slots = cache.get(day)
+            if slots is not None:
+                cache.move_to_end(day)
+                return slots
+            slots = cache[day] = self._generate_day(doctor_id, day)
+            if len(cache) > CACHE_DAYS:
+                cache.popitem(last=False)
+            return slots
+
+    def iter_free_slots(self, doctor_id: str, start: Union[str, datetime.datetime, None] = None,
+                        end: Union[str, datetime.datetime, None] = None) -> Iterator[Dict[str, Any]]:
         """
-        Book an appointment.
-        For this demo, we accept a time string directly and simulate a successful booking
-        if the doctor is available (or just always success for demo purposes).
+        Free slots of a doctor from `start` (default now) up to `end` (default WINDOW_DAYS later),
+        in time order, generated one day at a time so callers that stop early touch only the days they need.
         """
-        # Simulate creating a slot on the fly for the requested time
-        booking_id = str(uuid.uuid4())
-        
-        # Create a mock slot for this booking
-        slot = {
-            "id": str(uuid.uuid4()),
-            "start": time,
-            "end": "30 mins later",
-            "booked": True
-        }
-        
+        start = parse_time(start) or datetime.datetime.now()
+        end = parse_time(end) or start + datetime.timedelta(days=WINDOW_DAYS)
+        first, last = _slot_key(start), _slot_key(end)
+        # One indexed read for the whole window, however many days it spans
+        booked = self._store.booked_between(doctor_id, first, last)
+        day = start.date()
+        while day <= end.date():
+            blocked = self._booked.get((doctor_id, day), ())
+            for slot in self._day_slots(doctor_id, day):
+                if slot["start"] >= last:
+                    return
+                if slot["start"] >= first and slot["start"] not in booked and slot["start"] not in blocked:
+                    yield dict(slot)
+            day += datetime.timedelta(days=1)
+
+    @metrics.traced("appointments.get_availability")
+    def get_availability(self, doctor_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                         limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Free slots between `start` (default now) and `end` (default WINDOW_DAYS later), at most `limit`."""
+        slots = []
+        for slot in self.iter_free_slots(doctor_id, start, end):
+            slots.append(slot)
+            if limit and len(slots) >= limit:
+                break
+        return slots
+
+    def next_free_slot(self, doctor_id: str, after: Union[str, datetime.datetime, None] = None,
+                       horizon_days: int = 60) -> Optional[Dict[str, Any]]:
+        after = parse_time(after) or datetime.datetime.now()
+        return next(self.iter_free_slots(doctor_id, after, after + datetime.timedelta(days=horizon_days)), None)
+
+    def _create_booking(self, patient_id: str, time: str, doctor_id: str, reason: str) -> Dict[str, Any]:
+        """
+        Reserve one of the doctor's slots and record the booking, or return {'success': False, 'error'}
+        when `time` is not one of their generated or added slots ('not-a-slot') or is already booked ('slot-taken').
+        """
+        start = parse_time(time)
+        if start is None:
+            return {'success': False, 'error': 'invalid-time'}
+        key = _slot_key(start)
+        slot = next((s for s in self._day_slots(doctor_id, start.date()) if s["start"] == key), None)
+        if slot is None:
+            return {'success': False, 'error': 'not-a-slot'}
         booking = {
-            'booking_id': booking_id, 
+            'booking_id': str(uuid.uuid4()), 
             'patient_id': patient_id, 
             'doctor_id': doctor_id, 
-            'slot': slot, 
+            'slot': dict(slot, booked=True), 
             'reason': reason,
             'status': 'confirmed'
         }
-        
-        self._bookings[booking_id] = booking
-        
-        # Send Email Confirmation
-        email_status = "Email not sent (no recipient provided)"
-        if patient_email:
-            subject = f"Appointment Confirmation: {doctor_id} at {time}"
-            body = f"""
-            Dear {patient_id},
+        # The store's unique (doctor, slot) key checks and claims the slot in one insert,
+        # so concurrent requests in this or another process cannot book it twice
+        if key in self._booked.get((doctor_id, start.date()), ()) or not self._store.add(booking):
+            return {'success': False, 'error': 'slot-taken'}
+        return booking
+
+    @staticmethod
+    def _confirmation_email(booking: Dict[str, Any], time: str):
+        subject = f"Appointment Confirmation: {booking['doctor_id']} at {time}"
+        body = f"""
+            Dear {booking['patient_id']},
             
             Your appointment has been confirmed.
             
-            Doctor: {doctor_id}
+            Doctor: {booking['doctor_id']}
             Time: {time}
-            Reason: {reason}
-            Booking ID: {booking_id}
+            Reason: {booking['reason']}
+            Booking ID: {booking['booking_id']}
             
             Please arrive 10 minutes early.
             
             Best regards,
             AI Medical Assistant
             """
-            email_res = self.email_tool.send_email(patient_email, subject, body)
-            if email_res.get('success'):
-                email_status = "Email confirmation sent."
-            else:
-                email_status = f"Failed to send email: {email_res.get('error')}"
-        
+        return subject, body
+
+    @staticmethod
+    def _booking_result(booking: Dict[str, Any], time: str, email_res: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if email_res is None:
+            email_status = "Email not sent (no recipient provided)"
+        elif email_res.get('success'):
+            email_status = "Email confirmation sent."
+        else:
+            email_status = f"Failed to send email: {email_res.get('error')}"
         return {
             'success': True, 
-            'message': f"Appointment confirmed for {patient_id} with {doctor_id} at {time}. {email_status}",
+            'message': f"Appointment confirmed for {booking['patient_id']} with {booking['doctor_id']} at {time}. {email_status}",
             'booking': booking
         }
 
+    @metrics.traced("appointments.book")
+    def book_appointment(self, patient_id: str, time: str, doctor_id: str, reason: str = '', patient_email: str = None) -> Dict[str, Any]:
+        """
+        Book one of the doctor's free slots (an ISO time or "YYYY-MM-DD at HH:MM:SS").
+        Times that are not a slot of the doctor, or are already booked, fail without booking.
+        """
+        booking = self._create_booking(patient_id, time, doctor_id, reason)
+        if 'error' in booking:
+            return booking
+        
+        # Send Email Confirmation
+        email_res = None
+        if patient_email:
+            email_res = self.email_tool.send_email(patient_email, *self._confirmation_email(booking, time))
+        return self._booking_result(booking, time, email_res)
+
+    async def abook_appointment(self, patient_id: str, time: str, doctor_id: str, reason: str = '', patient_email: str = None) -> Dict[str, Any]:
+        """book_appointment() for async callers; the confirmation email is sent without blocking the event loop."""
+        booking = self._create_booking(patient_id, time, doctor_id, reason)
+        if 'error' in booking:
+            return booking
+        email_res = None
+        if patient_email:
+            email_res = await self.email_tool.asend_email(patient_email, *self._confirmation_email(booking, time))
+        return self._booking_result(booking, time, email_res)
+
+    @metrics.traced("appointments.cancel")
     def cancel_booking(self, booking_id: str) -> Dict[str, Any]:
-        b = self._bookings.pop(booking_id, None)
-        if not b:
+        if self._store.remove(booking_id) is None:
             return {'success': False, 'error': 'not-found'}
-        doc_slots = self._schedules.get(b['doctor_id'], [])
-        s = next((sl for sl in doc_slots if sl.get('id') == b['slot'].get('id')), None)
-        if s:
-            s['booked'] = False
         return {'success': True}
+
+    def get_patient_bookings(self, patient_id: str) -> List[Dict[str, Any]]:
+        return self._store.for_patient(patient_id)
+
+    def cancel_patient_bookings(self, patient_id: str) -> int:
+        """Cancel every booking of a patient (used when the patient is deleted)."""
+        return sum(1 for b in self.get_patient_bookings(patient_id) if self.cancel_booking(b['booking_id']).get('success'))
+
+    def rename_patient(self, old: str, new: str) -> int:
+        return self._store.rename_patient(old, new)
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional, Set
+
+from tools import metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id TEXT PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    patient_key TEXT NOT NULL,
+    doctor_id TEXT NOT NULL,
+    slot_start TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    reason TEXT,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (doctor_id, slot_start)
+);
+CREATE INDEX IF NOT EXISTS idx_bookings_patient ON bookings (patient_key);
+CREATE TABLE IF NOT EXISTS schedule_versions (
+    doctor_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+_BUMP = ("INSERT INTO schedule_versions (doctor_id, version) VALUES (?, 1) "
+         "ON CONFLICT (doctor_id) DO UPDATE SET version = version + 1")
+
+
+class BookingStore:
+    """
+    SQLite-backed bookings shared by every process that books (the app, each API worker).
+    A slot is claimed by inserting its booking: the (doctor, slot start) unique key makes
+    the check-and-claim one statement, so two processes cannot book the same slot. Every
+    booking or cancellation bumps the doctor's schedule version in the same transaction.
+    """
+
+    def __init__(self, db_path: str = "./chroma_db/bookings.sqlite3"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _booking(row) -> Dict[str, Any]:
+        return {
+            'booking_id': row['booking_id'],
+            'patient_id': row['patient_id'],
+            'doctor_id': row['doctor_id'],
+            'slot': json.loads(row['slot']),
+            'reason': row['reason'],
+            'status': row['status'],
+        }
+
+    def add(self, booking: Dict[str, Any]) -> bool:
+        """Store a booking; False when its slot is already booked."""
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO bookings (booking_id, patient_id, patient_key, doctor_id, slot_start, slot, reason, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (booking['booking_id'], booking['patient_id'], booking['patient_id'].lower(), booking['doctor_id'],
+                     booking['slot']['start'], json.dumps(booking['slot']), booking.get('reason'), booking['status'], time.time()),
+                )
+                conn.execute(_BUMP, (booking['doctor_id'],))
+        except sqlite3.IntegrityError:
+            metrics.incr("appointments.slot_taken")
+            return False
+        return True
+
+    def remove(self, booking_id: str) -> Optional[Dict[str, Any]]:
+        """Delete a booking and return it, or None when there is no such booking."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT * FROM bookings WHERE booking_id = ?", (booking_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM bookings WHERE booking_id = ?", (booking_id,))
+            conn.execute(_BUMP, (row['doctor_id'],))
+        return self._booking(row)
+
+    def for_patient(self, patient_id: str) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM bookings WHERE patient_key = ? ORDER BY slot_start",
+                                (patient_id.lower(),)).fetchall()
+        return [self._booking(row) for row in rows]
+
+    def booked_between(self, doctor_id: str, first: str, last: str) -> Set[str]:
+        """Start keys of the doctor's booked slots in [first, last)."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT slot_start FROM bookings WHERE doctor_id = ? AND slot_start >= ? AND slot_start < ?",
+                                (doctor_id, first, last)).fetchall()
+        return {row[0] for row in rows}
+
+    def rename_patient(self, old: str, new: str) -> int:
+        with self._lock, self._connect() as conn:
+            return conn.execute("UPDATE bookings SET patient_id = ?, patient_key = ? WHERE patient_key = ?",
+                                (new, new.lower(), old.lower())).rowcount
+
+    def version(self, doctor_id: str) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT version FROM schedule_versions WHERE doctor_id = ?", (doctor_id,)).fetchone()
+        return row[0] if row else 0
@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Iterable, Tuple, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patient_chunks (
+    chunk_id TEXT PRIMARY KEY,
+    patient_key TEXT NOT NULL,
+    collection TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_patient_chunks_patient ON patient_chunks (patient_key);
+"""
+
+
+class ChunkIndex:
+    """
+    patient -> chunk id lookup for the vector store, written alongside every Chroma add.
+    Deleting or renaming a patient touches only that patient's rows instead of scanning
+    every chunk's metadata. Chunks without a patient are not indexed.
+    """
+
+    def __init__(self, db_path: str = "./chroma_db/patient_chunks.sqlite3"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def _patient_clause(patient: str, exact: bool = False):
+        # Same matching as LabStore: reads also match a first name against full report names,
+        # writes touch one exact key so "Rahul" never reaches "Rahul Negi"'s chunks
+        key = patient.lower().strip()
+        if exact:
+            return "patient_key = ?", [key]
+        return "(patient_key = ? OR patient_key LIKE ?)", [key, key + " %"]
+
+    def add(self, entries: Iterable[Tuple[str, Optional[str], str]]) -> int:
+        """Record (chunk_id, patient, collection) triples; entries without a patient are skipped."""
+        rows = [(cid, patient.lower().strip(), coll) for cid, patient, coll in entries if patient]
+        if not rows:
+            return 0
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO patient_chunks (chunk_id, patient_key, collection) VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def remove(self, chunk_ids: Iterable[str]) -> None:
+        ids = [(cid,) for cid in chunk_ids]
+        if ids:
+            with self._lock, self._connect() as conn:
+                conn.executemany("DELETE FROM patient_chunks WHERE chunk_id = ?", ids)
+
+    def chunks_for(self, patient: str, exact: bool = False) -> Dict[str, List[str]]:
+        """Chunk ids of a patient grouped by collection; `exact` skips the first-name prefix match."""
+        clause, params = self._patient_clause(patient, exact)
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT collection, chunk_id FROM patient_chunks WHERE {clause}", params).fetchall()
+        found: Dict[str, List[str]] = {}
+        for collection, chunk_id in rows:
+            found.setdefault(collection, []).append(chunk_id)
+        return found
+
+    def move(self, chunk_ids: Iterable[str], collection: str) -> None:
+        ids = [(collection, cid) for cid in chunk_ids]
+        if ids:
+            with self._lock, self._connect() as conn:
+                conn.executemany("UPDATE patient_chunks SET collection = ? WHERE chunk_id = ?", ids)
+
+    def rename(self, old: str, new: str) -> int:
+        clause, params = self._patient_clause(old, exact=True)
+        with self._lock, self._connect() as conn:
+            return conn.execute(f"UPDATE patient_chunks SET patient_key = ? WHERE {clause}", [new.lower().strip()] + params).rowcount
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM patient_chunks").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM patient_chunks")
+
+    def rebuild(self, rag, batch_size: int = 1000) -> int:
+        """Re-derive the index from chunk metadata (stores ingested before the index existed)."""
+        self.clear()
+        total = 0
+        for name in rag.list_collections():
+            collection = rag.get_store(name)._collection
+            for offset in range(0, collection.count(), batch_size):
+                page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+                total += self.add((cid, (m or {}).get("patient"), name) for cid, m in zip(page["ids"], page["metadatas"]))
+        return total
@@ -0,0 +1,191 @@
+import os
+import re
+from typing import List, Optional, Callable
+
+from langchain_core.documents import Document
+
+from tools.embeddings import LOCAL_MODEL_PATH
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces, [CLS] and [SEP] included
+MODEL_MAX_TOKENS = 256
+SPECIAL_TOKENS = 2
+
+# Report section headers ("Subjective Notes:", "Laboratory Results", "Plan Notes") start a new section
+_HEADER_RE = re.compile(
+    r"^(?:history and physical note|patient information|medical conditions|laboratory results|lab results|results|"
+    r"clinical notes|disclaimer|subjective notes|objective notes|assessment(?: notes)?|plan(?: notes| of treatment)?|"
+    r"impression|diagnosis|medications|vital signs|encounters?|past medical history|family history|social history|"
+    r"allergies(?: and adverse reactions)?|immunizations|procedures|problems|interventions|reason for visit|"
+    r"review of systems|physical exam|assessments|general status)\s*:?\s*$",
+    re.I,
+)
+# A new patient header is a hard boundary: chunks never straddle two patients
+_PATIENT_RE = re.compile(r"^\s*(?:Patient(?:\s+Name)?|Name)\s*:\s*\S", re.I)
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def _is_title_block(sections: List[str]) -> bool:
+    """Short heading-only text (no field values, no numbers), e.g. 'SAMPLE MEDICAL REPORT\nPatient Information'."""
+    lines = "\n".join(sections).splitlines()
+    return len(lines) <= 4 and not any(":" in l or re.search(r"\d", l) for l in lines)
+
+
+def load_token_counter(model_path: str = LOCAL_MODEL_PATH) -> Callable[[str], int]:
+    """Word-piece counter from the embedding model's tokenizer.json, or an approximation if unavailable."""
+    tokenizer_file = os.path.join(model_path, "tokenizer.json")
+    if os.path.exists(tokenizer_file):
+        try:
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_file(tokenizer_file)
+            tokenizer.no_truncation()
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+        except Exception as e:
+            print(f"Falling back to approximate token counts: {e}")
+    # Roughly 1.3 word pieces per word for clinical English; punctuation counts separately
+    return lambda text: int(len(re.findall(r"\w+", text)) * 1.3) + len(re.findall(r"[^\w\s]", text))
+
+
+class SemanticChunker:
+    """
+    Splits report text on section headers and patient boundaries and sizes chunks in
+    model tokens so nothing exceeds the embedding model's limit.
+
+    Small neighbouring sections are packed together; a section is only split when it
+    does not fit, and only then is overlap added (the trailing sentences of the previous
+    piece, capped at `max_overlap_tokens`). Continuation chunks repeat the section header.
+    Exposes `split_documents` like the langchain text splitters.
+    """
+
+    def __init__(self, max_tokens: int = MODEL_MAX_TOKENS - SPECIAL_TOKENS, max_overlap_tokens: int = 32,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        self.max_tokens = max_tokens
+        self.max_overlap_tokens = max_overlap_tokens
+        self.count_tokens = count_tokens or load_token_counter()
+
+    def _fits(self, estimate: int, limit: int, text) -> bool:
+        """Summed per-sentence counts drift from the joined count; re-tokenize near the limit."""
+        if estimate <= limit * 0.9:
+            return True
+        return estimate <= limit and self.count_tokens(text()) <= limit
+
+    # --- Segmentation ---
+
+    def _sections(self, text: str):
+        """Yield (header, body_lines, is_patient_start) groups."""
+        header, lines, patient_start = None, [], False
+        for raw in text.splitlines():
+            line = raw.strip()
+            if not line:
+                continue
+            is_patient = bool(_PATIENT_RE.match(line))
+            if _HEADER_RE.match(line) or is_patient:
+                if lines or header:
+                    yield header, lines, patient_start
+                header, lines, patient_start = (None, [line], True) if is_patient else (line, [], False)
+                continue
+            lines.append(line)
+        if lines or header:
+            yield header, lines, patient_start
+
+    def _split_long(self, header: Optional[str], sentences: List[str]) -> List[dict]:
+        """Pack sentences of an oversized section into token-bounded pieces with adaptive overlap."""
+        header_tokens = self.count_tokens(header) + 1 if header else 0
+        budget = self.max_tokens - header_tokens
+        pieces, current, current_tokens, overlap_tokens = [], [], 0, 0
+
+        def flush():
+            nonlocal current, current_tokens, overlap_tokens
+            body = " ".join(s for s, _ in current)
+            pieces.append({"text": f"{header}\n{body}" if header else body,
+                           "tokens": current_tokens + header_tokens, "overlap": overlap_tokens})
+            # Carry trailing sentences forward as overlap, but never more than the cap
+            carry, carry_tokens = [], 0
+            for s, t in reversed(current):
+                if carry_tokens + t > self.max_overlap_tokens:
+                    break
+                carry.insert(0, (s, t))
+                carry_tokens += t
+            current, current_tokens, overlap_tokens = carry, carry_tokens, carry_tokens
+
+        for sentence in sentences:
+            tokens = self.count_tokens(sentence)
+            if tokens > budget:
+                # A single run-on sentence larger than the budget: split on words
+                words = sentence.split()
+                step = max(1, int(len(words) * budget / max(tokens, 1)) - 1)
+                for i in range(0, len(words), step):
+                    part = " ".join(words[i:i + step])
+                    if current:
+                        flush()
+                        current, current_tokens, overlap_tokens = [], 0, 0
+                    current = [(part, self.count_tokens(part))]
+                    current_tokens = current[0][1]
+                continue
+            joined = lambda: " ".join([s for s, _ in current] + [sentence])
+            if current and not self._fits(current_tokens + tokens, budget, joined):
+                flush()
+                # Drop overlap that would leave no room for the new sentence
+                while current and not self._fits(current_tokens + tokens, budget, joined):
+                    current_tokens -= current.pop(0)[1]
+                overlap_tokens = current_tokens
+            current.append((sentence, tokens))
+            current_tokens += tokens
+        if current and current_tokens > overlap_tokens:
+            body = " ".join(s for s, _ in current)
+            pieces.append({"text": f"{header}\n{body}" if header else body,
+                           "tokens": current_tokens + header_tokens, "overlap": overlap_tokens})
+        return pieces
+
+    def split_text(self, text: str) -> List[dict]:
+        """Return chunk dicts: text, tokens, overlap (tokens duplicated from the previous chunk), section."""
+        chunks: List[dict] = []
+        pending, pending_tokens, pending_section = [], 0, None
+
+        def flush_pending():
+            nonlocal pending, pending_tokens, pending_section
+            if pending:
+                chunks.append({"text": "\n".join(pending), "tokens": pending_tokens, "overlap": 0, "section": pending_section})
+            pending, pending_tokens, pending_section = [], 0, None
+
+        for header, lines, patient_start in self._sections(text):
+            # A document title or bare header just above the patient line belongs with that patient
+            if patient_start and not _is_title_block(pending):
+                flush_pending()
+            section_text = "\n".join(([header] if header else []) + lines)
+            tokens = self.count_tokens(section_text)
+            if tokens <= self.max_tokens:
+                # Pack whole sections together while they fit
+                if pending and not self._fits(pending_tokens + tokens + 1, self.max_tokens,
+                                              lambda: "\n".join(pending + [section_text])):
+                    flush_pending()
+                pending.append(section_text)
+                pending_tokens += tokens + (1 if len(pending) > 1 else 0)
+                pending_section = pending_section or header
+                continue
+            flush_pending()
+            sentences = [s.strip() for s in _SENTENCE_RE.split("\n".join(lines)) if s and s.strip()]
+            for piece in self._split_long(header, sentences):
+                piece["section"] = header
+                chunks.append(piece)
+        flush_pending()
+        return chunks
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        out = []
+        for doc in documents:
+            for chunk in self.split_text(doc.page_content):
+                metadata = dict(doc.metadata)
+                metadata["tokens"] = chunk["tokens"]
+                if chunk.get("section"):
+                    metadata["section"] = chunk["section"]
+                out.append(Document(page_content=chunk["text"], metadata=metadata))
+        return out
+
+
+def make_text_splitter(strategy: Optional[str] = None):
+    """'recursive' (1000/200 characters, the original behaviour) or 'semantic' (token-sized, section-aware)."""
+    strategy = (strategy or os.getenv("RAG_CHUNKER", "recursive")).lower()
+    if strategy == "semantic":
+        return SemanticChunker()
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
@@ -1,36 +1,121 @@
 import pandas as pd
 import os
+import bisect
+import pickle
 from typing import Dict, Any, List, Optional
+from tools import metrics
+
+# Bump when normalize_records changes so old caches are re-parsed
+_CACHE_VERSION = 2
+
+
+def _phone_text(value: Any) -> str:
+    # A column with blanks is read as float, so 7982179305 arrives as 7982179305.0
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def normalize_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Column-wise cleanup of the sheet into plain-Python record dicts (NaN -> None)."""
+    if 'Name' not in df.columns:
+        return []
+    df = df.copy()
+    df['Name'] = df['Name'].astype('string').str.strip()
+    df = df[df['Name'].notna() & (df['Name'] != '')]
+    if 'Age' in df.columns:
+        df['Age'] = pd.to_numeric(df['Age'], errors='coerce').astype('Int64')
+    if 'Phone_number' in df.columns:
+        # Numbers typed without "+" are read as integers (floats if any row is blank); keep every phone a string
+        df['Phone_number'] = df['Phone_number'].map(_phone_text, na_action='ignore')
+    # object dtype turns NumPy scalars into Python values, so records compare and serialize cleanly
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
 
 class EHRAdapter:
     def __init__(self, data_path: str = "data/records.xlsx"):
         self.data_path = data_path
         self._records = {}
+        # Sorted roster built on first use and dropped on every add/delete/rename
+        self._roster: Optional[List[str]] = None
+        self._roster_keys: Optional[List[tuple]] = None
+        # first name -> full names of the patients who have it, for resolving report names
+        self._first_names: Optional[Dict[str, List[str]]] = None
+        # (mtime, size) of the workbook as last loaded, for reload_if_changed()
+        self._file_stamp = None
         self._load_data()
 
+    def _cache_path(self) -> str:
+        folder, name = os.path.split(os.path.abspath(self.data_path))
+        return os.path.join(folder, f".{name}.cache.pkl")
+
+    @staticmethod
+    def _index_records(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        index = {}
+        for row_data in records:
+            name = row_data['Name'].lower()
+            index[name] = row_data
+            # Also index by first name for convenience
+            first_name = name.split()[0]
+            if first_name not in index:
+                index[first_name] = row_data
+        return index
+
+    @metrics.traced("ehr.load")
     def _load_data(self):
-        if os.path.exists(self.data_path):
-            try:
-                df = pd.read_excel(self.data_path)
-                # Create a dictionary keyed by Name (lowercase for easier search)
-                for _, row in df.iterrows():
-                    # Handle potential NaN values
-                    row_data = row.where(pd.notnull(row), None).to_dict()
-                    if row_data.get('Name'):
-                        name = row_data['Name'].lower()
-                        self._records[name] = row_data
-                        # Also index by first name for convenience
-                        first_name = name.split()[0]
-                        if first_name not in self._records:
-                             self._records[first_name] = row_data
-            except Exception as e:
-                print(f"Error loading EHR data: {e}")
-        else:
+        if not os.path.exists(self.data_path):
             print(f"Warning: EHR data file not found at {self.data_path}")
+            return
+        try:
+            stat = os.stat(self.data_path)
+            self._file_stamp = (stat.st_mtime_ns, stat.st_size)
+            # Parsing the workbook dominates load time; reuse the parsed records while the file is unchanged
+            cache_key = (_CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+            cache_path = self._cache_path()
+            records = None
+            if os.path.exists(cache_path):
+                try:
+                    with open(cache_path, 'rb') as f:
+                        cached = pickle.load(f)
+                    if cached.get('key') == cache_key:
+                        records = cached['records']
+                        metrics.incr("ehr.cache_hit")
+                except Exception as e:
+                    print(f"Ignoring unreadable EHR cache {cache_path}: {e}")
+            if records is None:
+                records = normalize_records(pd.read_excel(self.data_path))
+                try:
+                    with open(cache_path + '.tmp', 'wb') as f:
+                        pickle.dump({'key': cache_key, 'records': records}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(cache_path + '.tmp', cache_path)
+                except OSError as e:
+                    print(f"Could not write EHR cache: {e}")
+            # Keyed by Name (lowercase for easier search); swapped in whole, so a reload never shows readers a half-built index
+            self._records = self._index_records(records)
+        except Exception as e:
+            print(f"Error loading EHR data: {e}")
 
+    def reload_if_changed(self) -> bool:
+        """Re-read the workbook if another process (the app) saved it since it was loaded here."""
+        try:
+            stat = os.stat(self.data_path)
+        except OSError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) == self._file_stamp:
+            return False
+        self._load_data()
+        self._invalidate_roster()
+        return True
+
+    @metrics.traced("ehr.get_patient_summary")
     def get_patient_summary(self, patient_name: str) -> Dict[str, Any]:
         return self._records.get(patient_name.lower(), {})
 
+    async def aget_patient_summary(self, patient_name: str) -> Dict[str, Any]:
+        # The roster is in memory, so this never blocks; it exists so async callers treat all tools alike
+        return self.get_patient_summary(patient_name)
+
     def get_patient_history(self, patient_name: str) -> str:
         p = self.get_patient_summary(patient_name)
         if not p:
@@ -41,14 +126,66 @@ class EHRAdapter:
         return history
 
     def get_all_patient_names(self) -> List[str]:
-        """Return a list of unique patient names."""
-        # Filter out the first-name aliases by checking if the key matches the 'Name' field
-        names = set()
-        for key, data in self._records.items():
-            if data.get('Name'):
-                names.add(data['Name'])
-        return list(names)
+        """Return the unique patient names, sorted case-insensitively."""
+        return list(self._build_roster())
 
+    def _build_roster(self) -> List[str]:
+        if self._roster is None:
+            # First-name aliases point at the same record, so dedupe by Name
+            names = {data['Name'] for data in self._records.values() if data.get('Name')}
+            self._roster = sorted(names, key=lambda n: (n.lower(), n))
+            # Type-ahead index: one (word-start key, name) entry per word, so "ne" finds "Rahul Negi"
+            keys = []
+            for name in self._roster:
+                words = name.lower().split()
+                keys.extend((" ".join(words[i:]), name) for i in range(len(words)))
+            keys.sort()
+            self._roster_keys = keys
+            first_names: Dict[str, List[str]] = {}
+            for name in self._roster:
+                first_names.setdefault(name.lower().split()[0], []).append(name)
+            self._first_names = first_names
+        return self._roster
+
+    def _invalidate_roster(self):
+        self._roster = None
+        self._roster_keys = None
+        self._first_names = None
+
+    def resolve_name(self, name: str) -> str:
+        """
+        The EHR's full name for a patient named in a report: the record's Name for an exact
+        match, or the one patient with that first name. Ambiguous or unknown names are returned as given.
+        """
+        key = (name or "").lower().strip()
+        record = self._records.get(key)
+        if record and record.get('Name', '').lower() == key:
+            return record['Name']
+        self._build_roster()
+        matches = self._first_names.get(key, [])
+        return matches[0] if len(matches) == 1 else name
+
+    @metrics.traced("ehr.get_roster")
+    def get_roster(self, offset: int = 0, limit: int = 50, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        One page of the sorted roster: {'names': [...], 'total': matches}. With `prefix`,
+        only names with a word starting with it (case-insensitive), found by bisecting
+        the word index rather than scanning every record.
+        """
+        roster = self._build_roster()
+        prefix = (prefix or "").strip().lower()
+        if not prefix:
+            matches = roster
+        else:
+            keys = self._roster_keys
+            lo = bisect.bisect_left(keys, (prefix,))
+            hi = bisect.bisect_left(keys, (prefix + "\uffff",))
+            found = {name for _, name in keys[lo:hi]}
+            matches = sorted(found, key=lambda n: (n.lower(), n))
+        offset = max(0, offset)
+        return {'names': matches[offset:offset + limit] if limit else [], 'total': len(matches)}
+
+    @metrics.traced("ehr.search_patients")
     def search_patients(self, keyword: str) -> List[Dict[str, Any]]:
         """Search for patients with a specific keyword in their summary."""
         results = []
@@ -84,6 +221,7 @@ class EHRAdapter:
                 return {'success': False, 'error': 'Name is required'}
             
             # Update in-memory
+            self._invalidate_roster()
             self._records[name.lower()] = patient_data
             first_name = name.split()[0].lower()
             self._records[first_name] = patient_data
@@ -103,6 +241,7 @@ class EHRAdapter:
         try:
             name_lower = patient_name.lower()
             if name_lower in self._records:
+                self._invalidate_roster()
                 del self._records[name_lower]
                 
                 # Also try to remove the first-name alias if it points to the same record
@@ -117,6 +256,24 @@ class EHRAdapter:
             print(f"Error deleting patient: {e}")
             return False
 
+    def rename_patient(self, old_name: str, new_name: str) -> Dict[str, Any]:
+        """Rename a patient (record and first-name alias) and save to disk."""
+        record = self._records.get(old_name.lower())
+        if not record:
+            return {'success': False, 'error': 'Patient not found'}
+        if new_name.lower() in self._records and self._records[new_name.lower()] is not record:
+            return {'success': False, 'error': f'A patient named {new_name} already exists'}
+        self._invalidate_roster()
+        for key in [k for k, v in self._records.items() if v is record]:
+            del self._records[key]
+        record['Name'] = new_name
+        self._records[new_name.lower()] = record
+        first_name = new_name.split()[0].lower()
+        if first_name not in self._records:
+            self._records[first_name] = record
+        return self._save_data()
+
+    @metrics.traced("ehr.save")
     def _save_data(self) -> Dict[str, Any]:
         """Persist current records to Excel."""
         try:
@@ -132,6 +289,8 @@ class EHRAdapter:
                     return {'success': False, 'error': 'File is open in another program. Please close records.xlsx and try again.'}
             
             df.to_excel(self.data_path, index=False)
+            stat = os.stat(self.data_path)
+            self._file_stamp = (stat.st_mtime_ns, stat.st_size)
             return {'success': True}
         except Exception as e:
             print(f"Error saving data: {e}")
@@ -1,11 +1,38 @@
+import asyncio
 import smtplib
+import weakref
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 from dotenv import load_dotenv
+from tools import metrics
+from tools.aio import run_blocking
+
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
 
 load_dotenv()
 
+# Logged-in aiosmtplib connections shared by every EmailTool: event loop -> (server, port, sender)
+# -> connection. Sends on one connection are serialized by its lock. Weakly keyed by the loop,
+# so a finished loop's entries go with it.
+_smtp_pool = weakref.WeakKeyDictionary()
+
+
+async def aclose_connections():
+    """Log out of the running loop's pooled SMTP connections (API shutdown)."""
+    entries = _smtp_pool.pop(asyncio.get_running_loop(), {})
+    for entry in entries.values():
+        smtp = entry["smtp"]
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except Exception as e:
+                print(f"Error closing SMTP connection: {e}")
+
+
 class EmailTool:
     def __init__(self):
         self.sender_email = os.getenv("EMAIL_SENDER")
@@ -13,6 +40,15 @@ class EmailTool:
         self.smtp_server = "smtp.gmail.com"
         self.smtp_port = 587
 
+    def _build_message(self, recipient_email: str, subject: str, body: str) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = self.sender_email
+        msg['To'] = recipient_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
+    @metrics.traced("email.send")
     def send_email(self, recipient_email: str, subject: str, body: str) -> dict:
         """
         Sends an email to the specified recipient.
@@ -21,12 +57,7 @@ class EmailTool:
             return {"success": False, "error": "Email credentials not configured."}
 
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.sender_email
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-
-            msg.attach(MIMEText(body, 'plain'))
+            msg = self._build_message(recipient_email, subject, body)
 
             server = smtplib.SMTP(self.smtp_server, self.smtp_port)
             server.starttls()
@@ -34,8 +65,49 @@ class EmailTool:
             text = msg.as_string()
             server.sendmail(self.sender_email, recipient_email, text)
             server.quit()
-            
+
+            metrics.incr("email.sent")
+            return {"success": True, "message": f"Email sent to {recipient_email}"}
+
+        except Exception as e:
+            metrics.incr("email.failed")
+            return {"success": False, "error": str(e)}
+
+    def _pool_entry(self):
+        entries = _smtp_pool.setdefault(asyncio.get_running_loop(), {})
+        key = (self.smtp_server, self.smtp_port, self.sender_email)
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = {"smtp": None, "lock": asyncio.Lock()}
+        return entry
+
+    async def asend_email(self, recipient_email: str, subject: str, body: str) -> dict:
+        """
+        send_email() for async callers. With aiosmtplib installed the message goes over a
+        shared, already logged-in connection without blocking the event loop; otherwise
+        the blocking send runs on the shared tool pool.
+        """
+        if not self.sender_email or not self.password:
+            return {"success": False, "error": "Email credentials not configured."}
+        if aiosmtplib is None:
+            return await run_blocking(self.send_email, recipient_email, subject, body)
+
+        entry = self._pool_entry()
+        try:
+            msg = self._build_message(recipient_email, subject, body)
+            with metrics.span("email.send"):
+                async with entry["lock"]:
+                    smtp = entry["smtp"]
+                    if smtp is None or not smtp.is_connected:
+                        smtp = aiosmtplib.SMTP(hostname=self.smtp_server, port=self.smtp_port, start_tls=True)
+                        await smtp.connect()
+                        await smtp.login(self.sender_email, self.password)
+                        entry["smtp"] = smtp
+                    await smtp.send_message(msg)
+            metrics.incr("email.sent")
             return {"success": True, "message": f"Email sent to {recipient_email}"}
-        
         except Exception as e:
+            metrics.incr("email.failed")
+            # Drop the connection; the next send reconnects
+            entry["smtp"] = None
             return {"success": False, "error": str(e)}
@@ -0,0 +1,135 @@
+import os
+import sys
+import atexit
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+from typing import List, Optional, Callable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Model inherited from the parent on fork (copy-on-write), or built by the worker initializer
+_worker_model = None
+
+
+def _limit_threads(threads: int):
+    # Each worker gets a slice of the cores; library defaults would each claim all of them
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "ONNX_THREADS"):
+        os.environ[var] = str(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+def _init_worker(factory: Optional[Callable], threads: int):
+    global _worker_model
+    _limit_threads(threads)
+    if _worker_model is None:
+        _worker_model = factory()
+
+
+def _attach(shm_name: str) -> shared_memory.SharedMemory:
+    # The parent owns (and unlinks) the block; a worker attaching must not register it for cleanup too
+    try:
+        return shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:  # Python < 3.13: skip the registration (workers run one task at a time)
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=shm_name)
+        finally:
+            resource_tracker.register = register
+
+
+def _embed_into(shm_name: str, shape, start: int, texts: List[str]) -> int:
+    """Runs in a worker: embed a micro-batch and write it to rows [start, start + len) of the shared output."""
+    vectors = np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+    shm = _attach(shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = vectors
+        del out
+    finally:
+        shm.close()
+    return len(texts)
+
+
+def _embed_query(text: str) -> List[float]:
+    return _worker_model.embed_query(text)
+
+
+def _dimension() -> int:
+    return len(_worker_model.embed_query("dimension probe"))
+
+
+class ProcessPoolEmbeddings(Embeddings):
+    """
+    Embeds on a persistent pool of worker processes so ingest uses every core instead of
+    one GIL-bound interpreter. Texts are cut into micro-batches that idle workers pick up
+    as they finish; each worker writes its vectors straight into one shared-memory float32
+    array per call, so only batch offsets cross the process boundary, not pickled vectors.
+
+    With `share_weights` (fork start method), `factory` is called once in the parent before
+    the workers are forked and they inherit the model copy-on-write. Otherwise (spawn, or
+    backends such as onnxruntime that must not be forked after loading) each worker builds
+    its own copy.
+    """
+
+    def __init__(self, factory: Callable, workers: Optional[int] = None, batch_size: Optional[int] = None,
+                 share_weights: bool = True):
+        self.factory = factory
+        self.workers = workers or int(os.getenv("EMBEDDING_POOL_WORKERS", "0")) or (os.cpu_count() or 1)
+        self.batch_size = batch_size or int(os.getenv("EMBEDDING_POOL_BATCH", "32"))
+        self.share_weights = share_weights and "fork" in mp.get_all_start_methods()
+        self._pool = None
+        self._dim = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        global _worker_model
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                if self.share_weights:
+                    # Load before forking; the parent never runs inference, so no thread pools exist yet
+                    _worker_model = self.factory()
+                    ctx, factory = mp.get_context("fork"), None
+                else:
+                    ctx, factory = mp.get_context("spawn"), self.factory
+                print(f"Starting embedding pool: {self.workers} processes x {threads} threads "
+                      f"({'shared' if self.share_weights else 'per-process'} weights)")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                                 initializer=_init_worker, initargs=(factory, threads))
+                self._dim = self._pool.submit(_dimension).result()
+                atexit.register(self.close)
+            return self._pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Vectors as one (len(texts), dim) float32 array."""
+        pool = self._get_pool()
+        shape = (len(texts), self._dim)
+        if not texts:
+            return np.zeros(shape, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(texts) * self._dim * 4))
+        try:
+            futures = [pool.submit(_embed_into, shm.name, shape, start, texts[start:start + self.batch_size])
+                       for start in range(0, len(texts), self.batch_size)]
+            for future in futures:
+                future.result()
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._get_pool().submit(_embed_query, text).result()
@@ -0,0 +1,74 @@
+import os
+import threading
+
+from tools import metrics
+
+LOCAL_MODEL_PATH = "./local_embeddings_model"
+
+# "torch": HuggingFaceEmbeddings over sentence-transformers (default)
+# "onnx":  exported ONNX model on onnxruntime; torch is never imported
+# "pool":  EMBEDDING_POOL_BACKEND ("torch" or "onnx") on a pool of worker processes
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+
+_shared_embeddings = None
+_lock = threading.Lock()
+
+
+def _build_onnx_embeddings():
+    from tools.onnx_embeddings import OnnxEmbeddings
+    quantized = os.getenv("ONNX_QUANTIZED", "1").lower() in ("1", "true", "yes")
+    return OnnxEmbeddings(LOCAL_MODEL_PATH, quantized=quantized,
+                          batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")))
+
+
+def _build_torch_embeddings():
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    # Use the locally downloaded model path
+    if os.path.exists(LOCAL_MODEL_PATH):
+        return HuggingFaceEmbeddings(model_name=LOCAL_MODEL_PATH, model_kwargs={'device': 'cpu'})
+    # Fallback to online if local folder missing
+    return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={'device': 'cpu'})
+
+
+def _build_pool_embeddings():
+    from tools.embedding_pool import ProcessPoolEmbeddings
+    base = os.getenv("EMBEDDING_POOL_BACKEND", "torch").lower()
+    if base == "onnx":
+        # onnxruntime sessions must not be forked after creation; each worker loads its own (small) copy
+        return ProcessPoolEmbeddings(_build_onnx_embeddings, share_weights=False)
+    return ProcessPoolEmbeddings(_build_torch_embeddings, share_weights=True)
+
+
+def _build_embeddings():
+    if EMBEDDING_BACKEND == "onnx":
+        try:
+            return _build_onnx_embeddings()
+        except Exception as e:
+            print(f"Failed to initialize ONNX embeddings, falling back to sentence-transformers: {e}")
+    elif EMBEDDING_BACKEND == "pool":
+        return _build_pool_embeddings()
+
+    print("Initializing HuggingFaceEmbeddings (Local Model)...")
+    try:
+        return _build_torch_embeddings()
+    except Exception as e:
+        print(f"Failed to initialize HuggingFaceEmbeddings: {e}")
+        # Fallback to OpenAI if HF fails
+        import httpx
+        from langchain_openai import OpenAIEmbeddings
+        # On Windows (Local), we disable SSL verify. On Linux (Cloud), we use default.
+        http_client = httpx.Client(verify=False) if os.name == 'nt' else None
+        return OpenAIEmbeddings(model="text-embedding-ada-002", http_client=http_client)
+
+
+def get_embeddings():
+    """
+    Process-wide embedding model. app.py and the agent graph each build a RAGTool;
+    sharing one instance keeps a single copy of the model weights in memory.
+    """
+    global _shared_embeddings
+    with _lock:
+        if _shared_embeddings is None:
+            # Time embedding separately from Chroma work (no-op unless METRICS_ENABLED)
+            _shared_embeddings = metrics.instrument_embeddings(_build_embeddings())
+        return _shared_embeddings
@@ -0,0 +1,166 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+from tools import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    error TEXT,
+    pages INTEGER,
+    chunks INTEGER,
+    lab_rows INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ingest_status_created ON ingest_jobs (status, created_at);
+"""
+
+
+class IngestQueue:
+    """
+    SQLite-backed queue of PDF ingestion jobs shared by the Streamlit app (producer)
+    and ingest_worker.py (consumer). Any number of app or worker processes can use
+    the same file; claiming is a single write transaction so each job runs once.
+    """
+
+    def __init__(self, db_path: str = "./chroma_db/ingest_jobs.sqlite3"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # --- Producer ---
+
+    def enqueue(self, path: str) -> str:
+        """Queue a PDF for ingestion and return the job ID immediately."""
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ingest_jobs (id, path, status, message, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, path, QUEUED, "Waiting for worker", now, now),
+            )
+        metrics.incr("ingest.jobs_queued")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, limit: int = 10, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM ingest_jobs"
+        params: list = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+    def pending_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM ingest_jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+
+    def last_finished(self) -> Optional[float]:
+        """When the most recent job finished (done or failed); changes whenever a worker wrote chunks."""
+        with self._connect() as conn:
+            return conn.execute("SELECT MAX(finished_at) FROM ingest_jobs WHERE status IN (?, ?)", (DONE, FAILED)).fetchone()[0]
+
+    # --- Consumer ---
+
+    def claim(self, limit: int = 1) -> List[Dict[str, Any]]:
+        """Atomically move up to `limit` of the oldest queued jobs to running."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                # BEGIN IMMEDIATE takes the write lock up front so two workers cannot claim the same row
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    "SELECT * FROM ingest_jobs WHERE status = ? ORDER BY created_at LIMIT ?", (QUEUED, limit)
+                ).fetchall()
+                for row in rows:
+                    conn.execute(
+                        "UPDATE ingest_jobs SET status = ?, started_at = ?, updated_at = ?, attempts = attempts + 1, "
+                        "progress = 0, message = ? WHERE id = ?",
+                        (RUNNING, now, now, "Parsing", row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        return [dict(r, status=RUNNING) for r in rows]
+
+    def update_progress(self, job_id: str, progress: float, message: Optional[str] = None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE ingest_jobs SET progress = ?, message = COALESCE(?, message), updated_at = ? WHERE id = ?",
+                (min(max(progress, 0.0), 1.0), message, time.time(), job_id),
+            )
+
+    def complete(self, job_id: str, pages: int, chunks: int, lab_rows: int):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, progress = 1, message = ?, pages = ?, chunks = ?, lab_rows = ?, "
+                "finished_at = ?, updated_at = ? WHERE id = ?",
+                (DONE, f"Ingested {chunks} chunks from {pages} pages", pages, chunks, lab_rows, now, now, job_id),
+            )
+        metrics.incr("ingest.jobs_done")
+
+    def fail(self, job_id: str, error: str):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, message = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                (FAILED, "Failed", error, now, now, job_id),
+            )
+        metrics.incr("ingest.jobs_failed")
+
+    def requeue_stale(self, timeout: float = 600.0, max_attempts: int = 3) -> int:
+        """Return jobs whose worker stopped reporting progress to the queue (or fail them after max_attempts)."""
+        cutoff = time.time() - timeout
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, error = ?, message = ? WHERE status = ? AND updated_at < ? AND attempts >= ?",
+                (FAILED, "Worker stopped responding", "Failed", RUNNING, cutoff, max_attempts),
+            )
+            return conn.execute(
+                "UPDATE ingest_jobs SET status = ?, message = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, "Requeued after worker timeout", RUNNING, cutoff),
+            ).rowcount
+
+    def purge_finished(self, older_than: float = 7 * 24 * 3600) -> int:
+        with self._lock, self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM ingest_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, time.time() - older_than),
+            ).rowcount
@@ -0,0 +1,347 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+from tools import metrics
+
+# Short lab codes used by EHR exports -> the names clinicians type
+TEST_ALIASES = {
+    "creat": "creatinine",
+    "glucose": "glucose",
+    "fasting blood glucose": "glucose",
+    "hgb": "hemoglobin",
+    "hb": "hemoglobin",
+    "a1c": "hba1c",
+    "hemoglobin a1c": "hba1c",
+    "cholest": "total cholesterol",
+    "cholesterol": "total cholesterol",
+    "trigl": "triglycerides",
+    "hdlc": "hdl cholesterol",
+    "hdl": "hdl cholesterol",
+    "ldlc": "ldl cholesterol",
+    "ldl": "ldl cholesterol",
+    "egfrcr": "egfr",
+    "bun": "bun",
+    "tsh": "tsh",
+}
+
+# Specimen / method suffixes in LOINC-style names ("Creat SerPl-mCnc", "Hgb Bld-mCnc")
+_SPECIMEN_RE = re.compile(r"\b(?:serpl\w*|serplbld|ser|bld|auto|calc|rbc|qn|nfr|vfr|rto|mcnc|scnc|ccnc|acnc)\b.*$", re.I)
+
+
+def canonical_test(name: str) -> str:
+    """Normalize a lab test name to the key used for indexing and lookups."""
+    cleaned = re.sub(r"\s+", " ", re.sub(r"[^a-z0-9/# ]+", " ", name.lower())).strip()
+    # Keep the full name if stripping would leave nothing ("RBC # Bld Auto")
+    key = _SPECIMEN_RE.sub("", cleaned).strip() or cleaned
+    return TEST_ALIASES.get(key, key)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lab_values (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient TEXT,
+    patient_key TEXT,
+    test TEXT NOT NULL,
+    test_key TEXT NOT NULL,
+    date TEXT,
+    value REAL NOT NULL,
+    unit TEXT,
+    ref_low REAL,
+    ref_high REAL,
+    ref_text TEXT,
+    source TEXT,
+    page INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_lab_test_value ON lab_values (test_key, value);
+CREATE INDEX IF NOT EXISTS idx_lab_patient_test_date ON lab_values (patient_key, test_key, date);
+CREATE INDEX IF NOT EXISTS idx_lab_source ON lab_values (source);
+"""
+
+# Words that make a message more than a lab lookup: an action to take, or a general-knowledge
+# question. Such messages are planned normally; the lab lookup can still be one of their steps.
+_NOT_LOOKUP_RE = re.compile(
+    r"\b(book\w*|appointment\w*|schedul\w*|email\w*|e-mail|send|mail|campaign|notify|remind\w*|"
+    r"treat\w*|normal|healthy|typical|target|diet|caus\w*|symptom\w*|medication\w*|recommend\w*|"
+    r"manag\w*|reduc\w*|improv\w*|explain|why|how|mean\w*|summar\w*|report|document\w*)\b"
+)
+
+# Words that appear as report placeholders ("Patient: Patient X") and in ordinary questions
+# ("the patient's glucose"); a stored name made of one of these never names a patient in text
+_COMMON_NAME_WORDS = {
+    "patient", "patients", "test", "tests", "name", "unknown", "mr", "mrs", "ms", "dr", "doctor",
+    "the", "a", "an", "lab", "report", "sample", "male", "female", "x",
+}
+
+_COLUMNS = ("patient", "test", "date", "value", "unit", "ref_low", "ref_high", "ref_text", "source", "page")
+
+
+class LabStore:
+    """
+    Typed, indexed table of lab observations keyed by (patient, test, date, value, unit),
+    filled at ingest time from the PDF parser. Numeric questions ("creatinine > 2",
+    "latest HbA1c for Deepak") are answered from here without vector search or an LLM.
+    """
+
+    def __init__(self, db_path: str = "./chroma_db/lab_values.sqlite3"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # --- Writes ---
+
+    def add_rows(self, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        records = [
+            (
+                r.get("patient"),
+                (r.get("patient") or "").lower().strip() or None,
+                r["test"],
+                canonical_test(r["test"]),
+                r.get("date"),
+                float(r["value"]),
+                r.get("unit"),
+                r.get("ref_low"),
+                r.get("ref_high"),
+                r.get("ref_text"),
+                r.get("source"),
+                r.get("page"),
+            )
+            for r in rows
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO lab_values (patient, patient_key, test, test_key, date, value, unit, ref_low, ref_high, ref_text, source, page) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+        metrics.incr("labs.rows_added", len(records))
+        return len(records)
+
+    def delete_source(self, source: str) -> int:
+        """Remove rows from one document (called before re-ingesting it)."""
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM lab_values WHERE source = ?", (source,)).rowcount
+
+    def delete_patient(self, patient: str) -> int:
+        clause, params = self._patient_clause(patient, exact=True)
+        with self._lock, self._connect() as conn:
+            return conn.execute(f"DELETE FROM lab_values WHERE {clause}", params).rowcount
+
+    def rename_patient(self, old: str, new: str) -> int:
+        clause, params = self._patient_clause(old, exact=True)
+        with self._lock, self._connect() as conn:
+            return conn.execute(
+                f"UPDATE lab_values SET patient = ?, patient_key = ? WHERE {clause}",
+                [new, new.lower()] + params,
+            ).rowcount
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM lab_values")
+
+    # --- Reads ---
+
+    @staticmethod
+    def _patient_clause(patient: str, exact: bool = False):
+        # Reads match the full name or a first-name prefix ("Rebeca" -> "Rebeca Nagle");
+        # deletes and renames match one exact key so they never reach another patient's rows
+        key = patient.lower().strip()
+        if exact:
+            return "patient_key = ?", [key]
+        return "(patient_key = ? OR patient_key LIKE ?)", [key, key + " %"]
+
+    def _test_clause(self, conn, test: str):
+        key = canonical_test(test)
+        exists = conn.execute("SELECT 1 FROM lab_values WHERE test_key = ? LIMIT 1", (key,)).fetchone()
+        if exists:
+            return "test_key = ?", [key]
+        # Fall back to a substring match ("cholesterol" -> "hdl cholesterol", "ldl cholesterol")
+        return "test_key LIKE ?", [f"%{key}%"]
+
+    @staticmethod
+    def _rows(cursor) -> List[Dict[str, Any]]:
+        return [{k: row[k] for k in _COLUMNS} for row in cursor.fetchall()]
+
+    @metrics.traced("labs.query_range")
+    def query_range(self, test: str, min_value: Optional[float] = None, max_value: Optional[float] = None,
+                    latest_only: bool = True, inclusive: bool = False) -> List[Dict[str, Any]]:
+        """
+        Patients whose `test` value falls in (min_value, max_value). With latest_only,
+        only each patient's most recent observation is considered.
+        """
+        with self._connect() as conn:
+            test_sql, params = self._test_clause(conn, test)
+            if latest_only:
+                # Latest row per (patient, test) by date, then id as a tie-breaker
+                base = (
+                    "SELECT * FROM lab_values l WHERE " + test_sql + " AND l.id = ("
+                    "SELECT l2.id FROM lab_values l2 WHERE l2.patient_key IS l.patient_key AND l2.test_key = l.test_key "
+                    "ORDER BY l2.date DESC, l2.id DESC LIMIT 1)"
+                )
+            else:
+                base = "SELECT * FROM lab_values WHERE " + test_sql
+            gt, lt = (">=", "<=") if inclusive else (">", "<")
+            if min_value is not None:
+                base += f" AND value {gt} ?"
+                params.append(min_value)
+            if max_value is not None:
+                base += f" AND value {lt} ?"
+                params.append(max_value)
+            base += " ORDER BY value DESC"
+            return self._rows(conn.execute(base, params))
+
+    @metrics.traced("labs.latest")
+    def latest(self, patient: str, test: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent value of each test (or just `test`) for a patient."""
+        with self._connect() as conn:
+            patient_sql, params = self._patient_clause(patient)
+            sql = "SELECT * FROM lab_values l WHERE " + patient_sql
+            if test:
+                test_sql, test_params = self._test_clause(conn, test)
+                sql += " AND " + test_sql
+                params += test_params
+            sql += (
+                " AND l.id = (SELECT l2.id FROM lab_values l2 WHERE l2.patient_key = l.patient_key AND l2.test_key = l.test_key "
+                "ORDER BY l2.date DESC, l2.id DESC LIMIT 1) ORDER BY test"
+            )
+            return self._rows(conn.execute(sql, params))
+
+    @metrics.traced("labs.time_series")
+    def time_series(self, patient: str, test: str) -> List[Dict[str, Any]]:
+        """All observations of `test` for a patient, oldest first."""
+        with self._connect() as conn:
+            patient_sql, params = self._patient_clause(patient)
+            test_sql, test_params = self._test_clause(conn, test)
+            sql = f"SELECT * FROM lab_values WHERE {patient_sql} AND {test_sql} ORDER BY date, id"
+            return self._rows(conn.execute(sql, params + test_params))
+
+    def list_tests(self) -> List[str]:
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT DISTINCT test_key FROM lab_values ORDER BY test_key")]
+
+    def list_patients(self) -> List[str]:
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT DISTINCT patient FROM lab_values WHERE patient IS NOT NULL ORDER BY patient")]
+
+    def count(self, patient: Optional[str] = None) -> int:
+        """All rows, or the rows stored under exactly `patient` (what delete_patient would remove)."""
+        with self._connect() as conn:
+            if patient is None:
+                return conn.execute("SELECT COUNT(*) FROM lab_values").fetchone()[0]
+            clause, params = self._patient_clause(patient, exact=True)
+            return conn.execute(f"SELECT COUNT(*) FROM lab_values WHERE {clause}", params).fetchone()[0]
+
+    # --- Natural-language numeric questions ---
+
+    def parse_numeric_query(self, text: str, patient: Optional[str] = None, strict: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Recognize numeric lab questions without an LLM:
+          "which patients have creatinine > 2", "HbA1c between 6 and 8",
+          "latest creatinine for Deepak", "glucose trend for Rebeca".
+        Returns a parsed query dict or None if the text is not a lab-value question.
+        With `strict`, only messages that are nothing but a lab lookup match: no action or
+        general-knowledge words, and a "what is/level" question must name the patient itself.
+        """
+        lowered = text.lower()
+        if strict and _NOT_LOOKUP_RE.search(lowered):
+            return None
+        test = self._find_test(lowered)
+        if not test:
+            return None
+
+        num = r"(\d+(?:\.\d+)?)"
+        m = re.search(r"between\s+" + num + r"\s+and\s+" + num, lowered)
+        if m:
+            return {"type": "range", "test": test, "min": float(m.group(1)), "max": float(m.group(2)), "inclusive": True}
+        m = re.search(r"(>=|<=|>|<|=>|=<|above|over|greater than|more than|higher than|below|under|less than|lower than)\s*" + num, lowered)
+        if m:
+            op, value = m.group(1), float(m.group(2))
+            inclusive = "=" in op
+            if op in (">=", "=>", ">", "above", "over", "greater than", "more than", "higher than"):
+                return {"type": "range", "test": test, "min": value, "max": None, "inclusive": inclusive}
+            return {"type": "range", "test": test, "min": None, "max": value, "inclusive": inclusive}
+
+        named = self._find_patient(lowered)
+        patient = named or patient
+        if not patient:
+            return None
+        if re.search(r"\b(trend|history|series|over time|all values|timeline)\b", lowered):
+            return {"type": "series", "test": test, "patient": patient}
+        if re.search(r"\b(latest|last|recent|current)\b", lowered):
+            return {"type": "latest", "test": test, "patient": patient}
+        if re.search(r"\b(what is|what's|level|value)\b", lowered) and (named or not strict):
+            return {"type": "latest", "test": test, "patient": patient}
+        return None
+
+    def _find_test(self, lowered: str) -> Optional[str]:
+        candidates = {t for t in self.list_tests() if len(t) > 1} | set(TEST_ALIASES)
+        # Prefer the longest mention ("ldl cholesterol" over "cholesterol")
+        for name in sorted(candidates, key=len, reverse=True):
+            if re.search(r"\b" + re.escape(name) + r"\b", lowered):
+                return TEST_ALIASES.get(name, name)
+        return None
+
+    def _find_patient(self, lowered: str) -> Optional[str]:
+        """
+        The stored patient the text names: a whole full name, or a first name that belongs
+        to exactly one stored patient and is not a common word. None when no patient is
+        named, so the caller falls back to the selected patient.
+        """
+        names = [n for n in self.list_patients() if n.strip()]
+        for name in sorted(names, key=len, reverse=True):
+            key = name.lower().strip()
+            if key in _COMMON_NAME_WORDS:
+                continue
+            if re.search(r"\b" + re.escape(key) + r"\b", lowered):
+                return name
+        firsts: Dict[str, List[str]] = {}
+        for name in names:
+            firsts.setdefault(name.lower().split()[0], []).append(name)
+        for first, owners in firsts.items():
+            if len(owners) == 1 and first not in _COMMON_NAME_WORDS and re.search(r"\b" + re.escape(first) + r"\b", lowered):
+                return owners[0]
+        return None
+
+    def answer_numeric_query(self, text: str, patient: Optional[str] = None, strict: bool = False) -> Optional[Dict[str, Any]]:
+        """Parse and run a numeric lab question; returns {'query', 'rows', 'answer'} or None."""
+        parsed = self.parse_numeric_query(text, patient, strict=strict)
+        if not parsed:
+            return None
+        if parsed["type"] == "range":
+            rows = self.query_range(parsed["test"], parsed["min"], parsed["max"], inclusive=parsed["inclusive"])
+            bounds = []
+            if parsed["min"] is not None:
+                bounds.append(f"{'>=' if parsed['inclusive'] else '>'} {parsed['min']:g}")
+            if parsed["max"] is not None:
+                bounds.append(f"{'<=' if parsed['inclusive'] else '<'} {parsed['max']:g}")
+            label = f"{parsed['test']} {' and '.join(bounds)}"
+            if rows:
+                listing = ", ".join(f"{r['patient'] or 'Unknown'} ({r['value']:g} {r['unit'] or ''}, {r['date'] or 'undated'})".replace(" ,", ",") for r in rows)
+                answer = f"{len(rows)} patient(s) with latest {label}: {listing}."
+            else:
+                answer = f"No patients with latest {label}."
+        elif parsed["type"] == "latest":
+            rows = self.latest(parsed["patient"], parsed["test"])
+            if rows:
+                answer = "; ".join(f"Latest {r['test']} for {r['patient']}: {r['value']:g} {r['unit'] or ''} ({r['date'] or 'undated'}, ref {r['ref_text'] or 'n/a'})" for r in rows)
+            else:
+                answer = f"No {parsed['test']} values on file for {parsed['patient']}."
+        else:
+            rows = self.time_series(parsed["patient"], parsed["test"])
+            if rows:
+                answer = f"{parsed['test']} for {parsed['patient']}: " + ", ".join(f"{r['date'] or 'undated'}: {r['value']:g} {r['unit'] or ''}".strip() for r in rows)
+            else:
+                answer = f"No {parsed['test']} values on file for {parsed['patient']}."
+        return {"query": parsed, "rows": rows, "answer": answer}
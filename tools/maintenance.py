@@ -0,0 +1,282 @@
+import os
+import re
+import math
+import shutil
+import time
+import sqlite3
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+from tools.shards import patient_key
+
+PROBE_QUERIES = (
+    "Medical history and conditions",
+    "kidney disease diet",
+    "latest blood test results",
+    "current medications",
+)
+
+
+# --- Inspection ---
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def sqlite_stats(path: str) -> Optional[Dict[str, Any]]:
+    """Size and free-page ratio of an SQLite file (deleted rows leave free pages until VACUUM)."""
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    wal = path + "-wal"
+    return {
+        "bytes": pages * page_size,
+        "wal_bytes": os.path.getsize(wal) if os.path.exists(wal) else 0,
+        "free_ratio": round(free / pages, 4) if pages else 0.0,
+    }
+
+
+def _sqlite_files(rag) -> List[str]:
+    return [
+        os.path.join(rag.db_path, "chroma.sqlite3"),
+        rag.lab_store.db_path,
+        os.path.join(rag.db_path, "ingest_jobs.sqlite3"),
+        os.path.join(rag.db_path, "patient_profiles.sqlite3"),
+    ]
+
+
+def measure_latency(rag, queries: Iterable[str] = PROBE_QUERIES, runs: int = 3) -> Dict[str, float]:
+    """Wall time of rag.query (no reranking) over the probe queries."""
+    timings = []
+    for _ in range(runs):
+        for q in queries:
+            start = time.perf_counter()
+            rag.query(q, rerank=False)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    pick = lambda pct: timings[max(0, math.ceil(pct / 100 * len(timings)) - 1)] if timings else 0.0
+    return {"p50_ms": round(pick(50), 2), "p95_ms": round(pick(95), 2), "queries": len(timings)}
+
+
+def store_report(rag, latency_runs: int = 3) -> Dict[str, Any]:
+    """Chunk counts, on-disk size, fragmentation and probe query latency of a RAG store."""
+    collections = {name: rag.get_store(name)._collection.count() for name in rag.list_collections()}
+    total_chunks = sum(collections.values())
+    disk = _dir_size(rag.db_path)
+    sqlite = {}
+    for path in _sqlite_files(rag):
+        stats = sqlite_stats(path)
+        if stats:
+            sqlite[os.path.basename(path)] = stats
+    # HNSW segment files keep slots of deleted vectors; bytes per live vector rises as they accumulate
+    segment_bytes = sum(_dir_size(os.path.join(rag.db_path, d)) for d in os.listdir(rag.db_path)
+                        if os.path.isdir(os.path.join(rag.db_path, d))) if os.path.isdir(rag.db_path) else 0
+    report = {
+        "collections": collections,
+        "chunks": total_chunks,
+        "disk_bytes": disk,
+        "index_bytes_per_chunk": round(segment_bytes / total_chunks, 1) if total_chunks else 0.0,
+        "sqlite": sqlite,
+    }
+    if latency_runs and total_chunks:
+        report["latency"] = measure_latency(rag, runs=latency_runs)
+    return report
+
+
+def _iter_collection(collection, include, batch_size=1000):
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(include=include, limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        yield page
+
+
+# --- Dedup ---
+
+def find_near_duplicates(rag, threshold: float = 0.98, block_size: int = 512) -> Dict[str, List[str]]:
+    """
+    Ids of chunks whose embedding has cosine similarity >= threshold with an earlier
+    chunk of the same patient in the same collection (re-ingested reports, repeated
+    pages). The first copy is kept. Similarities are computed blockwise per patient.
+    """
+    duplicates: Dict[str, List[str]] = {}
+    for name in rag.list_collections():
+        ids, vectors, patients = [], [], []
+        for page in _iter_collection(rag.get_store(name)._collection, ["embeddings", "metadatas"]):
+            ids.extend(page["ids"])
+            vectors.extend(page["embeddings"])
+            patients.extend(patient_key((m or {}).get("patient")) for m in page["metadatas"])
+        if not ids:
+            continue
+        matrix = np.asarray(vectors, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, key in enumerate(patients):
+            groups.setdefault(key, []).append(i)
+        drop = []
+        for rows in groups.values():
+            group = matrix[rows]
+            removed = np.zeros(len(rows), dtype=bool)
+            for start in range(0, len(rows), block_size):
+                block = group[start:start + block_size] @ group.T
+                for offset, sims in enumerate(block):
+                    i = start + offset
+                    if removed[i]:
+                        continue
+                    later = np.nonzero(sims[i + 1:] >= threshold)[0] + i + 1
+                    removed[later] = True
+            drop.extend(ids[rows[i]] for i in np.nonzero(removed)[0])
+        if drop:
+            duplicates[name] = drop
+    return duplicates
+
+
+# --- Patient purge ---
+
+def find_patient_chunks(rag, patients: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Chunk ids per collection stored under exactly one of the given patient names: what
+    purge_patients (rag.delete_patient) would delete, read from the chunk index.
+    """
+    found: Dict[str, List[str]] = {}
+    for patient in patients:
+        for name, ids in rag.chunk_index.chunks_for(patient, exact=True).items():
+            found.setdefault(name, []).extend(ids)
+    return found
+
+
+def orphan_patients(rag, known_patients: Iterable[str]) -> Dict[str, int]:
+    """Patients named in indexed reports with no EHR record, with their chunk counts. Review before purging."""
+    known = {patient_key(p) for p in known_patients if patient_key(p)}
+    counts: Dict[str, int] = {}
+    for name in rag.list_collections():
+        for page in _iter_collection(rag.get_store(name)._collection, ["metadatas"]):
+            for m in page["metadatas"]:
+                patient = (m or {}).get("patient")
+                if patient and patient_key(patient) not in known:
+                    counts[patient] = counts.get(patient, 0) + 1
+    return counts
+
+
+def delete_found(rag, found: Dict[str, List[str]], batch_size: int = 500) -> int:
+    deleted = 0
+    for name, ids in found.items():
+        for start in range(0, len(ids), batch_size):
+            deleted += rag.delete_chunks(ids[start:start + batch_size], collection=name)
+    return deleted
+
+
+def purge_patients(rag, patients: Iterable[str]) -> Dict[str, int]:
+    """Delete the chunks and lab values of the given (deleted) patients."""
+    patients = list(patients)
+    chunks = sum(rag.delete_patient(p) for p in patients)
+    lab_rows = sum(rag.lab_store.delete_patient(p) for p in patients)
+    return {"chunks": chunks, "lab_rows": lab_rows}
+
+
+# --- Rebuild / vacuum ---
+
+def rebuild_collection(rag, name: str, batch_size: int = 1000) -> int:
+    """
+    Recreate a collection from its stored embeddings so the HNSW index holds no deleted
+    slots. Data is staged in a temporary collection first, so an interrupted rebuild
+    can be finished by hand from "rebuild-<name>".
+    """
+    client = rag.vectorstore._client
+    source = rag.get_store(name)._collection
+    temp_name = f"rebuild-{name}"[:63]
+    # No embedding function, as LangChain's Chroma creates collections: vectors always come from
+    # rag.embeddings, and Chroma would otherwise persist its default model in the collection config
+    temp = client.get_or_create_collection(temp_name, metadata=source.metadata, embedding_function=None)
+    copied = 0
+    for page in _iter_collection(source, ["embeddings", "documents", "metadatas"], batch_size):
+        temp.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"])
+        copied += len(page["ids"])
+    if copied != source.count():
+        client.delete_collection(temp_name)
+        raise RuntimeError(f"Rebuild of {name} aborted: copied {copied} of {source.count()} chunks")
+
+    client.delete_collection(name)
+    fresh = client.get_or_create_collection(name, metadata=temp.metadata, embedding_function=None)
+    for page in _iter_collection(temp, ["embeddings", "documents", "metadatas"], batch_size):
+        fresh.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"])
+    client.delete_collection(temp_name)
+    # LangChain wrappers cache the old collection object
+    rag.reconnect()
+    return copied
+
+
+def rebuild_indexes(rag) -> Dict[str, Any]:
+    """Rebuild every collection's vector index, the quantized index and the lab value indexes."""
+    rebuilt = {name: rebuild_collection(rag, name) for name in rag.list_collections()}
+    if rag.quantized is not None:
+        from tools.quantized_index import QuantizedIndex
+        fresh = QuantizedIndex.from_collection(rag.vectorstore._collection, rag.vector_mode)
+        fresh.save(rag._quantized_path())
+        # Swap contents in place so every RAGTool sharing the index sees the rebuild
+        rag.quantized.replace(fresh)
+    conn = sqlite3.connect(rag.lab_store.db_path, timeout=30)
+    try:
+        conn.execute("REINDEX")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return {"collections": rebuilt}
+
+
+def remove_orphan_segments(rag) -> int:
+    """Delete HNSW segment directories left on disk by deleted or rebuilt collections. Returns bytes freed."""
+    chroma_db = os.path.join(rag.db_path, "chroma.sqlite3")
+    if not os.path.exists(chroma_db):
+        return 0
+    conn = sqlite3.connect(chroma_db, timeout=30)
+    try:
+        live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    finally:
+        conn.close()
+    freed = 0
+    for name in os.listdir(rag.db_path):
+        path = os.path.join(rag.db_path, name)
+        if os.path.isdir(path) and re.fullmatch(r"[0-9a-f\-]{36}", name) and name not in live:
+            freed += _dir_size(path)
+            shutil.rmtree(path, ignore_errors=True)
+    return freed
+
+
+def vacuum(rag) -> Dict[str, int]:
+    """
+    Checkpoint WALs and VACUUM the SQLite files (Chroma metadata, lab values, ingest jobs, profiles),
+    then remove orphaned vector segment directories. Returns bytes reclaimed per item.
+    """
+    reclaimed = {}
+    for path in _sqlite_files(rag):
+        if not os.path.exists(path):
+            continue
+        before = os.path.getsize(path) + (os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0)
+        conn = sqlite3.connect(path, timeout=60)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        after = os.path.getsize(path) + (os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0)
+        reclaimed[os.path.basename(path)] = before - after
+    reclaimed["orphaned segments"] = remove_orphan_segments(rag)
+    return reclaimed
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+# Metrics are opt-in. When disabled, `traced` returns the original function
+# unchanged and `span` is a shared no-op context, so instrumented code pays nothing.
+ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+JSONL_PATH = os.getenv("METRICS_JSONL")
+HTTP_PORT = os.getenv("METRICS_PORT")
+
+# Histogram bucket upper bounds in seconds (Prometheus convention)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_timers: Dict[str, Dict[str, Any]] = {}
+_counters: Dict[str, float] = {}
+_jsonl_buffer: List[str] = []
+_JSONL_FLUSH_EVERY = 100
+
+# Spans recorded during the current `collect()` block (e.g. one chat turn)
+_collector: contextvars.ContextVar = contextvars.ContextVar("metrics_collector", default=None)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _record(name: str, elapsed: float, error: bool = False):
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            t = _timers[name] = {"count": 0, "sum": 0.0, "max": 0.0, "errors": 0, "buckets": [0] * len(BUCKETS)}
+        t["count"] += 1
+        t["sum"] += elapsed
+        if elapsed > t["max"]:
+            t["max"] = elapsed
+        if error:
+            t["errors"] += 1
+        for i, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                t["buckets"][i] += 1
+                break
+        if JSONL_PATH:
+            _jsonl_buffer.append(json.dumps({"ts": time.time(), "span": name, "ms": elapsed * 1000.0, "error": error}))
+            if len(_jsonl_buffer) >= _JSONL_FLUSH_EVERY:
+                _flush_jsonl_locked()
+
+    collected = _collector.get()
+    if collected is not None:
+        collected.append({"span": name, "ms": elapsed * 1000.0, "error": error})
+
+
+def _flush_jsonl_locked():
+    if not _jsonl_buffer:
+        return
+    try:
+        with open(JSONL_PATH, "a") as f:
+            f.write("\n".join(_jsonl_buffer) + "\n")
+    except Exception as e:
+        print(f"Error writing metrics JSONL: {e}")
+    _jsonl_buffer.clear()
+
+
+def flush():
+    """Flush buffered JSONL span records to disk."""
+    with _lock:
+        _flush_jsonl_locked()
+
+
+@contextmanager
+def _span(name: str):
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        _record(name, time.perf_counter() - start, error)
+
+
+def span(name: str):
+    """Context manager timing a block under `name`."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _span(name)
+
+
+def traced(name: str):
+    """Decorator timing every call of the wrapped function under `name`."""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                _record(name, time.perf_counter() - start, error)
+        return wrapper
+    return decorator
+
+
+def incr(name: str, value: float = 1):
+    """Increment counter `name`."""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+@contextmanager
+def collect():
+    """Collect the spans recorded inside this block; yields the list they are appended to."""
+    spans: List[Dict[str, Any]] = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return a copy of all timers and counters."""
+    with _lock:
+        timers = {
+            name: {
+                "count": t["count"],
+                "total_ms": t["sum"] * 1000.0,
+                "mean_ms": (t["sum"] / t["count"] * 1000.0) if t["count"] else 0.0,
+                "max_ms": t["max"] * 1000.0,
+                "errors": t["errors"],
+            }
+            for name, t in _timers.items()
+        }
+        return {"enabled": ENABLED, "timers": timers, "counters": dict(_counters)}
+
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def _prom_name(name: str) -> str:
+    return "medassist_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def render_prometheus() -> str:
+    """Render timers as Prometheus histograms and counters in text exposition format."""
+    lines = []
+    with _lock:
+        for name, t in sorted(_timers.items()):
+            metric = _prom_name(name) + "_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS, t["buckets"]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {t["count"]}')
+            lines.append(f"{metric}_sum {t['sum']}")
+            lines.append(f"{metric}_count {t['count']}")
+            lines.append(f"# TYPE {_prom_name(name)}_errors_total counter")
+            lines.append(f"{_prom_name(name)}_errors_total {t['errors']}")
+        for name, value in sorted(_counters.items()):
+            metric = _prom_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+_http_server = None
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> bool:
+    """Serve /metrics (Prometheus) and /metrics.json on a daemon thread. Idempotent."""
+    global _http_server
+    if _http_server is not None:
+        return True
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, ctype = json.dumps(snapshot()).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, ctype = render_prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        _http_server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        # Another process (e.g. a second Streamlit session) already owns the port
+        print(f"Metrics endpoint not started on port {port}: {e}")
+        return False
+    threading.Thread(target=_http_server.serve_forever, daemon=True).start()
+    return True
+
+
+class TracedEmbeddings:
+    """Embeddings proxy that times embed calls separately from vector-store work."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def embed_documents(self, texts):
+        with span("embed.documents"):
+            incr("embed.texts", len(texts))
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        with span("embed.query"):
+            return self.inner.embed_query(text)
+
+    def __getattr__(self, item):
+        return getattr(self.inner, item)
+
+
+def instrument_embeddings(embeddings):
+    """Wrap an embeddings object for timing when metrics are enabled."""
+    if not ENABLED:
+        return embeddings
+    return TracedEmbeddings(embeddings)
+
+
+if ENABLED:
+    if JSONL_PATH:
+        atexit.register(flush)
+    if HTTP_PORT:
+        start_http_server(int(HTTP_PORT))
@@ -0,0 +1,136 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools import metrics
+
+ONNX_SUBDIR = "onnx"
+ONNX_MODEL = "model.onnx"
+ONNX_MODEL_INT8 = "model_int8.onnx"
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an exported ONNX copy of the local MiniLM model,
+    run through onnxruntime + tokenizers. Torch is never imported.
+
+    Texts are sorted by length and grouped so each batch pads only to its own
+    longest member (dynamic batching), capped by `max_batch_tokens`. A single
+    session is shared across threads; onnxruntime's intra-op pool uses the cores.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, batch_size: int = 64,
+                 max_length: int = 256, max_batch_tokens: int = 16384, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        onnx_dir = os.path.join(model_dir, ONNX_SUBDIR)
+        model_path = os.path.join(onnx_dir, ONNX_MODEL_INT8 if quantized else ONNX_MODEL)
+        if not os.path.exists(model_path):
+            # Fall back to the float export if the int8 one has not been produced
+            model_path = os.path.join(onnx_dir, ONNX_MODEL)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No ONNX model in {onnx_dir}. Run download_model.py to export it.")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or int(os.getenv("ONNX_THREADS", "0")) or (os.cpu_count() or 1)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        print(f"Loading ONNX embedding model from {model_path} ({options.intra_op_num_threads} threads)...")
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.no_padding()
+        self.pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+
+    def _run_batch(self, encodings) -> np.ndarray:
+        width = max(len(e.ids) for e in encodings)
+        input_ids = np.full((len(encodings), width), self.pad_id, dtype=np.int64)
+        attention = np.zeros((len(encodings), width), dtype=np.int64)
+        for row, e in enumerate(encodings):
+            input_ids[row, :len(e.ids)] = e.ids
+            attention[row, :len(e.ids)] = 1
+        feeds = {"input_ids": input_ids, "attention_mask": attention}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        # Mean pooling over real tokens, then L2 normalize (matches sentence-transformers)
+        mask = attention[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    @metrics.traced("embed.onnx")
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        out = [None] * len(texts)
+
+        batch: List[int] = []
+        for i in order:
+            width = len(encodings[i].ids)
+            # Flush when the batch is full or padding to this width would exceed the token budget
+            if batch and (len(batch) >= self.batch_size or width * (len(batch) + 1) > self.max_batch_tokens):
+                self._store(batch, encodings, out)
+                batch = []
+            batch.append(i)
+        if batch:
+            self._store(batch, encodings, out)
+        return out
+
+    def _store(self, batch, encodings, out):
+        vectors = self._run_batch([encodings[i] for i in batch])
+        for i, vector in zip(batch, vectors):
+            out[i] = vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+def export_onnx_model(model_dir: str, quantize: bool = True) -> Optional[str]:
+    """
+    Make sure `<model_dir>/onnx/model.onnx` exists (exporting it with torch if the
+    hub snapshot did not include one) and write a dynamically int8-quantized copy.
+    Intended for build time (download_model.py); returns the int8 path or None.
+    """
+    onnx_dir = os.path.join(model_dir, ONNX_SUBDIR)
+    float_path = os.path.join(onnx_dir, ONNX_MODEL)
+    os.makedirs(onnx_dir, exist_ok=True)
+
+    if not os.path.exists(float_path):
+        print("Exporting embedding model to ONNX...")
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModel.from_pretrained(model_dir).eval()
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        dynamic = {0: "batch", 1: "sequence"}
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            float_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "token_type_ids": dynamic,
+                          "last_hidden_state": dynamic},
+            opset_version=14,
+        )
+        print(f"Exported {float_path}")
+
+    if not quantize:
+        return None
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    int8_path = os.path.join(onnx_dir, ONNX_MODEL_INT8)
+    quantize_dynamic(float_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"Quantized ONNX model written to {int8_path}")
+    return int8_path
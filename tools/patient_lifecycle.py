@@ -0,0 +1,85 @@
+from typing import Dict, Any, Optional
+
+from tools import metrics
+
+
+class PatientLifecycle:
+    """
+    Applies patient deletes and renames to every store that holds patient data:
+    the EHR roster, the RAG chunks (via the patient -> chunk index), the lab value
+    table, the appointment bookings (via the patient -> booking index) and the
+    dashboard profile snapshots.
+    Each store is changed with one batched call, so the cost follows the size of that
+    patient's data rather than the corpus. The EHR record is changed last, so a
+    failure part-way leaves the patient visible and the operation can be retried.
+    """
+
+    def __init__(self, ehr, rag=None, appointments=None, profiles=None):
+        self.ehr = ehr
+        self.rag = rag
+        self.appointments = appointments
+        self.profiles = profiles
+
+    def _names(self, patient_name: str):
+        """The EHR name plus the first-name alias when it resolves to the same record."""
+        record = self.ehr.get_patient_summary(patient_name)
+        full = (record.get('Name') if record else None) or patient_name
+        names = [full]
+        first = full.split()[0]
+        if first.lower() != full.lower() and self.ehr.get_patient_summary(first) is record:
+            names.append(first)
+        return names
+
+    @metrics.traced("patients.delete")
+    def delete_patient(self, patient_name: str) -> Dict[str, Any]:
+        names = self._names(patient_name)
+        result: Dict[str, Any] = {'patient': names[0], 'chunks': 0, 'lab_rows': 0, 'bookings': 0}
+        try:
+            if self.rag is not None:
+                # Exact keys only: the full name, plus the first-name alias that older reports were stored under
+                result['chunks'] = sum(self.rag.delete_patient(n) for n in names)
+                result['lab_rows'] = sum(self.rag.lab_store.delete_patient(n) for n in names)
+            if self.appointments is not None:
+                result['bookings'] = sum(self.appointments.cancel_patient_bookings(n) for n in names)
+            if self.profiles is not None:
+                for n in names:
+                    self.profiles.invalidate(n)
+            result['success'] = self.ehr.delete_patient(names[0])
+            if not result['success']:
+                result['error'] = 'Patient not found in EHR'
+        except Exception as e:
+            print(f"Error deleting patient {patient_name}: {e}")
+            result.update(success=False, error=str(e))
+        return result
+
+    @metrics.traced("patients.rename")
+    def rename_patient(self, old_name: str, new_name: str) -> Dict[str, Any]:
+        new_name = (new_name or "").strip()
+        if not new_name:
+            return {'success': False, 'error': 'New name is required'}
+        names = self._names(old_name)
+        # Check the EHR side first so the other stores are not renamed for a rename that cannot complete
+        record = self.ehr.get_patient_summary(names[0])
+        if not record:
+            return {'success': False, 'error': 'Patient not found'}
+        existing = self.ehr.get_patient_summary(new_name)
+        if existing and existing is not record:
+            return {'success': False, 'error': f'A patient named {new_name} already exists'}
+        result: Dict[str, Any] = {'patient': new_name, 'chunks': 0, 'lab_rows': 0, 'bookings': 0}
+        try:
+            if self.rag is not None:
+                result['chunks'] = sum(self.rag.rename_patient(n, new_name) for n in names)
+                result['lab_rows'] = sum(self.rag.lab_store.rename_patient(n, new_name) for n in names)
+            if self.appointments is not None:
+                result['bookings'] = sum(self.appointments.rename_patient(n, new_name) for n in names)
+            if self.profiles is not None:
+                for n in names:
+                    self.profiles.invalidate(n)
+            saved = self.ehr.rename_patient(names[0], new_name)
+            result['success'] = saved.get('success', False)
+            if not result['success']:
+                result['error'] = saved.get('error')
+        except Exception as e:
+            print(f"Error renaming patient {old_name}: {e}")
+            result.update(success=False, error=str(e))
+        return result
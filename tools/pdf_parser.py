@@ -0,0 +1,193 @@
+import re
+import datetime
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+from langchain_core.documents import Document
+
+from tools import metrics
+
+# --- Patient / date detection ---
+
+_PATIENT_RE = re.compile(r"^\s*(?:Patient(?:\s+Name)?|Name)\s*:\s*(?P<name>[A-Za-z][A-Za-z0-9 .'\-]*?)\s*(?:\(.*\))?\s*$", re.I | re.M)
+_DATE_RE = re.compile(r"^\s*(?:Visit|Report|Collection|Encounter)\s+Date\s*:\s*(?P<date>[\w/\-. ]+?)\s*$", re.I | re.M)
+_CLINIC_RE = re.compile(r"^\s*(?:Location|Clinic|Hospital|Facility)\s*:\s*(?P<clinic>.+?)\s*$", re.I | re.M)
+# Full dates only: a bare year is kept as written rather than becoming January 1st
+_DATE_FORMATS = ("%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d", "%d-%b-%Y", "%d-%B-%Y", "%b %d, %Y")
+
+
+def normalize_date(text: Optional[str]) -> Optional[str]:
+    """Best-effort conversion of report dates to ISO (YYYY-MM-DD); returns the input if unparseable."""
+    if not text:
+        return None
+    text = text.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return text
+
+
+def detect_patient(text: str) -> Optional[str]:
+    m = _PATIENT_RE.search(text)
+    if m:
+        name = m.group("name").strip()
+        if name and name.lower() not in ("information", "details"):
+            return name
+    # Some EHR exports start with the bare patient name followed by DOB / MRN lines
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    if len(lines) > 2 and re.fullmatch(r"[A-Z][a-z]+(?: [A-Z][a-z]+){1,2}", lines[0]) \
+            and any(re.match(r"(DOB|Patient #|MRN)", l) for l in lines[1:6]):
+        return lines[0]
+    return None
+
+
+def detect_date(text: str) -> Optional[str]:
+    m = _DATE_RE.search(text)
+    return normalize_date(m.group("date")) if m else None
+
+
+def detect_clinic(text: str) -> Optional[str]:
+    m = _CLINIC_RE.search(text)
+    return m.group("clinic") if m else None
+
+
+# --- Lab table extraction ---
+
+_NUM = r"\d+(?:\.\d+)?"
+_UNIT = r"(?P<unit>\{[^}]*\}|[A-Za-z%µ/][\w%µ/\^\.\[\]]*)"
+_RANGE = r"(?:Range:\s*)?(?P<range>(?:[<>≤≥]=?\s*|>\s*OR\s*=\s*|<\s*OR\s*=\s*)?" + _NUM + r"(?:\s*[-–]\s*" + _NUM + r")?(?:\s*[A-Za-z%µ/][\w%µ/\^\.]*)?)"
+_LINE_DATE = r"(?:(?P<date>\d{1,2}-[A-Za-z]{3}-\d{4})(?:\s+\d{1,2}:\d{2})?\s+)?"
+
+# "Creatinine 1.8 mg/dL 0.6-1.2 mg/dL" / "08-Sep-2022 06:09 Glucose SerPl-mCnc 104 mg/dL Range: 65-99"
+_SINGLE_ROW_RE = re.compile(r"^" + _LINE_DATE + r"(?P<test>[A-Za-z].*?)\s+(?P<value>" + _NUM + r")\s*" + _UNIT + r"?(?:\s+" + _RANGE + r")?\s*$")
+# Multi-line table cells: "160 mg/dL" on its own line under the test name
+_VALUE_LINE_RE = re.compile(r"^(?P<value>" + _NUM + r")\s*" + _UNIT + r"?\s*$")
+_RANGE_LINE_RE = re.compile(r"^" + _RANGE + r"\s*$")
+
+_LAB_SECTION_RE = re.compile(r"^(?:laboratory results|lab results|lab values|results|laboratory)\s*:?\s*$", re.I)
+_SECTION_END_RE = re.compile(
+    r"^(?:clinical notes|disclaimer|assessment(?: notes)?|plan(?: notes| of treatment)?|impression|diagnosis|"
+    r"medications|vital signs|encounters|subjective notes|objective notes|past medical history|family history|"
+    r"social history|allergies.*|immunizations|procedures|problems|interventions|medical conditions)\s*:?\s*$",
+    re.I,
+)
+_TABLE_HEADERS = {"test", "result", "results", "normal range", "reference range", "range", "units", "unit", "value", "flag"}
+
+
+def parse_reference_range(text: Optional[str]) -> Dict[str, Optional[float]]:
+    """'70–100 mg/dL' -> low/high, '< 5.7 %' -> high only, '> OR = 60' -> low only."""
+    if not text:
+        return {"ref_low": None, "ref_high": None}
+    numbers = [float(n) for n in re.findall(_NUM, text)]
+    stripped = text.strip()
+    if len(numbers) >= 2 and re.search(r"\d\s*[-–]\s*\d", stripped):
+        return {"ref_low": numbers[0], "ref_high": numbers[1]}
+    if numbers and stripped[:1] in ("<", "≤"):
+        return {"ref_low": None, "ref_high": numbers[0]}
+    if numbers and stripped[:1] in (">", "≥"):
+        return {"ref_low": numbers[0], "ref_high": None}
+    return {"ref_low": None, "ref_high": None}
+
+
+def _row(test, value, unit, ref_text, date):
+    test = re.sub(r"\s+", " ", test).strip(" :-")
+    row = {
+        "test": test,
+        "value": float(value),
+        "unit": (unit or "").strip("{}") or None,
+        "ref_text": ref_text.strip() if ref_text else None,
+        "date": normalize_date(date) if date else None,
+    }
+    row.update(parse_reference_range(ref_text))
+    return row
+
+
+def extract_lab_rows(text: str, in_section: bool = False) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Extract (test, value, unit, reference range) rows from the lab sections of a page.
+    Handles one-row-per-line tables and tables whose cells come out one per line.
+    Returns the rows and whether a lab section is still open at the end of the page
+    (tables often continue onto the next page).
+    """
+    rows = []
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    # A collection timestamp at the start of a result block applies to the rows under it
+    block_date = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if _LAB_SECTION_RE.match(line):
+            in_section = True
+            block_date = None
+            i += 1
+            continue
+        if not in_section:
+            i += 1
+            continue
+        if _SECTION_END_RE.match(line):
+            in_section = False
+            i += 1
+            continue
+        if line.lower() in _TABLE_HEADERS:
+            i += 1
+            continue
+
+        m = _SINGLE_ROW_RE.match(line)
+        if m and (m.group("unit") or m.group("range")):
+            block_date = m.group("date") or block_date
+            rows.append(_row(m.group("test"), m.group("value"), m.group("unit"), m.group("range"), block_date))
+            i += 1
+            continue
+
+        # Cell-per-line layout: name, value [unit], optional reference range
+        nxt = lines[i + 1] if i + 1 < len(lines) else ""
+        value_match = _VALUE_LINE_RE.match(nxt)
+        if re.search(r"[A-Za-z]", line) and value_match:
+            ref_text = None
+            step = 2
+            after = lines[i + 2] if i + 2 < len(lines) else ""
+            if after and _RANGE_LINE_RE.match(after) and not (i + 3 < len(lines) and _VALUE_LINE_RE.match(lines[i + 3]) and not _VALUE_LINE_RE.match(after)):
+                ref_text = after
+                step = 3
+            rows.append(_row(line, value_match.group("value"), value_match.group("unit"), ref_text, None))
+            i += step
+            continue
+        i += 1
+    return rows, in_section
+
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[Tuple[Document, List[Dict[str, Any]]]]:
+    """
+    Lazily yield (Document, lab_rows) per page. The Document carries source/page/
+    patient/report_date/clinic metadata; lab_rows are the structured lab values found on
+    that page. Only one page of text is held in memory at a time.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    patient = None
+    report_date = None
+    clinic = None
+    in_lab_section = False
+    for page_number in range(len(reader.pages)):
+        text = reader.pages[page_number].extract_text() or ""
+        # The header on the first pages names the patient; later pages inherit it
+        patient = detect_patient(text) or patient
+        report_date = detect_date(text) or report_date
+        clinic = detect_clinic(text) or clinic
+        lab_rows, in_lab_section = extract_lab_rows(text, in_lab_section)
+
+        metadata = {"source": pdf_path, "page": page_number}
+        if patient:
+            metadata["patient"] = patient
+        if report_date:
+            metadata["report_date"] = report_date
+        if clinic:
+            metadata["clinic"] = clinic
+        for row in lab_rows:
+            row.update({"patient": patient, "source": pdf_path, "page": page_number})
+            row["date"] = row["date"] or report_date
+
+        metrics.incr("pdf.pages")
+        yield Document(page_content=text, metadata=metadata), lab_rows
@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Any, Optional
+
+from tools import metrics
+
+# Prefetched context older than this is not used (the record or documents may have changed)
+TTL = float(os.getenv("PREFETCH_TTL", "120"))
+
+# Shared by every session's prefetcher; a prefetch is a few EHR/RAG/booking lookups
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("PREFETCH_WORKERS", "4")), thread_name_prefix="prefetch")
+
+
+class ContextPrefetcher:
+    """
+    Background load of one patient's context for a UI session, started when the
+    selection changes and consumed by the next chat turn. `loader(patient, cancelled)`
+    does the work and should stop early (return None) once `cancelled` is set.
+    Selecting another patient cancels the running prefetch.
+    """
+
+    def __init__(self, loader: Callable[[str, threading.Event], Optional[Dict[str, Any]]], ttl: Optional[float] = None):
+        self.loader = loader
+        self.ttl = TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._patient = None
+        self._future = None
+        self._cancelled = None
+        self._started = 0.0
+
+    def _expired(self) -> bool:
+        return time.time() - self._started > self.ttl
+
+    def _cancel_locked(self):
+        if self._future is not None and not self._future.done():
+            self._cancelled.set()
+            self._future.cancel()
+            metrics.incr("prefetch.cancelled")
+        self._patient = self._future = self._cancelled = None
+
+    def start(self, patient: Optional[str]) -> None:
+        """Prefetch `patient` unless it is already loading or fresh; cancels any other prefetch."""
+        if not patient:
+            self.cancel()
+            return
+        key = patient.lower().strip()
+        with self._lock:
+            if key == self._patient and self._future is not None and not self._expired():
+                return
+            self._cancel_locked()
+            self._patient, self._cancelled, self._started = key, threading.Event(), time.time()
+            self._future = _pool.submit(contextvars.copy_context().run, self.loader, patient, self._cancelled)
+            metrics.incr("prefetch.started")
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancel_locked()
+
+    def get(self, patient: Optional[str], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        The prefetched context of `patient`, waiting up to `timeout` for a prefetch still in
+        flight (it is doing the same lookups the turn would). None when there is nothing
+        usable: another patient, expired, cancelled or failed.
+        """
+        if not patient:
+            return None
+        with self._lock:
+            if patient.lower().strip() != self._patient or self._future is None or self._expired():
+                return None
+            future = self._future
+        try:
+            context = future.result(timeout=timeout)
+        except (CancelledError, FutureTimeout):
+            return None
+        except Exception as e:
+            print(f"Prefetch for {patient} failed: {e}")
+            return None
+        metrics.incr("prefetch.hit" if context else "prefetch.miss")
+        return context
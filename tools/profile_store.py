@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+from tools import metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patient_profiles (
+    patient_key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    built_at REAL NOT NULL
+);
+"""
+
+
+def fingerprint(record: Optional[Dict[str, Any]], chunk_ids: List[str]) -> str:
+    """Changes when the patient's EHR row or set of indexed chunks changes."""
+    payload = json.dumps([record or {}, sorted(chunk_ids)], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def history_formatter(llm) -> Callable[[List[str]], str]:
+    """format_history for get_or_build: the LLM turns history snippets into a Date/Category/Details table."""
+    def format_history(snippets: List[str]) -> str:
+        context = "\n---\n".join(snippets)
+        prompt = f"""
+        You are a medical assistant. Analyze the following patient history snippets and extract key events into a structured Markdown table.
+
+        Columns: Date, Category (e.g., Diagnosis, Vitals, Procedure), Details.
+
+        Snippets:
+        {context}
+        """
+        return llm.invoke(prompt).content
+    return format_history
+
+
+class ProfileStore:
+    """
+    Materialized per-patient dashboard profile: the EHR row, the patient's chunk ids,
+    the history snippets and the LLM-formatted history table. A stored profile is
+    served as long as its fingerprint (EHR row + chunk ids from the chunk index)
+    still matches, so re-opening a patient costs two SQLite reads instead of a vector
+    query and an LLM call.
+    """
+
+    def __init__(self, db_path: str = "./chroma_db/patient_profiles.sqlite3"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def _key(patient: str) -> str:
+        return patient.lower().strip()
+
+    def get(self, patient: str, expected_fingerprint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Stored profile, or None when missing or built from different data."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT fingerprint, profile FROM patient_profiles WHERE patient_key = ?",
+                               (self._key(patient),)).fetchone()
+        if not row or (expected_fingerprint and row[0] != expected_fingerprint):
+            return None
+        return json.loads(row[1])
+
+    def put(self, patient: str, profile: Dict[str, Any]) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO patient_profiles (patient_key, fingerprint, profile, built_at) VALUES (?, ?, ?, ?)",
+                         (self._key(patient), profile["fingerprint"], json.dumps(profile, default=str), time.time()))
+
+    def invalidate(self, patient: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM patient_profiles WHERE patient_key = ?", (self._key(patient),))
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM patient_profiles")
+
+    @metrics.traced("profiles.get_or_build")
+    def get_or_build(self, patient: str, ehr, rag, format_history: Callable[[List[str]], str],
+                     search: Optional[Callable] = None, refresh: bool = False) -> Dict[str, Any]:
+        """
+        The patient's profile, rebuilt when missing, stale or `refresh` is set.
+        `format_history(snippets)` turns history snippets into the markdown table (the LLM call);
+        `search` defaults to rag.query. The result carries "cached": True when nothing was rebuilt.
+        """
+        record = ehr.get_patient_summary(patient) or {}
+        chunk_ids = [cid for ids in rag.chunk_index.chunks_for(patient).values() for cid in ids]
+        current = fingerprint(record, chunk_ids)
+        if not refresh:
+            cached = self.get(patient, current)
+            if cached is not None:
+                metrics.incr("profiles.hit")
+                return dict(cached, cached=True)
+        metrics.incr("profiles.miss")
+
+        raw = (search or rag.query)(f"Medical history and conditions of {patient}", patient=patient) or []
+        # Keep only snippets that name the patient (the vector search can return other patients' reports)
+        snippets = [doc for doc in raw if patient.lower() in doc.lower()]
+        profile = {
+            "patient": patient,
+            "fingerprint": current,
+            "record": record,
+            "chunk_ids": sorted(chunk_ids),
+            "snippets": snippets,
+            "raw": raw,
+            "history": format_history(snippets) if snippets else None,
+        }
+        # An empty search may be a transient store error; only store what was actually found
+        if raw:
+            self.put(patient, profile)
+        return dict(profile, cached=False)
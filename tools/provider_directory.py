@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import datetime
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from tools import metrics
+
+# Providers as a JSON list of {"id", "name", "specialty", "location"}; ids are AppointmentAdapter doctor ids
+PROVIDERS_FILE = os.getenv("PROVIDERS_FILE", "")
+# Below this cosine similarity a symptom description falls back to general practice
+MATCH_MIN_SCORE = float(os.getenv("PROVIDER_MATCH_MIN_SCORE", "0.25"))
+# How far ahead the precomputed next free slot of each provider looks
+HORIZON_DAYS = int(os.getenv("PROVIDER_HORIZON_DAYS", "60"))
+
+DEFAULT_SPECIALTY = "General Practice"
+
+DEFAULT_PROVIDERS = [
+    {"id": "dr_gp", "name": "Dr. Jones", "specialty": "General Practice", "location": "Main Clinic"},
+    {"id": "dr_nephrologist", "name": "Dr. Rao", "specialty": "Nephrology", "location": "Main Clinic"},
+    {"id": "dr_cardiologist", "name": "Dr. Smith", "specialty": "Cardiology", "location": "Heart Centre"},
+    {"id": "dr_neurologist", "name": "Dr. Lee", "specialty": "Neurology", "location": "Main Clinic"},
+]
+
+# Words that name a specialty outright, and the symptom description its vector is built from
+SPECIALTIES = {
+    "General Practice": {
+        "aliases": ["gp", "general practitioner", "general physician", "family doctor", "primary care"],
+        "description": "fever, cough, cold, flu, sore throat, fatigue, minor infections, vaccinations, routine check-up",
+    },
+    "Nephrology": {
+        "aliases": ["nephrologist", "nephrology", "kidney", "renal", "dialysis"],
+        "description": "kidney disease, elevated creatinine, low eGFR, protein or blood in urine, swollen legs, dialysis",
+    },
+    "Cardiology": {
+        "aliases": ["cardiologist", "cardiology", "cardiac", "heart"],
+        "description": "chest pain, palpitations, irregular heartbeat, high blood pressure, shortness of breath on exertion, high cholesterol",
+    },
+    "Neurology": {
+        "aliases": ["neurologist", "neurology", "migraine", "seizure", "stroke"],
+        "description": "headache, migraine, seizures, numbness, tingling, dizziness, memory loss, tremor, weakness on one side",
+    },
+}
+
+
+def load_providers(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    path = path or PROVIDERS_FILE
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return [dict(p) for p in DEFAULT_PROVIDERS]
+
+
+def booking_window(text: str, now: Optional[datetime.datetime] = None) -> Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]:
+    """
+    (start, end) for "today", "tomorrow", "this week" (the next 7 days) or "next week" (Monday to
+    Monday) in a request; (None, None) otherwise.
+    """
+    now = now or datetime.datetime.now()
+    text = text.lower()
+    midnight = datetime.datetime.combine(now.date(), datetime.time())
+    next_monday = midnight + datetime.timedelta(days=7 - now.weekday())
+    if "tomorrow" in text:
+        return midnight + datetime.timedelta(days=1), midnight + datetime.timedelta(days=2)
+    if "today" in text:
+        return now, midnight + datetime.timedelta(days=1)
+    if "next week" in text:
+        return next_monday, next_monday + datetime.timedelta(days=7)
+    if "this week" in text:
+        return now, now + datetime.timedelta(days=7)
+    return None, None
+
+
+class ProviderDirectory:
+    """
+    Providers indexed by specialty and location, each with its next free slot kept
+    precomputed. The cached slot is reused until the doctor's schedule version changes
+    (a booking, cancellation or rule change) or the slot is in the past, so "earliest
+    cardiologist this week" reads one index entry and the cached slots of its providers.
+    """
+
+    def __init__(self, appointments, providers: Optional[List[Dict[str, Any]]] = None, embeddings=None):
+        self.appointments = appointments
+        self.providers = {p["id"]: p for p in (providers if providers is not None else load_providers())}
+        self._by_specialty: Dict[str, List[str]] = {}
+        self._by_location: Dict[str, List[str]] = {}
+        for provider_id, provider in self.providers.items():
+            self._by_specialty.setdefault(provider["specialty"].lower(), []).append(provider_id)
+            self._by_location.setdefault((provider.get("location") or "").lower(), []).append(provider_id)
+        # provider id -> (schedule version, next free slot or None)
+        self._next_free: Dict[str, Tuple[int, Optional[Dict[str, Any]]]] = {}
+        self._embeddings = embeddings
+        # (specialty names, normalized description vectors), built on the first symptom match
+        self._specialty_vectors: Optional[Tuple[List[str], np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    def specialties(self) -> List[str]:
+        return sorted({p["specialty"] for p in self.providers.values()})
+
+    def list_providers(self, specialty: Optional[str] = None, location: Optional[str] = None) -> List[Dict[str, Any]]:
+        ids = self._by_specialty.get(specialty.lower(), []) if specialty else list(self.providers)
+        if location:
+            ids = [i for i in ids if i in set(self._by_location.get(location.lower(), []))]
+        return [self.providers[i] for i in ids]
+
+    def next_free(self, provider_id: str) -> Optional[Dict[str, Any]]:
+        """The provider's earliest free slot from now, recomputed only when their schedule changed."""
+        version = self.appointments.version(provider_id)
+        now_key = datetime.datetime.now().isoformat(timespec="seconds")
+        cached = self._next_free.get(provider_id)
+        if cached and cached[0] == version and (cached[1] is None or cached[1]["start"] >= now_key):
+            metrics.incr("providers.next_free.hit")
+            return cached[1]
+        metrics.incr("providers.next_free.miss")
+        slot = self.appointments.next_free_slot(provider_id, horizon_days=HORIZON_DAYS)
+        with self._lock:
+            self._next_free[provider_id] = (version, slot)
+        return slot
+
+    @metrics.traced("providers.earliest")
+    def earliest(self, specialty: str, location: Optional[str] = None,
+                 start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None) -> Optional[Dict[str, Any]]:
+        """{"provider", "slot"} for the earliest free slot of `specialty` in [start, end), or None."""
+        start_key = start.isoformat(timespec="seconds") if start else None
+        end_key = end.isoformat(timespec="seconds") if end else None
+        best = None
+        for provider in self.list_providers(specialty, location):
+            slot = self.next_free(provider["id"])
+            if slot is not None and start_key and slot["start"] < start_key:
+                # The window starts after the cached slot: look from the window start instead
+                slot = self.appointments.next_free_slot(provider["id"], start, horizon_days=HORIZON_DAYS)
+            if slot is None or (end_key and slot["start"] >= end_key):
+                continue
+            if best is None or slot["start"] < best["slot"]["start"]:
+                best = {"provider": provider, "slot": slot}
+        return best
+
+    def _vectors(self) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            if self._specialty_vectors is None:
+                if self._embeddings is None:
+                    from tools.embeddings import get_embeddings
+                    self._embeddings = get_embeddings()
+                names = [name for name in SPECIALTIES if name.lower() in self._by_specialty]
+                texts = [f"{name}: {SPECIALTIES[name]['description']}" for name in names]
+                matrix = np.asarray(self._embeddings.embed_documents(texts), dtype=np.float32)
+                matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+                self._specialty_vectors = (names, matrix)
+            return self._specialty_vectors
+
+    @metrics.traced("providers.specialty_for")
+    def specialty_for(self, text: str) -> Dict[str, Any]:
+        """
+        The specialty a request or symptom description calls for: a specialty named in the text
+        ("nephrologist", "heart"), else the nearest specialty description by embedding similarity,
+        else general practice. Returns {"specialty", "method", "score"}.
+        """
+        lowered = text.lower()
+        for name, spec in SPECIALTIES.items():
+            if name.lower() in self._by_specialty and any(re.search(rf"\b{re.escape(alias)}\b", lowered) for alias in spec["aliases"]):
+                return {"specialty": name, "method": "keyword", "score": 1.0}
+        try:
+            names, matrix = self._vectors()
+            query = np.asarray(self._embeddings.embed_query(text), dtype=np.float32)
+            scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        except Exception as e:
+            print(f"Symptom matching unavailable, using {DEFAULT_SPECIALTY}: {e}")
+            return {"specialty": DEFAULT_SPECIALTY, "method": "default", "score": 0.0}
+        best = int(np.argmax(scores)) if len(names) else -1
+        if best < 0 or scores[best] < MATCH_MIN_SCORE:
+            return {"specialty": DEFAULT_SPECIALTY, "method": "default", "score": float(scores[best]) if best >= 0 else 0.0}
+        return {"specialty": names[best], "method": "embedding", "score": float(scores[best])}
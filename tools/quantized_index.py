@@ -0,0 +1,208 @@
+import os
+import json
+import threading
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from tools import metrics
+
+MODES = ("int8", "binary")
+
+# popcount for every byte value, used for Hamming distance on packed bits
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class QuantizedIndex:
+    """
+    Compact in-memory vector index over chunk embeddings.
+
+    - int8:   per-vector symmetric scaling, int32-accumulated dot product (~4x smaller than float32)
+    - binary: sign bits packed with np.packbits, Hamming distance scan (~32x smaller)
+
+    Float vectors stay in Chroma; `RAGTool` can rescore the top candidates against them.
+    Persisted next to the Chroma DB as `<name>.npz` + `<name>.ids.json`.
+    """
+
+    def __init__(self, mode: str = "int8", dim: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.dim = dim
+        self.ids: List[str] = []
+        self._id_pos = {}
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None  # int8 only
+        # Preallocated storage; codes/scales are views of its first len(ids) rows, and the
+        # capacity doubles when full, so appending a batch copies only that batch
+        self._code_buf: Optional[np.ndarray] = None
+        self._scale_buf: Optional[np.ndarray] = None
+        # Added to since the last save, and the (mtime, size) of the ids file as last saved or loaded
+        self.dirty = False
+        self.file_stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Encoding ---
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if self.mode == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.round(vectors / scales[:, None]).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return np.packbits(vectors > 0, axis=1), None
+
+    def add(self, ids: List[str], vectors) -> None:
+        """Append (or replace) vectors for the given chunk ids."""
+        if not ids:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        codes, scales = self._encode(vectors)
+        with self._lock:
+            # Drop stale entries for re-added ids so each id appears once
+            stale = [i for i in ids if i in self._id_pos]
+            if stale:
+                self._remove_locked(stale)
+            start = len(self.ids)
+            self.ids.extend(ids)
+            for offset, chunk_id in enumerate(ids):
+                self._id_pos[chunk_id] = start + offset
+            self.codes, self._code_buf = self._append(self.codes, self._code_buf, codes, start)
+            if scales is not None:
+                self.scales, self._scale_buf = self._append(self.scales, self._scale_buf, scales, start)
+            self.dirty = True
+
+    @staticmethod
+    def _append(view: Optional[np.ndarray], buf: Optional[np.ndarray], rows: np.ndarray, start: int):
+        end = start + len(rows)
+        if buf is None or end > len(buf):
+            grown = np.empty((max(end, 2 * start, 64),) + rows.shape[1:], dtype=rows.dtype)
+            if start:
+                grown[:start] = view
+            buf = grown
+        buf[start:end] = rows
+        return buf[:end], buf
+
+    def _remove_locked(self, ids: List[str]) -> None:
+        drop = {self._id_pos[i] for i in ids if i in self._id_pos}
+        if not drop:
+            return
+        keep = np.array([p for p in range(len(self.ids)) if p not in drop], dtype=np.int64)
+        self.ids = [self.ids[p] for p in keep]
+        self._id_pos = {chunk_id: pos for pos, chunk_id in enumerate(self.ids)}
+        self.codes = self._code_buf = self.codes[keep]
+        if self.scales is not None:
+            self.scales = self._scale_buf = self.scales[keep]
+        self.dirty = True
+
+    def remove(self, ids: List[str]) -> None:
+        with self._lock:
+            self._remove_locked(ids)
+
+    def replace(self, other: "QuantizedIndex") -> None:
+        """Take over the contents of `other` in place, so every holder of this index sees them."""
+        with self._lock:
+            self.dim, self.ids, self._id_pos = other.dim, list(other.ids), dict(other._id_pos)
+            self.codes, self.scales = other.codes, other.scales
+            self._code_buf, self._scale_buf = other.codes, other.scales
+            self.dirty, self.file_stamp = other.dirty, other.file_stamp
+
+    # --- Search ---
+
+    @metrics.traced("rag.quantized.search")
+    def search(self, query_vector, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (chunk_id, approximate similarity) pairs, best first."""
+        with self._lock:
+            if self.codes is None or not self.ids:
+                return []
+            codes, scales, ids = self.codes, self.scales, self.ids
+        q = np.asarray(query_vector, dtype=np.float32)[None, :]
+        q_codes, q_scales = self._encode(q)
+
+        if self.mode == "int8":
+            raw = codes.astype(np.int32) @ q_codes[0].astype(np.int32)
+            scores = raw.astype(np.float32) * scales * q_scales[0]
+        else:
+            # Hamming distance -> similarity in [-1, 1] (approximates cosine for sign codes)
+            distance = _POPCOUNT[np.bitwise_xor(codes, q_codes[0])].sum(axis=1, dtype=np.int32)
+            scores = 1.0 - 2.0 * distance.astype(np.float32) / float(self.dim)
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    # --- Persistence / stats ---
+
+    def bytes_per_vector(self) -> float:
+        if self.codes is None or not self.ids:
+            return 0.0
+        total = self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        return total / len(self.ids)
+
+    @staticmethod
+    def stamp(path_prefix: str) -> Optional[Tuple[int, int]]:
+        """(mtime, size) of the saved ids file, which is written last; None when there is none."""
+        try:
+            info = os.stat(path_prefix + ".ids.json")
+        except OSError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    def save(self, path_prefix: str) -> None:
+        with self._lock:
+            arrays = {"codes": self.codes if self.codes is not None else np.zeros((0, 0), dtype=np.uint8)}
+            if self.scales is not None:
+                arrays["scales"] = self.scales
+            # Written to temp files and renamed, so a process reloading the index never reads a partial file
+            with open(path_prefix + ".npz.tmp", "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(path_prefix + ".npz.tmp", path_prefix + ".npz")
+            with open(path_prefix + ".ids.json.tmp", "w") as f:
+                json.dump({"mode": self.mode, "dim": self.dim, "ids": self.ids}, f)
+            os.replace(path_prefix + ".ids.json.tmp", path_prefix + ".ids.json")
+            self.dirty = False
+            self.file_stamp = self.stamp(path_prefix)
+
+    @classmethod
+    def load(cls, path_prefix: str) -> Optional["QuantizedIndex"]:
+        if not (os.path.exists(path_prefix + ".npz") and os.path.exists(path_prefix + ".ids.json")):
+            return None
+        file_stamp = cls.stamp(path_prefix)
+        with open(path_prefix + ".ids.json") as f:
+            meta = json.load(f)
+        index = cls(meta["mode"], meta.get("dim"))
+        data = np.load(path_prefix + ".npz")
+        if meta["ids"]:
+            if len(data["codes"]) != len(meta["ids"]):
+                # Caught between another process's two renames; the caller retries on its next check
+                return None
+            index.ids = meta["ids"]
+            index._id_pos = {chunk_id: pos for pos, chunk_id in enumerate(index.ids)}
+            index.codes = index._code_buf = data["codes"]
+            index.scales = index._scale_buf = data["scales"] if "scales" in data else None
+        index.file_stamp = file_stamp
+        return index
+
+    @classmethod
+    def from_collection(cls, collection, mode: str, batch_size: int = 1000) -> "QuantizedIndex":
+        """Build an index by paging all embeddings out of a Chroma collection."""
+        index = cls(mode)
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            page = collection.get(include=["embeddings"], limit=batch_size, offset=offset)
+            if page["ids"]:
+                index.add(page["ids"], np.asarray(page["embeddings"], dtype=np.float32))
+        return index
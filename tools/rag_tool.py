@@ -1,4 +1,9 @@
 import os
+import uuid
+import heapq
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import certifi
 import httpx
 
@@ -6,95 +11,474 @@ import httpx
 os.environ['HF_HUB_DISABLE_SSL_VERIFY'] = '1'
 os.environ['CURL_CA_BUNDLE'] = ''
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
-try:
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
-except ImportError:
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from tools import metrics
+from tools.aio import run_blocking
+from tools.chunker import make_text_splitter
+from tools.embeddings import get_embeddings
+from tools.pdf_parser import iter_pdf_pages
+from tools.lab_store import LabStore
+from tools.shards import ShardRouter
+from tools.chunk_index import ChunkIndex
+
+# Quantized indexes are shared per (db_path, collection, mode) so that every
+# RAGTool in the process sees chunks ingested through any of them.
+_quantized_indexes = {}
+_quantized_lock = threading.Lock()
+
+# Shard queries run in parallel; Chroma releases the GIL in its HNSW search
+_shard_pool = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_SHARD_WORKERS", "4")), thread_name_prefix="rag-shard")
 
 class RAGTool:
-    def __init__(self, db_path="./chroma_db", collection_name="medical_docs"):
+    def __init__(self, db_path="./chroma_db", collection_name="medical_docs", rerank=None, rerank_candidates=None, vector_mode=None, chunker=None, sharding=None, patient_resolver=None):
         self.db_path = db_path
         self.collection_name = collection_name
+        # Maps the patient name found in a report to the EHR's full name (EHRAdapter.resolve_name),
+        # so chunks and lab rows are stored under the key deletes and renames match exactly
+        self.patient_resolver = patient_resolver
+
+        # Vector search mode: "float" (Chroma HNSW), or a compact NumPy scan
+        # over "int8" / "binary" quantized codes with optional float rescoring.
+        self.vector_mode = (vector_mode or os.getenv("RAG_VECTOR_MODE", "float")).lower()
+        self.quant_rescore = os.getenv("RAG_QUANT_RESCORE", "1").lower() in ("1", "true", "yes")
+        self.quant_oversample = int(os.getenv("RAG_QUANT_OVERSAMPLE", "4"))
+        self.quantized = None
+        # IngestQueue.last_finished() at the last reconnect; see pick_up_ingested()
+        self._ingest_stamp = None
+        self._ingest_lock = threading.Lock()
+
+        # Chunks embedded and written per batch while streaming a PDF
+        self.ingest_batch_size = int(os.getenv("RAG_INGEST_BATCH", "64"))
+        # Chunking strategy: "recursive" (1000/200 characters) or "semantic" (token-sized, section-aware)
+        self.text_splitter = make_text_splitter(chunker)
+
+        # Structured lab values extracted at ingest, queried without vector search
+        self.lab_store = LabStore(os.path.join(self.db_path, "lab_values.sqlite3"))
+
+        # Optional two-stage retrieval: fetch `rerank_candidates` bi-encoder hits,
+        # then rerank them with a local cross-encoder and keep the top k.
+        if rerank is None:
+            rerank = os.getenv("RAG_RERANK", "0").lower() in ("1", "true", "yes")
+        self.rerank = rerank
+        self.rerank_candidates = rerank_candidates or int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+        # Relevance floor for search results (evaluate_retrieval.py measures the effect of raising it)
+        self.min_score = float(os.getenv("RAG_MIN_SCORE", "0.0"))
+        self.reranker = None
+        # CHROMA_HOST: use a Chroma server (`chroma run --path ./chroma_db --port 8001`) instead of
+        # opening the directory in-process; every process sharing the server sees the others' writes
+        self.chroma_host = os.getenv("CHROMA_HOST")
+        self.chroma_port = int(os.getenv("CHROMA_PORT", "8001"))
         
-        print("Initializing RAGTool with HuggingFaceEmbeddings (Local Model)...")
-        try:
-            # Use the locally downloaded model path
-            model_path = "./local_embeddings_model"
-            if os.path.exists(model_path):
-                self.embeddings = HuggingFaceEmbeddings(model_name=model_path, model_kwargs={'device': 'cpu'})
-            else:
-                # Fallback to online if local folder missing (though we just created it)
-                self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={'device': 'cpu'})
-        except Exception as e:
-            print(f"Failed to initialize HuggingFaceEmbeddings: {e}")
-            # Fallback to OpenAI if HF fails
-            # On Windows (Local), we disable SSL verify. On Linux (Cloud), we use default.
-            if os.name == 'nt':
-                self.http_client = httpx.Client(verify=False)
-            else:
-                self.http_client = None
-            
-            self.embeddings = OpenAIEmbeddings(model="text-embedding-ada-002", http_client=self.http_client)
+        # One embedding model per process, shared with every other RAGTool
+        self.embeddings = get_embeddings()
+        self.vectorstore = self._open_vectorstore()
+
+        # Optional sharding of chunks across "<collection>-<shard>" collections (RAG_SHARDING)
+        self.router = ShardRouter(self.collection_name, sharding)
+        self._shard_stores = {}
+        self._shard_lock = threading.Lock()
+        if self.router.enabled and self.vector_mode != "float":
+            print(f"Quantized search is per collection; using float search with {self.router.strategy} sharding.")
+            self.vector_mode = "float"
+
+        # patient -> chunk id index so patient deletes/renames do not scan the corpus
+        index_path = os.path.join(self.db_path, "patient_chunks.sqlite3")
+        backfill = not os.path.exists(index_path)
+        self.chunk_index = ChunkIndex(index_path)
+        if backfill and self.get_doc_count():
+            print(f"Indexed {self.chunk_index.rebuild(self)} existing chunks by patient.")
+
+        if self.vector_mode in ("int8", "binary"):
+            self._init_quantized()
+        elif self.vector_mode != "float":
+            print(f"Unknown RAG_VECTOR_MODE '{self.vector_mode}', using float search.")
+            self.vector_mode = "float"
+
+        if self.rerank:
+            try:
+                from tools.reranker import get_reranker
+                self.reranker = get_reranker()
+            except Exception as e:
+                print(f"Failed to load reranker, using bi-encoder ranking only: {e}")
+                self.rerank = False
+
+    def _quantized_path(self):
+        return os.path.join(self.db_path, f"{self.collection_name}_{self.vector_mode}")
+
+    def _init_quantized(self):
+        from tools.quantized_index import QuantizedIndex
+        path = self._quantized_path()
+        with _quantized_lock:
+            index = _quantized_indexes.get(path)
+            if index is None:
+                index = QuantizedIndex.load(path)
+                # Rebuild if missing or out of sync with the Chroma collection
+                if index is None or len(index) != self.get_doc_count():
+                    print(f"Building {self.vector_mode} quantized index for {self.collection_name}...")
+                    index = QuantizedIndex.from_collection(self.vectorstore._collection, self.vector_mode)
+                    os.makedirs(self.db_path, exist_ok=True)
+                    index.save(path)
+                _quantized_indexes[path] = index
+        self.quantized = index
+        print(f"Quantized index ready: {len(index)} vectors, {index.bytes_per_vector():.0f} bytes/vector.")
+
+    def _refresh_quantized(self):
+        """Reload the quantized index when another process (ingest_worker.py) saved a newer one."""
+        if self.quantized is None or self.quantized.dirty:
+            return
+        from tools.quantized_index import QuantizedIndex
+        path = self._quantized_path()
+        current = QuantizedIndex.stamp(path)
+        if current is None or current == self.quantized.file_stamp:
+            return
+        with _quantized_lock:
+            if self.quantized.dirty or QuantizedIndex.stamp(path) == self.quantized.file_stamp:
+                return
+            loaded = QuantizedIndex.load(path)
+            if loaded is not None:
+                # In place, so every RAGTool sharing the index sees the new chunks
+                self.quantized.replace(loaded)
+                metrics.incr("rag.quantized.reloads")
+
+    def save_quantized(self):
+        """Persist the quantized index if chunks were added since the last save (once per document or job)."""
+        if self.quantized is not None and self.quantized.dirty:
+            with metrics.span("rag.quantized.save"):
+                self.quantized.save(self._quantized_path())
+
+    # --- Shards ---
+
+    def list_collections(self):
+        """Names of the base collection and its shards that exist in this Chroma directory."""
+        names = [getattr(c, "name", c) for c in self.vectorstore._client.list_collections()]
+        return [n for n in names if n == self.collection_name or self.router.is_shard(n)]
+
+    def get_store(self, name):
+        """LangChain Chroma wrapper for one collection, sharing this tool's client and embeddings."""
+        if name == self.collection_name:
+            return self.vectorstore
+        with self._shard_lock:
+            store = self._shard_stores.get(name)
+            if store is None:
+                store = Chroma(client=self.vectorstore._client, embedding_function=self.embeddings, collection_name=name)
+                self._shard_stores[name] = store
+            return store
+
+    def _open_vectorstore(self):
+        if self.chroma_host:
+            import chromadb
+            client = chromadb.HttpClient(host=self.chroma_host, port=self.chroma_port)
+            return Chroma(client=client, embedding_function=self.embeddings, collection_name=self.collection_name)
+        return Chroma(persist_directory=self.db_path, embedding_function=self.embeddings, collection_name=self.collection_name)
+
+    def reconnect(self):
+        """
+        Re-open the base collection and drop cached shard handles: after collections were
+        recreated, or to see chunks another process wrote. Chroma keeps one client per
+        directory per process and that client never sees another process's writes, so the
+        cached client is dropped too; searches already running finish on the old one.
+        """
+        if not self.chroma_host:
+            # A server client already sees every process's writes; a local one must be dropped
+            try:
+                from chromadb.api.client import SharedSystemClient
+                settings = self.vectorstore._client.get_settings()
+                SharedSystemClient._identifier_to_system.pop(SharedSystemClient._get_identifier_from_settings(settings), None)
+            except Exception as e:
+                print(f"Could not drop the cached Chroma client: {e}")
+        self.vectorstore = self._open_vectorstore()
+        with self._shard_lock:
+            self._shard_stores = {}
+        metrics.incr("rag.reconnects")
+
+    def pick_up_ingested(self, stamp):
+        """
+        Reconnect when `stamp` (IngestQueue.last_finished()) moved since the last call, so chunks
+        written by ingest_worker.py become searchable. Cheap when nothing finished.
+        """
+        if stamp is None or stamp == self._ingest_stamp:
+            return False
+        with self._ingest_lock:
+            if stamp == self._ingest_stamp:
+                return False
+            self.reconnect()
+            self._ingest_stamp = stamp
+        return True
+
+    def _sharded_search(self, query_text, k, patient=None, clinic=None, since=None):
+        """Embed once, search only the routed shards in parallel and merge their top-k by relevance."""
+        names = self.router.route(self.list_collections(), patient=patient, clinic=clinic, since=since)
+        if not names:
+            return []
+        query_vec = self.embeddings.embed_query(query_text)
+
+        def search(name):
+            store = self.get_store(name)
+            to_relevance = store._select_relevance_score_fn()
+            with metrics.span("rag.chroma.search"):
+                hits = store.similarity_search_by_vector_with_relevance_scores(query_vec, k=k)
+            return [(doc, to_relevance(distance)) for doc, distance in hits]
+
+        metrics.incr("rag.shards.searched", len(names))
+        if len(names) == 1:
+            return search(names[0])
+        # Each task runs in a copy of this context so its spans land in the caller's metrics.collect()
+        futures = [_shard_pool.submit(contextvars.copy_context().run, search, name) for name in names]
+        merged = []
+        for future in futures:
+            merged.extend(future.result())
+        return heapq.nlargest(k, merged, key=lambda item: item[1])
 
-        self.vectorstore = Chroma(persist_directory=self.db_path, embedding_function=self.embeddings, collection_name=self.collection_name)
+    def resolve_patient(self, patient):
+        """The stored name for a patient named in a report: the resolver's full name, else the name as given."""
+        if not patient or self.patient_resolver is None:
+            return patient
+        return self.patient_resolver(patient) or patient
+
+    def add_lab_rows(self, rows):
+        """Store lab rows under their resolved patient names."""
+        for row in rows:
+            row["patient"] = self.resolve_patient(row.get("patient"))
+        return self.lab_store.add_rows(rows)
+
+    def _add_documents(self, docs):
+        """Embed chunks once and write them to Chroma (and the quantized index, if any)."""
+        if not docs:
+            return []
+        texts = [d.page_content for d in docs]
+        metadatas = [d.metadata or {} for d in docs]
+        for metadata in metadatas:
+            if metadata.get("patient"):
+                metadata["patient"] = self.resolve_patient(metadata["patient"])
+        ids = [str(uuid.uuid4()) for _ in docs]
+        vectors = self.embeddings.embed_documents(texts)
+        if self.router.enabled:
+            # One embedding pass for the batch, then one add per destination shard
+            groups = {}
+            for i, metadata in enumerate(metadatas):
+                groups.setdefault(self.router.shard_for(metadata), []).append(i)
+            with metrics.span("rag.chroma.add"):
+                for name, rows in groups.items():
+                    self.get_store(name)._collection.add(
+                        ids=[ids[i] for i in rows],
+                        embeddings=[vectors[i] for i in rows],
+                        documents=[texts[i] for i in rows],
+                        metadatas=[metadatas[i] for i in rows] if any(metadatas[i] for i in rows) else None,
+                    )
+                    self.chunk_index.add((ids[i], metadatas[i].get("patient"), name) for i in rows)
+            return ids
+        with metrics.span("rag.chroma.add"):
+            self.vectorstore._collection.add(
+                ids=ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=metadatas if any(metadatas) else None,
+            )
+        self.chunk_index.add((chunk_id, metadata.get("patient"), self.collection_name) for chunk_id, metadata in zip(ids, metadatas))
+        if self.quantized is not None:
+            self._refresh_quantized()
+            # Saved by save_quantized() once the document or job is complete, not per batch
+            self.quantized.add(ids, vectors)
+        return ids
+
+    def add_chunks(self, docs):
+        """Index chunks that were parsed and split elsewhere (the background ingest worker; it calls save_quantized())."""
+        ids = self._add_documents(docs)
+        metrics.incr("rag.ingest.chunks", len(ids))
+        return ids
+
+    def _quantized_search(self, query_text, k):
+        """Candidate generation over quantized codes, optionally rescored with float vectors from Chroma."""
+        import numpy as np
+        self._refresh_quantized()
+        query_vec = np.asarray(self.embeddings.embed_query(query_text), dtype=np.float32)
+        pool = k * self.quant_oversample if self.quant_rescore else k
+        candidates = self.quantized.search(query_vec, pool)
+        if not candidates:
+            return []
+
+        include = ["documents", "metadatas"] + (["embeddings"] if self.quant_rescore else [])
+        found = self.vectorstore._collection.get(ids=[c[0] for c in candidates], include=include)
+        position = {chunk_id: i for i, chunk_id in enumerate(found["ids"])}
+
+        if self.quant_rescore and found["ids"]:
+            with metrics.span("rag.quantized.rescore"):
+                vectors = np.asarray(found["embeddings"], dtype=np.float32)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                query_vec /= max(float(np.linalg.norm(query_vec)), 1e-12)
+                exact = vectors @ query_vec
+                scored = [(chunk_id, float(exact[position[chunk_id]])) for chunk_id, _ in candidates if chunk_id in position]
+        else:
+            # Ids missing from Chroma (e.g. after a clear) are skipped
+            scored = [(chunk_id, score) for chunk_id, score in candidates if chunk_id in position]
+
+        scored.sort(key=lambda item: item[1], reverse=True)
+        results = []
+        for chunk_id, score in scored[:k]:
+            i = position[chunk_id]
+            metadata = (found.get("metadatas") or [None] * len(found["ids"]))[i] or {}
+            results.append((Document(page_content=found["documents"][i], metadata=metadata), score))
+        return results
 
     def get_doc_count(self):
+        """Returns the number of documents in the vector store (all shards)."""
         try:
+            if self.router.enabled:
+                return sum(self.get_store(name)._collection.count() for name in self.list_collections())
             return self.vectorstore._collection.count()
-        except:
+        except Exception:
+            return 0
+
+    def delete_chunks(self, ids, collection=None):
+        """Remove chunks by id from one collection (default: the base collection) and the quantized index."""
+        if not ids:
             return 0
+        name = collection or self.collection_name
+        self.get_store(name)._collection.delete(ids=list(ids))
+        self.chunk_index.remove(ids)
+        if self.quantized is not None and name == self.collection_name:
+            self._refresh_quantized()
+            self.quantized.remove(list(ids))
+            self.quantized.save(self._quantized_path())
+        metrics.incr("rag.chunks_deleted", len(ids))
+        return len(ids)
+
+    def delete_patient(self, patient):
+        """Delete every chunk stored under exactly this patient name, found through the chunk index. Returns the number deleted."""
+        deleted = 0
+        for name, ids in self.chunk_index.chunks_for(patient, exact=True).items():
+            deleted += self.delete_chunks(ids, collection=name)
+        return deleted
+
+    def rename_patient(self, old, new):
+        """Rewrite the patient metadata of the chunks stored under exactly `old`, moving them if their shard changes."""
+        renamed = 0
+        for name, ids in self.chunk_index.chunks_for(old, exact=True).items():
+            collection = self.get_store(name)._collection
+            page = collection.get(ids=ids, include=["metadatas", "embeddings", "documents"])
+            metadatas = [dict(m or {}, patient=new) for m in page["metadatas"]]
+            target = self.router.shard_for(metadatas[0]) if self.router.enabled and metadatas else name
+            if target == name:
+                collection.update(ids=page["ids"], metadatas=metadatas)
+            else:
+                self.get_store(target)._collection.add(ids=page["ids"], embeddings=page["embeddings"],
+                                                       documents=page["documents"], metadatas=metadatas)
+                collection.delete(ids=page["ids"])
+                self.chunk_index.move(page["ids"], target)
+            renamed += len(page["ids"])
+        self.chunk_index.rename(old, new)
+        return renamed
 
     def clear_db(self):
+        """Clears the vector store: the collection, its shards, the quantized index and the lab values."""
         try:
+            client = self.vectorstore._client
+            for name in self.list_collections():
+                if name != self.collection_name:
+                    client.delete_collection(name)
+            self._shard_stores = {}
             self.vectorstore.delete_collection()
-            # Re-initialize
-            self.vectorstore = Chroma(persist_directory=self.db_path, embedding_function=self.embeddings, collection_name=self.collection_name)
+            # Re-initialize under the same collection name
+            self.vectorstore = self._open_vectorstore()
+            if self.quantized is not None:
+                self.quantized.remove(list(self.quantized.ids))
+                self.quantized.save(self._quantized_path())
+            self.lab_store.clear()
+            self.chunk_index.clear()
             return True
         except Exception as e:
             print(f"Error clearing DB: {e}")
             return False
 
+    @metrics.traced("rag.ingest_pdf")
     def ingest_pdf(self, pdf_path):
+        """
+        Stream a PDF page by page into the splitter and embedder. Memory stays bounded
+        by one page plus one embedding batch regardless of document size.
+        Returns page/chunk/lab value counts; lab rows go to the lab store page by page.
+        """
         if not os.path.exists(pdf_path):
             print(f"File not found: {pdf_path}")
-            return
+            return {'success': False, 'error': 'File not found'}
         
         print(f"Loading PDF: {pdf_path}")
         try:
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            docs = text_splitter.split_documents(documents)
-            
-            print(f"Split into {len(docs)} chunks. Adding to vectorstore...")
-            self.vectorstore.add_documents(docs)
-            print(f"Ingested {len(docs)} chunks from {pdf_path}")
+            pages = 0
+            chunks = 0
+            lab_rows = 0
+            batch = []
+            # Re-ingesting a report replaces its lab rows instead of duplicating them
+            self.lab_store.delete_source(pdf_path)
+            for page_doc, page_rows in iter_pdf_pages(pdf_path):
+                pages += 1
+                lab_rows += len(page_rows)
+                self.add_lab_rows(page_rows)
+                # Chunks keep the page's source/page/patient metadata
+                batch.extend(self.text_splitter.split_documents([page_doc]))
+                if len(batch) >= self.ingest_batch_size:
+                    self._add_documents(batch)
+                    chunks += len(batch)
+                    batch = []
+            if batch:
+                self._add_documents(batch)
+                chunks += len(batch)
+
+            metrics.incr("rag.ingest.chunks", chunks)
+            print(f"Ingested {chunks} chunks from {pages} pages of {pdf_path} ({lab_rows} lab values)")
+            return {'success': True, 'pages': pages, 'chunks': chunks, 'lab_rows': lab_rows}
         except Exception as e:
             print(f"Error during ingestion: {e}")
+            return {'success': False, 'error': str(e)}
+        finally:
+            self.save_quantized()
 
-    def query(self, query_text, k=3):
+    def search(self, query_text, k=3, rerank=None, patient=None, clinic=None, since=None, min_score=None):
+        """
+        The (Document, score) pairs behind query(): relevance scores in [0, 1], or
+        cross-encoder scores when reranked. Store errors propagate (query() falls back).
+        """
+        use_rerank = self.rerank if rerank is None else (rerank and self.reranker is not None)
+        # Stage one: with reranking on, pull a wider candidate pool cheaply
+        fetch_k = max(k, self.rerank_candidates) if use_rerank else k
+        # Use similarity_search_with_relevance_scores to filter irrelevant results
+        # This returns a list of (Document, score) tuples. 
+        # Scores are normalized (0 to 1), where 1 is most similar.
+        if self.router.enabled:
+            results = self._sharded_search(query_text, fetch_k, patient=patient, clinic=clinic, since=since)
+        elif self.quantized is not None:
+            results = self._quantized_search(query_text, fetch_k)
+        else:
+            with metrics.span("rag.chroma.search"):
+                results = self.vectorstore.similarity_search_with_relevance_scores(query_text, k=fetch_k)
+
+        # Default threshold 0.0: We rely on post-filtering by name in the agent logic
+        # to avoid false positives (e.g. "Vimla" matching "Rebeca").
+        # This ensures we don't miss "Deepak" (score ~0.13) due to a strict threshold.
+        threshold = self.min_score if min_score is None else min_score
+        relevant = [(doc, score) for doc, score in results if score > threshold]
+
+        # Stage two: cross-encoder rerank of the candidate pool
+        if use_rerank and relevant:
+            scores = self.reranker.score(query_text, [doc.page_content for doc, _ in relevant])
+            ranked = sorted(zip((doc for doc, _ in relevant), scores), key=lambda item: item[1], reverse=True)
+            return ranked[:k]
+        return relevant
+
+    @metrics.traced("rag.query")
+    def query(self, query_text, k=3, rerank=None, patient=None, clinic=None, since=None):
+        """
+        Top-k relevant chunk texts. `patient`, `clinic` and `since` (ISO date) narrow which
+        shards are searched when sharding is enabled; they do not filter within a shard.
+        """
         try:
-            # Use similarity_search_with_relevance_scores to filter irrelevant results
-            # This returns a list of (Document, score) tuples. 
-            # Scores are normalized (0 to 1), where 1 is most similar.
-            results = self.vectorstore.similarity_search_with_relevance_scores(query_text, k=k)
-            
-            relevant_content = []
-            for doc, score in results:
-                # Threshold 0.0: We rely on post-filtering by name in the agent logic
-                # to avoid false positives (e.g. "Vimla" matching "Rebeca").
-                # This ensures we don't miss "Deepak" (score ~0.13) due to a strict threshold.
-                if score > 0.0: 
-                    relevant_content.append(doc.page_content)
-            
-            return relevant_content
+            return [doc.page_content for doc, _ in self.search(query_text, k=k, rerank=rerank, patient=patient,
+                                                               clinic=clinic, since=since)]
         except Exception as e:
             print(f"Error during query with scores: {e}")
+            # Collections recreated by maintain_rag.py --rebuild in another process: re-open by name
+            if "does not exist" in str(e):
+                self.reconnect()
             # Fallback to standard search if relevance scoring fails
             try:
                 docs = self.vectorstore.similarity_search(query_text, k=k)
@@ -103,23 +487,6 @@ class RAGTool:
                 print(f"Error during fallback query: {e2}")
                 return []
 
-    def get_doc_count(self):
-        """Returns the number of documents in the vector store."""
-        try:
-            return self.vectorstore._collection.count()
-        except Exception:
-            return 0
-
-    def clear_db(self):
-        """Clears the vector store."""
-        try:
-            # In ChromaDB, we can reset the collection
-            self.vectorstore.delete_collection()
-            # Re-initialize
-            self.vectorstore = Chroma(
-                persist_directory=self.db_path,
-                embedding_function=self.embeddings
-            )
-        except Exception as e:
-            print(f"Error clearing DB: {e}")
-
+    async def aquery(self, query_text, k=3, rerank=None, patient=None, clinic=None, since=None):
+        """query() for async callers: embedding and search run on the shared tool pool."""
+        return await run_blocking(self.query, query_text, k=k, rerank=rerank, patient=patient, clinic=clinic, since=since)
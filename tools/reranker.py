@@ -0,0 +1,86 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Tuple, Optional
+
+from tools import metrics
+
+DEFAULT_RERANKER_PATH = "./local_reranker_model"
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """
+    Second-stage reranker: scores (query, chunk) pairs with a small local cross-encoder.
+    Loaded through sentence-transformers like the embedding model, run on CPU in batches,
+    with an LRU cache of pair scores so repeated queries over the same chunks are free.
+    """
+
+    def __init__(self, model_path: str = DEFAULT_RERANKER_PATH, batch_size: int = 32, cache_size: int = 20000):
+        from sentence_transformers import CrossEncoder
+
+        # Use the locally downloaded model if present, else fall back to the hub
+        model_name = model_path if os.path.exists(model_path) else DEFAULT_RERANKER_MODEL
+        print(f"Loading cross-encoder reranker from {model_name}...")
+        self.model = CrossEncoder(model_name, device="cpu", max_length=512)
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: str, text: str) -> Tuple[str, str]:
+        return query, hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @metrics.traced("rag.rerank")
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """Return cross-encoder relevance scores for each text, using cached scores where possible."""
+        scores: List[Optional[float]] = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = self._key(query, text)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+                else:
+                    missing.append(i)
+        metrics.incr("rag.rerank.cache_hits", len(texts) - len(missing))
+
+        if missing:
+            pairs = [(query, texts[i]) for i in missing]
+            predicted = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            with self._lock:
+                for i, value in zip(missing, predicted):
+                    value = float(value)
+                    scores[i] = value
+                    self._cache[self._key(query, texts[i])] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, texts: List[str], top_k: int) -> List[Tuple[str, float]]:
+        """Return the `top_k` texts ordered by cross-encoder score."""
+        if not texts:
+            return []
+        scored = list(zip(texts, self.score(query, texts)))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:top_k]
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_shared_reranker = None
+_shared_lock = threading.Lock()
+
+
+def get_reranker(model_path: str = DEFAULT_RERANKER_PATH) -> CrossEncoderReranker:
+    """Process-wide reranker so every RAGTool instance shares one model in memory."""
+    global _shared_reranker
+    with _shared_lock:
+        if _shared_reranker is None:
+            _shared_reranker = CrossEncoderReranker(model_path)
+        return _shared_reranker
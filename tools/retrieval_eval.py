@@ -0,0 +1,103 @@
+import os
+import re
+import time
+import random
+from typing import Dict, Any, List, Optional, Iterable
+
+from tools.pdf_parser import iter_pdf_pages
+
+# A sentence is a usable passage query when it is long enough to be specific but is not a whole table
+_SENTENCE = re.compile(r"[^.\n!?]{40,220}[.!?]?")
+
+
+def _key(name: Optional[str]) -> str:
+    return (name or "").lower().strip()
+
+
+def build_labels(pdf_paths: Iterable[str], ehr_names: Iterable[str] = (), passages_per_page: int = 2,
+                 seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Labeled queries generated from the reports themselves, so the set follows the data:
+      - "patient": "Medical history and conditions of <name>" for every patient detected in a
+        report and every EHR name that appears in a report's text; relevant = that patient's chunks.
+      - "passage": sentences sampled from each page (seeded); relevant = chunks of that page.
+    Labels refer to (source file, page) and patient, not chunk ids, so they stay valid across chunkers.
+    """
+    rng = random.Random(seed)
+    names = {_key(name): name for name in ehr_names if name and str(name).strip()}
+    labels, patients = [], {}
+    for pdf_path in sorted(pdf_paths):
+        source = os.path.basename(pdf_path)
+        for page_doc, _ in iter_pdf_pages(pdf_path):
+            text = page_doc.page_content
+            patient = page_doc.metadata.get("patient")
+            if patient:
+                patients.setdefault(_key(patient), patient)
+            # EHR names only count when the report mentions them (and agrees with the detected patient)
+            lowered = text.lower()
+            for key, name in names.items():
+                if key in lowered and (not patient or key == _key(patient)):
+                    patients.setdefault(key, name)
+            sentences = [" ".join("".join(c for c in s if c.isprintable()).split()) for s in _SENTENCE.findall(text)]
+            sentences = [s for s in sentences if sum(c.isalpha() for c in s) > 30]
+            for sentence in rng.sample(sentences, min(passages_per_page, len(sentences))):
+                labels.append({"kind": "passage", "query": sentence, "source": source,
+                               "page": page_doc.metadata.get("page"), "patient": patient})
+    for key, name in sorted(patients.items()):
+        labels.append({"kind": "patient", "query": f"Medical history and conditions of {name}", "patient": name})
+    return labels
+
+
+def is_relevant(label: Dict[str, Any], doc) -> bool:
+    metadata = doc.metadata or {}
+    if label["kind"] == "passage":
+        return (os.path.basename(str(metadata.get("source", ""))) == label["source"]
+                and metadata.get("page") == label["page"])
+    # Chunks stored before patient metadata existed only carry the name in their text
+    return _key(metadata.get("patient")) == _key(label["patient"]) or _key(label["patient"]) in doc.page_content.lower()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def evaluate(rag, labels: List[Dict[str, Any]], k: int = 3, rerank: bool = False,
+             min_score: Optional[float] = None) -> Dict[str, Any]:
+    """recall@k (share of queries with a relevant chunk in the top k), MRR@k and search latency."""
+    hits, reciprocal, latencies = 0, 0.0, []
+    by_kind: Dict[str, List[int]] = {}
+    for label in labels:
+        start = time.perf_counter()
+        results = rag.search(label["query"], k=k, rerank=rerank, min_score=min_score)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        rank = next((i + 1 for i, (doc, _) in enumerate(results[:k]) if is_relevant(label, doc)), None)
+        if rank:
+            hits += 1
+            reciprocal += 1.0 / rank
+        by_kind.setdefault(label["kind"], []).append(1 if rank else 0)
+    n = max(1, len(labels))
+    return {
+        "recall_at_k": hits / n,
+        "mrr": reciprocal / n,
+        "recall_by_kind": {kind: sum(found) / len(found) for kind, found in by_kind.items()},
+        "p50_ms": _percentile(latencies, 0.5),
+        "p95_ms": _percentile(latencies, 0.95),
+        "mean_ms": sum(latencies) / n,
+    }
+
+
+def pareto_front(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Configurations not beaten on recall, MRR and p95 latency at once by another configuration."""
+    def dominates(a, b):
+        no_worse = a["recall_at_k"] >= b["recall_at_k"] and a["mrr"] >= b["mrr"] and a["p95_ms"] <= b["p95_ms"]
+        better = a["recall_at_k"] > b["recall_at_k"] or a["mrr"] > b["mrr"] or a["p95_ms"] < b["p95_ms"]
+        return no_worse and better
+    front = [row for row in rows if not any(dominates(other, row) for other in rows if other is not row)]
+    return sorted(front, key=lambda row: row["p95_ms"])
+
+
+def cheapest_meeting(rows: List[Dict[str, Any]], min_recall: float) -> Optional[Dict[str, Any]]:
+    """Lowest-latency configuration whose recall@k reaches `min_recall` (ties broken by MRR)."""
+    eligible = [row for row in rows if row["recall_at_k"] >= min_recall]
+    return min(eligible, key=lambda row: (row["p95_ms"], -row["mrr"])) if eligible else None
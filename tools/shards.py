@@ -0,0 +1,156 @@
+import os
+import re
+import zlib
+from typing import Dict, Any, List, Optional
+
+STRATEGIES = ("none", "patient", "clinic", "time")
+UNASSIGNED = "unassigned"
+
+
+def patient_key(name: Optional[str]) -> Optional[str]:
+    """
+    Routing key for a patient. Report headers carry full names ("Rebeca Nagle") while
+    EHR records and chat often use the first name only, so shards are keyed on that.
+    """
+    if not name or not name.strip():
+        return None
+    return name.strip().split()[0].lower()
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:40] or UNASSIGNED
+
+
+class ShardRouter:
+    """
+    Maps chunk metadata to a Chroma collection name and a query scope to the set of
+    collections worth searching.
+
+    - "patient": crc32(first name) % num_shards -> "<base>-p03"
+    - "clinic":  one collection per clinic ("Location:" in the report) -> "<base>-c-bridport-family-medicine"
+    - "time":    one collection per report year (or quarter) -> "<base>-t-2024" / "<base>-t-2024q1"
+    - "none":    everything in "<base>" (the original single collection)
+
+    Chunks the strategy cannot place (no patient / clinic / date) go to "<base>-unassigned",
+    which every routed query also searches.
+    """
+
+    def __init__(self, base: str = "medical_docs", strategy: Optional[str] = None,
+                 num_shards: Optional[int] = None, window: Optional[str] = None):
+        self.base = base
+        self.strategy = (strategy or os.getenv("RAG_SHARDING", "none")).lower()
+        if self.strategy not in STRATEGIES:
+            print(f"Unknown RAG_SHARDING '{self.strategy}', using a single collection.")
+            self.strategy = "none"
+        self.num_shards = num_shards or int(os.getenv("RAG_SHARDS", "8"))
+        self.window = (window or os.getenv("RAG_SHARD_WINDOW", "year")).lower()
+
+    @property
+    def enabled(self) -> bool:
+        return self.strategy != "none"
+
+    def is_shard(self, name: str) -> bool:
+        return name.startswith(self.base + "-")
+
+    def _name(self, suffix: str) -> str:
+        return f"{self.base}-{suffix}"
+
+    def _time_suffix(self, date: str) -> Optional[str]:
+        m = re.match(r"(\d{4})(?:-(\d{2}))?", date or "")
+        if not m:
+            return None
+        if self.window == "quarter" and m.group(2):
+            return f"t-{m.group(1)}q{(int(m.group(2)) - 1) // 3 + 1}"
+        return f"t-{m.group(1)}"
+
+    def shard_for(self, metadata: Optional[Dict[str, Any]]) -> str:
+        """Collection a chunk with this metadata belongs in."""
+        metadata = metadata or {}
+        if self.strategy == "none":
+            return self.base
+        suffix = None
+        if self.strategy == "patient":
+            key = patient_key(metadata.get("patient"))
+            if key:
+                suffix = f"p{zlib.crc32(key.encode('utf-8')) % self.num_shards:02d}"
+        elif self.strategy == "clinic":
+            if metadata.get("clinic"):
+                suffix = "c-" + _slug(metadata["clinic"])
+        elif self.strategy == "time":
+            suffix = self._time_suffix(metadata.get("report_date"))
+        return self._name(suffix or UNASSIGNED)
+
+    def route(self, existing: List[str], patient: Optional[str] = None, clinic: Optional[str] = None,
+              since: Optional[str] = None) -> List[str]:
+        """
+        Collections to search for a query scope, restricted to those that exist.
+        Scopes the strategy cannot use fall back to every shard.
+        """
+        targets = None
+        if self.strategy == "patient" and patient_key(patient):
+            targets = {self.shard_for({"patient": patient})}
+        elif self.strategy == "clinic" and clinic:
+            targets = {self.shard_for({"clinic": clinic})}
+        elif self.strategy == "time" and since:
+            floor = self._time_suffix(since)
+            if floor:
+                targets = {n for n in existing if n.startswith(self._name("t-")) and n[len(self.base) + 1:] >= floor}
+
+        if targets is None:
+            targets = {n for n in existing if self.is_shard(n)}
+        else:
+            targets.add(self._name(UNASSIGNED))
+        # The unsharded base collection holds chunks ingested before sharding was enabled (until rebalanced)
+        targets.add(self.base)
+        return sorted(n for n in targets if n in existing)
+
+
+def rebalance(rag, batch_size: int = 500, dry_run: bool = False, drop_empty: bool = True) -> Dict[str, Any]:
+    """
+    Move every chunk of the base collection and its shards to the collection `rag.router`
+    assigns it today (after changing RAG_SHARDING / RAG_SHARDS / RAG_SHARD_WINDOW, or to
+    migrate an unsharded store). Stored embeddings are copied, nothing is re-embedded.
+    With drop_empty, shard collections left empty are deleted (compaction).
+    Returns per-collection counts before and after and the number of chunks moved.
+    """
+    before = {name: rag.get_store(name)._collection.count() for name in rag.list_collections()}
+    moved = 0
+    for source in list(before):
+        collection = rag.get_store(source)._collection
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            groups: Dict[str, List[int]] = {}
+            for i, metadata in enumerate(page["metadatas"]):
+                target = rag.router.shard_for(metadata)
+                if target != source:
+                    groups.setdefault(target, []).append(i)
+            stay = len(page["ids"]) - sum(len(rows) for rows in groups.values())
+            for target, rows in groups.items():
+                moved += len(rows)
+                if dry_run:
+                    continue
+                ids = [page["ids"][i] for i in rows]
+                rag.get_store(target)._collection.add(
+                    ids=ids,
+                    embeddings=[page["embeddings"][i] for i in rows],
+                    documents=[page["documents"][i] for i in rows],
+                    metadatas=[page["metadatas"][i] for i in rows],
+                )
+                collection.delete(ids=ids)
+                rag.chunk_index.move(ids, target)
+            # Moved rows are gone from this collection, so only the rows that stayed advance the offset
+            offset += len(page["ids"]) if dry_run else stay
+
+    dropped = []
+    if drop_empty and not dry_run:
+        for name in rag.list_collections():
+            if name != rag.collection_name and rag.get_store(name)._collection.count() == 0:
+                rag.vectorstore._client.delete_collection(name)
+                rag._shard_stores.pop(name, None)
+                dropped.append(name)
+    after = {name: rag.get_store(name)._collection.count() for name in rag.list_collections()}
+    return {"strategy": rag.router.strategy, "moved": moved, "dry_run": dry_run,
+            "before": before, "after": after, "dropped": dropped}
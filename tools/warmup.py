@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+
+# Written once warmup finishes, removed when a new one starts; the container healthcheck reads it
+READY_FILE = os.getenv("WARMUP_READY_FILE", os.path.join(tempfile.gettempdir(), "healthcare_assistant.ready"))
+
+_lock = threading.Lock()
+_status: Dict[str, Any] = {"ready": False, "running": False, "steps": {}, "errors": {}, "total_ms": None}
+
+
+def status() -> Dict[str, Any]:
+    with _lock:
+        return {**_status, "steps": dict(_status["steps"]), "errors": dict(_status["errors"])}
+
+
+def _step(name: str, fn):
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        print(f"Warmup step {name} failed: {e}")
+        with _lock:
+            _status["errors"][name] = str(e)
+    with _lock:
+        _status["steps"][name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def warm_up(rag=None, ehr=None, db_path: str = "./chroma_db", write_ready_file: bool = True) -> Dict[str, Any]:
+    """
+    Pay the first-request costs at process start: embedding model load and first
+    inference, reranker, Chroma client and HNSW segment load, lab store, EHR parse
+    (which also refreshes its on-disk cache). Failed steps are recorded and skipped;
+    the process is marked ready once every step has run.
+    """
+    with _lock:
+        if _status["running"] or _status["ready"]:
+            return status()
+        _status.update(running=True, steps={}, errors={})
+    if write_ready_file and os.path.exists(READY_FILE):
+        os.remove(READY_FILE)
+    started = time.perf_counter()
+    holder = {"rag": rag, "ehr": ehr}
+
+    def load_model():
+        from tools.embeddings import get_embeddings
+        get_embeddings()
+
+    def first_batch():
+        from tools.embeddings import get_embeddings
+        embeddings = get_embeddings()
+        # Fills tokenizer caches and triggers lazy kernel/JIT setup at realistic batch shapes
+        embeddings.embed_documents(["Patient presents with hypertension and elevated creatinine."] * 16)
+        embeddings.embed_query("latest blood test results")
+
+    def open_store():
+        if holder["rag"] is None:
+            from tools.rag_tool import RAGTool
+            holder["rag"] = RAGTool(db_path=db_path)
+        rag = holder["rag"]
+        rag.get_doc_count()
+        # The first search loads the HNSW segments from disk
+        rag.query("Medical history and conditions", rerank=False)
+        rag.lab_store.count()
+
+    def reranker():
+        rag = holder["rag"]
+        if rag is not None and rag.reranker is not None:
+            rag.reranker.rerank("kidney disease diet", ["Low sodium diet advised.", "Knee X-ray normal."], 1)
+
+    def load_ehr():
+        if holder["ehr"] is None:
+            from tools.ehr_tool import EHRAdapter
+            holder["ehr"] = EHRAdapter()
+        holder["ehr"].get_roster(0, 1)
+
+    for name, fn in (("embedding_model", load_model), ("embedding_batch", first_batch), ("vector_store", open_store),
+                     ("reranker", reranker), ("ehr", load_ehr)):
+        _step(name, fn)
+
+    with _lock:
+        _status.update(running=False, ready=True, total_ms=round((time.perf_counter() - started) * 1000, 1),
+                       pid=os.getpid(), finished_at=time.time())
+    result = status()
+    if write_ready_file:
+        try:
+            with open(READY_FILE, "w") as f:
+                json.dump(result, f)
+        except OSError as e:
+            print(f"Could not write readiness file {READY_FILE}: {e}")
+    print(f"Warmup finished in {result['total_ms']:.0f} ms: {result['steps']}")
+    return result
+
+
+def start_background(**kwargs) -> Optional[threading.Thread]:
+    """Run warm_up in a daemon thread unless this process is already warm or warming."""
+    current = status()
+    if current["ready"] or current["running"]:
+        return None
+    thread = threading.Thread(target=warm_up, kwargs=kwargs, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def ready_file_status(path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Contents of the readiness file if it was written by a process that is still alive."""
+    path = path or READY_FILE
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        os.kill(int(data["pid"]), 0)
+        return data
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,63 @@
+"""
+Warm the embedding model, vector store and EHR cache, or check readiness.
+
+`serve.py` runs the same warmup inside the Streamlit process before it starts
+serving; this script is for measuring it and for the container healthcheck.
+
+Usage:
+    python warmup.py                    # warm up in this process and print step timings
+    python warmup.py --check            # exit 0 if a live process finished warmup and the server answers
+    python warmup.py --check --url http://localhost:8000/ready
+"""
+import os
+import sys
+import json
+import argparse
+import urllib.request
+
+# Fix for ChromaDB on hosts with an old sqlite3 (same as app.py)
+try:
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+except ImportError:
+    pass
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools import warmup
+
+
+def check(url, timeout):
+    ready = warmup.ready_file_status()
+    if ready is None:
+        print(f"Not ready: no readiness file from a live process at {warmup.READY_FILE}")
+        return 1
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            if response.status != 200:
+                print(f"Not ready: {url} returned {response.status}")
+                return 1
+    except Exception as e:
+        print(f"Not ready: {url} unreachable ({e})")
+        return 1
+    print(f"Ready (pid {ready['pid']}, warmup {ready['total_ms']:.0f} ms)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up the assistant or check readiness.")
+    parser.add_argument("--check", action="store_true", help="Healthcheck mode: readiness file + HTTP health")
+    parser.add_argument("--url", default=os.getenv("HEALTH_URL", "http://localhost:8501/_stcore/health"))
+    parser.add_argument("--timeout", type=float, default=3.0)
+    parser.add_argument("--db-path", default="./chroma_db")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(check(args.url, args.timeout))
+    # Measuring only; do not claim readiness for a server process
+    result = warmup.warm_up(db_path=args.db_path, write_ready_file=False)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()